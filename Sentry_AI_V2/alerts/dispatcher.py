@@ -0,0 +1,330 @@
+import os
+import time
+import random
+import asyncio
+import inspect
+import threading
+from io import BytesIO
+from collections import Counter, deque
+
+from pipeline.encoded_frame import as_encoded
+from pipeline.metrics import TASK_SECONDS, stage
+
+# ===================================================================
+# Non-blocking alert delivery
+#
+# Detection threads hand alerts to an AlertDispatcher and return at
+# once. The first alert of an incident is sent right away; alerts that
+# follow while detections continue are coalesced into one Telegram media
+# group with a combined caption, sent once the chat has been quiet for
+# ALERT_COALESCE_SECONDS or the batch is ALERT_COALESCE_MAX_SECONDS old.
+# A single worker thread encodes the frames, waits for the per-chat rate
+# limit, and delivers through a transport, retrying transient failures
+# with jittered exponential backoff.
+# ===================================================================
+
+ALERT_COALESCE_SECONDS = float(os.getenv("ALERT_COALESCE_SECONDS", "10"))           # quiet gap that ends an incident
+ALERT_COALESCE_MAX_SECONDS = float(os.getenv("ALERT_COALESCE_MAX_SECONDS", "60"))   # oldest a follow-up batch gets
+MEDIA_GROUP_MAX = 10           # Telegram limit on photos per media group
+PHOTO_MIN_GAP = 0.5            # seconds between photos kept in one group
+CAPTION_MAX_CHARS = 1024       # Telegram limit on photo / media group captions
+MAX_PENDING_PHOTOS = 32        # frames held in memory across all chats
+ALERT_MAX_RETRIES = 3
+ALERT_BACKOFF_BASE = 1.0       # seconds; doubled per attempt, with +-50% jitter
+CHAT_MIN_INTERVAL = 1.0        # Telegram allows ~1 message per second per chat
+
+class ChatRateLimiter:
+    """
+    Spaces out sends to the same chat by at least ``min_interval`` seconds.
+
+    Shared by the alert dispatcher and the report sender, so a PDF and its
+    summary messages count against the same per-chat budget as alerts.
+    """
+
+    def __init__(self, min_interval=CHAT_MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last = {}                    # chat_id -> time of the last reserved send
+
+    def next_allowed(self, chat_id):
+        """ Earliest time a send to ``chat_id`` may start. """
+        with self._lock:
+            return self._last.get(chat_id, 0) + self.min_interval
+
+    def acquire(self, chat_id):
+        """ Reserves the next send slot for ``chat_id`` and sleeps until it starts. """
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._last.get(chat_id, 0) + self.min_interval)
+            self._last[chat_id] = slot
+        if slot > now:
+            time.sleep(slot - now)
+
+class TelegramTransport:
+    """
+    Delivers through a python-telegram-bot Bot.
+
+    Bot methods are coroutines in python-telegram-bot 20. The Bot keeps an
+    HTTP client bound to the loop it was first used on, so every call runs
+    on one long-lived event loop thread; callers submit coroutines to it
+    and block on the result.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def _get_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="telegram-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def _run(self, result):
+        if not inspect.isawaitable(result):
+            return result
+        return asyncio.run_coroutine_threadsafe(result, self._get_loop()).result()
+
+    def send_photo(self, chat_id, photo, caption):
+        return self._run(self.bot.send_photo(chat_id=chat_id, photo=photo, caption=caption))
+
+    def send_message(self, chat_id, text):
+        return self._run(self.bot.send_message(chat_id=chat_id, text=text))
+
+    def send_document(self, chat_id, document, caption):
+        return self._run(self.bot.send_document(chat_id=chat_id, document=document, caption=caption))
+
+    def send_media_group(self, chat_id, photos, caption):
+        from telegram import InputMediaPhoto
+
+        # The caption of the first item is shown for the whole group.
+        media = [InputMediaPhoto(media=photo, caption=caption if i == 0 else None)
+                 for i, photo in enumerate(photos)]
+        return self._run(self.bot.send_media_group(chat_id=chat_id, media=media))
+
+class StubTransport:
+    """
+    In-memory transport for tests and offline runs.
+
+    Records every delivery in ``sent``. ``fail_times`` makes the next N calls
+    raise, ``latency`` simulates network time.
+    """
+
+    def __init__(self, latency=0.0, fail_times=0):
+        self.latency = latency
+        self.fail_times = fail_times
+        self.sent = []
+
+    def _deliver(self, kind, chat_id, payload):
+        time.sleep(self.latency)
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise ConnectionError("stub transport failure")
+        self.sent.append({"kind": kind, "chat_id": chat_id, "time": time.time(), **payload})
+
+    def send_photo(self, chat_id, photo, caption):
+        self._deliver("photo", chat_id, {"caption": caption, "bytes": len(photo.getvalue())})
+
+    def send_message(self, chat_id, text):
+        self._deliver("message", chat_id, {"text": text})
+
+    def send_document(self, chat_id, document, caption):
+        self._deliver("document", chat_id, {"caption": caption})
+
+    def send_media_group(self, chat_id, photos, caption):
+        self._deliver("media_group", chat_id, {"caption": caption, "photos": len(photos)})
+
+class _Batch:
+    """ Alerts for one chat waiting to be sent together. """
+    __slots__ = ("first", "last", "lead", "line", "photos", "severities", "total")
+
+    def __init__(self, now, lead, line):
+        self.first = now
+        self.last = now            # time of the latest alert
+        self.lead = lead           # first alert of an incident: sent without waiting
+        self.line = line           # caption of the first alert
+        self.photos = []           # (time, frame, filename, line)
+        self.severities = Counter()
+        self.total = 0
+
+def build_caption(batch):
+    """ One caption for a batch: counts per severity, then a line per attached photo. """
+    if batch.total == 1:
+        return f"Mini SentryAI+ Alert: {batch.line}"
+    counts = ", ".join(f"{n} {severity.upper()}" for severity, n in batch.severities.most_common())
+    lines = [f"Mini SentryAI+ Alert: {batch.total} detections ({counts})"]
+    lines += [f"- {time.strftime('%H:%M:%S', time.localtime(t))} {line}" for t, _, _, line in batch.photos]
+    if batch.total > len(batch.photos):
+        lines.append(f"(+{batch.total - len(batch.photos)} more detections without photo)")
+    caption = "\n".join(lines)
+    return caption if len(caption) <= CAPTION_MAX_CHARS else caption[:CAPTION_MAX_CHARS - 3] + "..."
+
+class AlertDispatcher:
+    """ Coalesces alerts per chat and delivers them through a transport on a worker thread. """
+
+    def __init__(self, transport, coalesce_seconds=ALERT_COALESCE_SECONDS,
+                 coalesce_max_seconds=ALERT_COALESCE_MAX_SECONDS, max_retries=ALERT_MAX_RETRIES,
+                 backoff_base=ALERT_BACKOFF_BASE, chat_min_interval=CHAT_MIN_INTERVAL,
+                 max_pending_photos=MAX_PENDING_PHOTOS, limiter=None):
+        self.transport = transport
+        self.coalesce_seconds = coalesce_seconds
+        self.coalesce_max_seconds = coalesce_max_seconds
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.chat_min_interval = chat_min_interval
+        self.limiter = limiter or ChatRateLimiter(chat_min_interval)
+        self.max_pending_photos = max_pending_photos
+        self._cond = threading.Condition()
+        self._batches = {}                 # chat_id -> _Batch
+        self._last_alert = {}              # chat_id -> time of the latest submitted alert
+        self._pending_photos = 0
+        self._in_flight = 0
+        self._thread = None
+        self._latencies = deque(maxlen=200)
+        self._counters = {"submitted": 0, "delivered": 0, "messages": 0, "failed": 0,
+                          "coalesced": 0, "retries": 0}
+
+    def submit(self, chat_id, frame, caption, filename="alert.jpg", severity="danger"):
+        """
+        Adds an alert (BGR frame or EncodedFrame) to the chat's pending batch. Never blocks.
+        ``caption`` is a one-line description, e.g. "DANGER: gun & violence".
+
+        An alert after at least ``coalesce_seconds`` of quiet starts a new
+        incident and is sent as soon as the rate limit allows; later alerts
+        wait for the incident to go quiet (or for ``coalesce_max_seconds``).
+
+        The frame is attached if the batch still has room for it (see
+        MEDIA_GROUP_MAX / PHOTO_MIN_GAP); otherwise the alert is only counted
+        in the combined caption.
+
+        Returns:
+            bool: True if the frame will be attached
+        """
+        now = time.time()
+        with self._cond:
+            self._counters["submitted"] += 1
+            batch = self._batches.get(chat_id)
+            if batch is None:
+                lead = now - self._last_alert.get(chat_id, float("-inf")) >= self.coalesce_seconds
+                batch = self._batches[chat_id] = _Batch(now, lead, caption)
+            self._last_alert[chat_id] = batch.last = now
+            batch.total += 1
+            batch.severities[severity] += 1
+            attach = (len(batch.photos) < MEDIA_GROUP_MAX
+                      and self._pending_photos < self.max_pending_photos
+                      and (not batch.photos or now - batch.photos[-1][0] >= PHOTO_MIN_GAP))
+            if attach:
+                batch.photos.append((now, frame, filename, caption))
+                self._pending_photos += 1
+            else:
+                self._counters["coalesced"] += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return attach
+
+    def _closes_at(self, batch):
+        if batch.lead:
+            return batch.first
+        return min(batch.last + self.coalesce_seconds, batch.first + self.coalesce_max_seconds)
+
+    def _next_batch(self):
+        """ Waits for the first batch whose window closed and whose chat may send again. """
+        with self._cond:
+            while True:
+                now = time.time()
+                due = [(max(self._closes_at(b), self.limiter.next_allowed(chat_id)), chat_id)
+                       for chat_id, b in self._batches.items()]
+                if due:
+                    when, chat_id = min(due)
+                    if when <= now:
+                        batch = self._batches.pop(chat_id)
+                        self._pending_photos -= len(batch.photos)
+                        self._in_flight += 1
+                        return chat_id, batch
+                    self._cond.wait(when - now)
+                else:
+                    self._cond.wait()
+
+    def _deliver(self, chat_id, batch):
+        # EncodedFrames reuse the bytes already produced for the screenshot.
+        encoded = []
+        for _, frame, filename, _ in batch.photos:
+            try:
+                encoded.append((as_encoded(frame).jpeg("full"), filename))
+            except Exception as e:
+                print(f"[WARN] Could not encode alert frame: {e}")
+        caption = build_caption(batch)
+        for attempt in range(self.max_retries + 1):
+            photos = []
+            for data, filename in encoded:
+                photo = BytesIO(data)
+                photo.name = filename
+                photos.append(photo)
+            self.limiter.acquire(chat_id)
+            try:
+                # No frame could be attached or encoded: still report the detections.
+                if not photos:
+                    return self.transport.send_message(chat_id, caption)
+                if len(photos) == 1:
+                    return self.transport.send_photo(chat_id, photos[0], caption)
+                return self.transport.send_media_group(chat_id, photos, caption)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                with self._cond:
+                    self._counters["retries"] += 1
+                # Honour Telegram's flood control (RetryAfter) when it tells us how long to wait.
+                delay = getattr(e, "retry_after", None) or \
+                    self.backoff_base * (2 ** attempt) * random.uniform(0.5, 1.5)
+                print(f"[WARN] Alert delivery failed ({e}), retrying in {float(delay):.1f}s...")
+                time.sleep(float(delay))
+
+    def _run(self):
+        while True:
+            chat_id, batch = self._next_batch()
+            try:
+                with stage("alert_deliver", TASK_SECONDS):
+                    self._deliver(chat_id, batch)
+                latency = time.time() - batch.first
+                with self._cond:
+                    self._counters["delivered"] += batch.total
+                    self._counters["messages"] += 1
+                    self._latencies.append(latency)
+                print(f"[INFO] Telegram alert delivered ({batch.total} detections, "
+                      f"{len(batch.photos)} photos) {latency:.2f}s after the first detection.")
+            except Exception as e:
+                with self._cond:
+                    self._counters["failed"] += batch.total
+                print(f"[ERROR] Failed to send Telegram alert: {e}")
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+
+    def join(self, timeout=None):
+        """ Blocks until every pending alert was delivered or given up on. """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._batches or self._in_flight:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stats(self):
+        """ Delivery counters, pending alerts and first-detection-to-delivery latency. """
+        with self._cond:
+            stats = dict(self._counters)
+            stats["pending"] = sum(b.total for b in self._batches.values())
+            stats["pending_photos"] = self._pending_photos
+            latencies = sorted(self._latencies)
+        if latencies:
+            stats["latency_avg"] = round(sum(latencies) / len(latencies), 3)
+            stats["latency_p95"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3)
+        return stats
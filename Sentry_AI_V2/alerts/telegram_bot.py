@@ -3,6 +3,8 @@ import telegram
 
 from dotenv import load_dotenv
 
+from alerts.dispatcher import AlertDispatcher, ChatRateLimiter, TelegramTransport
+
 # Load .env variables
 load_dotenv()
 
@@ -11,31 +13,55 @@ CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
 # Initialize bot
 bot = telegram.Bot(token=BOT_TOKEN)
+transport = TelegramTransport(bot)
+
+# Alerts and reports share one per-chat rate limit.
+chat_limiter = ChatRateLimiter()
+
+# Instant alerts are delivered in the background (see alerts/dispatcher.py).
+alert_dispatcher = AlertDispatcher(transport, limiter=chat_limiter)
+
+TELEGRAM_MESSAGE_LIMIT = 4096  # max characters per text message
 
 # -------------------- Send instant image alert --------------------
-def send_alert(frame, severity):
+def send_alert(frame, severity, details=None):
     """
-    Sends a single frame as a Telegram alert.
+    Queues a frame as a Telegram alert and returns immediately.
+
+    Alerts arriving close together are sent as one media group with a
+    combined caption (see alerts/dispatcher.py).
     
     Args:
-        frame: OpenCV image (BGR)
+        frame: OpenCV image (BGR) or EncodedFrame (reuses its JPEG bytes)
         severity: string, e.g., 'danger' or 'suspicious'
-    """
-    try:
-        import cv2
-        from io import BytesIO
+        details: optional short description, e.g. 'gun, knife & violence'
 
-        # Convert frame to JPEG bytes
-        _, buffer = cv2.imencode(".jpg", frame)
-        image_bytes = BytesIO(buffer.tobytes())
-        image_bytes.name = f"{severity}_alert.jpg"
+    Returns:
+        bool: True if the frame will be attached (otherwise it is only counted in the caption)
+    """
+    caption = severity.upper() + (f": {details}" if details else "")
+    return alert_dispatcher.submit(CHAT_ID, frame, caption, filename=f"{severity}_alert.jpg", severity=severity)
 
-        caption = f"Mini SentryAI+ Alert: {severity.upper()}"
+def get_alert_stats():
+    return alert_dispatcher.stats()
 
-        bot.send_photo(chat_id=CHAT_ID, photo=image_bytes, caption=caption)
-        print(f"[INFO] Telegram {severity} alert sent.")
-    except Exception as e:
-        print(f"[ERROR] Failed to send Telegram alert: {e}")
+def split_message(text, limit=TELEGRAM_MESSAGE_LIMIT):
+    """ Splits text into chunks of at most `limit` characters, preferring paragraph, line and word breaks. """
+    chunks = []
+    text = text.strip()
+    while len(text) > limit:
+        window = text[:limit]
+        cut = limit
+        for separator in ("\n\n", "\n", " "):
+            index = window.rfind(separator)
+            if index >= limit // 2:
+                cut = index
+                break
+        chunks.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        chunks.append(text)
+    return chunks
 
 # -------------------- Send PDF with summary --------------------
 def send_pdf_with_summary(pdf_path, summary_text=None):
@@ -46,15 +72,18 @@ def send_pdf_with_summary(pdf_path, summary_text=None):
     try:
         # ------------------ Send summary in chunks ------------------
         if summary_text:
-            max_len = 1000  # Telegram safe limit
-            chunks = [summary_text[i:i+max_len] for i in range(0, len(summary_text), max_len)]
+            # Leave room for the "Summary part i/n:" header.
+            chunks = split_message(summary_text, TELEGRAM_MESSAGE_LIMIT - 32)
             for idx, chunk in enumerate(chunks, 1):
-                bot.send_message(chat_id=CHAT_ID, text=f"Summary part {idx}/{len(chunks)}:\n{chunk}")
+                header = f"Summary part {idx}/{len(chunks)}:\n" if len(chunks) > 1 else "Summary:\n"
+                chat_limiter.acquire(CHAT_ID)
+                transport.send_message(CHAT_ID, header + chunk)
 
         # ------------------ Send PDF ------------------
         caption = "Mini SentryAI+ Final Report"
         with open(pdf_path, "rb") as pdf_file:
-            bot.send_document(chat_id=CHAT_ID, document=pdf_file, caption=caption)
+            chat_limiter.acquire(CHAT_ID)
+            transport.send_document(CHAT_ID, pdf_file, caption)
 
         print("[INFO] Telegram PDF report sent.")
     except Exception as e:
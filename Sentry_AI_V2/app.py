@@ -1,20 +1,31 @@
 import os
 import cv2
 import time
+import queue
 import threading
 from datetime import datetime
+from functools import partial
 from flask import Flask, request, jsonify, send_file, Response
 from flask_cors import CORS
 
 # --- SentryAI module imports ---
 from input.camera_stream import capture_frames
-from detector.yolo_detector import detect_from_frame
-from detector.violence_detector import run_violence_detection
+from detector.yolo_detector import detect_from_frame, get_detect_stats
+from detector.violence_detector import run_violence_detection, top_violence_class
 from detector.severity_selector import select_severity
-from llm.llm_summary import generate_summary_from_events
-from reports.report_generator import generate_pdf_report
-from alerts.telegram_bot import send_alert, send_pdf_with_summary
-from database.event_logger import log_report, get_reports, delete_report
+from detector.detections import empty_detections
+from reports.report_worker import submit_report, get_job, list_jobs, queue_depth
+from reports.incremental_report import IncrementalReport
+from reports.report_generator import warm_report_images
+from alerts.telegram_bot import send_alert, get_alert_stats
+from pipeline.encoded_frame import EncodedFrame, get_encode_stats
+from pipeline.annotate import draw_annotations
+from pipeline.metrics import FRAMES, EVENTS, Counter, Gauge, stage, timed_iter, render_metrics
+from pipeline.profiler import ProfilerBusy, profile_thread, checkpoint as profiler_checkpoint
+from pipeline.quality import AdaptiveQuality
+from pipeline.triage import TemporalTriage
+from llm.llm_summary import get_llm_stats
+from database.event_logger import get_reports, delete_report, log_event, query_events, get_event_stats
 
 # Set a longer timeout for network streams
 os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = "timeout;60000"
@@ -28,65 +39,63 @@ os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 os.makedirs(SCREENSHOT_DIR, exist_ok=True)
 
 YOLO_CONF_THRESHOLD = 0.4
-ALERT_COOLDOWN = 15
+UPLOAD_FRAME_STRIDE = int(os.getenv("UPLOAD_FRAME_STRIDE", "1"))  # analyse every Nth frame of uploads
+UPLOAD_SCAN_MODE = os.getenv("UPLOAD_SCAN_MODE", "full")  # "full" or "triage" (sparse pass, then dense windows)
+EVENT_SEVERITIES = ("danger", "suspicious")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # required in the X-Admin-Token header of /api/admin/* when set
 
 # -------------------- Flask App Setup --------------------
 app = Flask(__name__)
 CORS(app)
 
-# -------------------- Annotation Helper Function --------------------
-def draw_annotations(frame, yolo_results, violence_results):
-    """Draws bounding boxes for both object and violence detection."""
-    annotated_frame = frame.copy()
-    for det in yolo_results:
-        try:
-            x1, y1, x2, y2 = map(int, det["bbox"])
-            label = f"Object: {det['class']} ({det.get('confidence', 0.0):.2f})"
-            color = (0, 255, 0)
-            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
-            cv2.putText(annotated_frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-        except Exception as e:
-            print(f"Could not draw object annotation: {e}")
-    for det in violence_results:
-        if det.get("class") == "violence":
-            try:
-                x1, y1, x2, y2 = map(int, det["bbox"])
-                label = f"Action: {det['class']} ({det.get('confidence', 0.0):.2f})"
-                color = (0, 0, 255)
-                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
-                cv2.putText(annotated_frame, label, (x1, y2 + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-            except Exception as e:
-                print(f"Could not draw violence annotation: {e}")
-    return annotated_frame
-
 # -------------------- Real-time Camera State Management --------------------
 camera_thread = None
 is_camera_processing = threading.Event()
 camera_alert_buffer = []
 camera_report_buffer = []
 lock = threading.Lock()
-last_alert_time = 0
 latest_camera_frame = None
+camera_incremental_report = None  # pages for camera_report_buffer, laid out as events arrive
+camera_quality = None  # AdaptiveQuality of the running camera loop
 
 # -------------------- Workflow 1: Uploaded Video Processing --------------------
+def analyse_upload_frame(frame):
+    """ Both detectors and the severity of one uploaded frame. """
+    FRAMES.inc(pipeline="upload")
+    yolo_results = detect_from_frame(frame, threshold=YOLO_CONF_THRESHOLD)
+    violence_results = run_violence_detection(frame)
+    with stage("severity"):
+        violence_prediction, _ = top_violence_class(violence_results)
+        severity = select_severity(yolo_results, violence_prediction)
+    return yolo_results, violence_results, violence_prediction, severity
+
 @app.route("/api/process-video", methods=["POST"])
 def process_video():
     if "file" not in request.files: return jsonify({"error": "No file provided"}), 400
     video = request.files["file"]
     save_path = os.path.join(UPLOAD_FOLDER, video.filename)
     video.save(save_path)
-    video_specific_events, local_last_alert_time = [], 0
+    scan_mode = request.form.get("mode", UPLOAD_SCAN_MODE)
+    if scan_mode not in ("full", "triage"):
+        return jsonify({"error": f"Unknown scan mode: {scan_mode}"}), 400
+    video_specific_events = []
+    incremental_report = IncrementalReport()
     try:
-        for frame_count, (frame, _) in enumerate(capture_frames(save_path)):
-            yolo_results = detect_from_frame(frame, threshold=YOLO_CONF_THRESHOLD)
-            violence_results = run_violence_detection(frame)
-            violence_prediction = violence_results[0]['class']
-            severity = select_severity(yolo_results, violence_prediction)
-            
-            if severity in ["danger", "suspicious"]:
-                annotated_frame = draw_annotations(frame, yolo_results, violence_results)
+        if scan_mode == "triage":
+            scan = TemporalTriage(save_path, analyse_upload_frame, lambda result: result[3] in EVENT_SEVERITIES)
+        else:
+            # Frames are decoded ahead on a background thread while this one runs the models;
+            # time spent waiting for the decoder shows up as the decode_wait stage.
+            frames = capture_frames(save_path, stride=UPLOAD_FRAME_STRIDE)
+            scan = ((frame, index, analyse_upload_frame(frame))
+                    for frame, index in timed_iter(frames, "decode_wait"))
+        for frame, frame_count, (yolo_results, violence_results, violence_prediction, severity) in scan:
+            if severity in EVENT_SEVERITIES:
+                EVENTS.inc(pipeline="upload", severity=severity)
+                annotated_frame = EncodedFrame(render=partial(draw_annotations, frame, yolo_results, violence_results))
                 screenshot_path = os.path.abspath(os.path.join(SCREENSHOT_DIR, f"upload_{time.time()}.jpg"))
-                cv2.imwrite(screenshot_path, annotated_frame)
+                if annotated_frame.save(screenshot_path):
+                    warm_report_images(screenshot_path, annotated_frame)
                 
                 yolo_classes = [f"{det['class']}" for det in yolo_results]
                 alert_message = {
@@ -109,43 +118,68 @@ def process_video():
                     "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 }
                 video_specific_events.append(event_data)
-                if severity == "danger" and (time.time() - local_last_alert_time) > ALERT_COOLDOWN:
-                    send_alert(annotated_frame, severity)
-                    local_last_alert_time = time.time()
+                incremental_report.add_event(event_data)
+                log_event(frame, yolo_results, violence_prediction, severity,
+                          source=f"upload:{video.filename}", screenshot=screenshot_path)
+                if severity == "danger":
+                    send_alert(annotated_frame, severity,
+                               details=f"{', '.join(yolo_classes)} & {violence_prediction} ({video.filename})")
 
+        job_id = None
         if video_specific_events:
-            summary_text = generate_summary_from_events(video_specific_events)
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             pdf_path = os.path.join(OUTPUT_FOLDER, f"SentryAI_Report_{timestamp}.pdf")
-            generate_pdf_report(video_specific_events, summary_text, pdf_path)
-            send_pdf_with_summary(pdf_path, summary_text)
-            log_report('upload', summary_text, pdf_path)
-        return jsonify({"status": "Video processed and report generated.", "events_found": len(video_specific_events)})
+            job_id = submit_report(video_specific_events, 'upload', pdf_path, incremental=incremental_report)
+        else:
+            incremental_report.discard()
+        return jsonify({
+            "status": "Video processed; report is being generated." if job_id else "Video processed. No events found.",
+            "events_found": len(video_specific_events),
+            "job_id": job_id,
+            "scan": scan.stats if scan_mode == "triage" else {"mode": "full"}
+        })
+    except queue.Full:
+        incremental_report.discard()
+        return jsonify({"error": "Report queue is full, try again later."}), 503
     except Exception as e:
+        incremental_report.discard()
         print(f"Error processing uploaded video: {e}")
         return jsonify({"error": f"Failed to analyze video: {e}"}), 500
 
 # -------------------- Workflow 2: Live Camera Processing (Hybrid Approach) --------------------
 def camera_analysis_loop_local(source=0):
-    global last_alert_time, latest_camera_frame
+    global latest_camera_frame, camera_quality
+    quality = camera_quality = AdaptiveQuality()
     try:
-        for frame_count, (frame, _) in enumerate(capture_frames(source)):
+        for frame_count, (frame, _) in enumerate(timed_iter(capture_frames(source), "decode_wait")):
             if not is_camera_processing.is_set(): break
-            yolo_results = detect_from_frame(frame, threshold=YOLO_CONF_THRESHOLD)
-            violence_results = run_violence_detection(frame)
-            violence_prediction = violence_results[0]['class']
-            annotated_frame = draw_annotations(frame, yolo_results, violence_results)
+            if not quality.should_analyse(frame_count): continue
+            started = time.perf_counter()
+            profiler_checkpoint()
+            FRAMES.inc(pipeline="camera")
+            settings = quality.settings
+            yolo_results = detect_from_frame(frame, threshold=YOLO_CONF_THRESHOLD, imgsz=settings.imgsz)
+            violence_results = (run_violence_detection(frame, imgsz=settings.imgsz) if settings.violence
+                                else empty_detections())
+            # Annotated only if the feed, a screenshot or an alert needs the pixels,
+            # then encoded at most once per preset.
+            annotated_frame = EncodedFrame(render=partial(draw_annotations, frame, yolo_results, violence_results))
             with lock:
-                latest_camera_frame = annotated_frame.copy()
-            severity = select_severity(yolo_results, violence_prediction)
+                latest_camera_frame = annotated_frame
+            with stage("severity"):
+                violence_prediction, _ = top_violence_class(violence_results)
+                severity = select_severity(yolo_results, violence_prediction)
             
             if severity in ["danger", "suspicious"]:
+                EVENTS.inc(pipeline="camera", severity=severity)
                 screenshot_path = os.path.abspath(os.path.join(SCREENSHOT_DIR, f"live_local_{time.time()}.jpg"))
                 try:
-                    save_success = cv2.imwrite(screenshot_path, annotated_frame)
+                    save_success = annotated_frame.save(screenshot_path)
                     if not save_success:
                         print(f"⚠️ WARNING: Failed to save screenshot to {screenshot_path}")
                         screenshot_path = None
+                    else:
+                        warm_report_images(screenshot_path, annotated_frame)
                 except Exception as e:
                     print(f"!!! ERROR saving screenshot: {e}")
                     screenshot_path = None
@@ -162,14 +196,20 @@ def camera_analysis_loop_local(source=0):
                         "yolo_object": ", ".join(yolo_strings),
                         "yolo_violence": violence_prediction,
                         "final": severity,
-                        "screenshot": screenshot_path
+                        "screenshot": screenshot_path,
+                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     }
                     with lock:
                         camera_alert_buffer.append(alert_message)
                         camera_report_buffer.append(report_data)
-                    if severity == "danger" and (time.time() - last_alert_time) > ALERT_COOLDOWN:
-                        send_alert(annotated_frame, severity)
-                        last_alert_time = time.time()
+                        if camera_incremental_report is not None:
+                            camera_incremental_report.add_event(report_data)
+                    log_event(frame, yolo_results, violence_prediction, severity,
+                              source=f"camera:{source}", screenshot=screenshot_path)
+                    if severity == "danger":
+                        send_alert(annotated_frame, severity,
+                                   details=f"{', '.join(yolo_classes)} & {violence_prediction} (camera {source})")
+            quality.observe(time.perf_counter() - started)
     except Exception as e:
         print(f"Error in LOCAL camera analysis thread: {e}")
     finally:
@@ -177,7 +217,8 @@ def camera_analysis_loop_local(source=0):
         print("Local camera analysis thread stopped.")
 
 def camera_analysis_loop_network(source=0):
-    global last_alert_time, latest_camera_frame
+    global latest_camera_frame, camera_quality
+    quality = camera_quality = AdaptiveQuality()
     cap = None
     try:
         cap = cv2.VideoCapture(source)
@@ -186,27 +227,44 @@ def camera_analysis_loop_network(source=0):
             return
         frame_count = 0
         while is_camera_processing.is_set():
-            cap.grab()
-            success, frame = cap.retrieve()
+            with stage("decode"):
+                success, frame = cap.grab(), None
+                # Frames skipped by the quality stride are grabbed but never decoded.
+                if success and quality.should_analyse(frame_count):
+                    success, frame = cap.retrieve()
             if not success:
                 time.sleep(0.1)
                 continue
-            yolo_results = detect_from_frame(frame, threshold=YOLO_CONF_THRESHOLD)
-            violence_results = run_violence_detection(frame)
-            violence_prediction = violence_results[0]['class']
-            annotated_frame = draw_annotations(frame, yolo_results, violence_results)
+            if frame is None:
+                frame_count += 1
+                continue
+            started = time.perf_counter()
+            profiler_checkpoint()
+            FRAMES.inc(pipeline="camera")
+            settings = quality.settings
+            yolo_results = detect_from_frame(frame, threshold=YOLO_CONF_THRESHOLD, imgsz=settings.imgsz)
+            violence_results = (run_violence_detection(frame, imgsz=settings.imgsz) if settings.violence
+                                else empty_detections())
+            # Annotated only if the feed, a screenshot or an alert needs the pixels,
+            # then encoded at most once per preset.
+            annotated_frame = EncodedFrame(render=partial(draw_annotations, frame, yolo_results, violence_results))
             with lock:
-                latest_camera_frame = annotated_frame.copy()
-            severity = select_severity(yolo_results, violence_prediction)
+                latest_camera_frame = annotated_frame
+            with stage("severity"):
+                violence_prediction, _ = top_violence_class(violence_results)
+                severity = select_severity(yolo_results, violence_prediction)
 
             if severity in ["danger", "suspicious"]:
+                EVENTS.inc(pipeline="camera", severity=severity)
                 # ✅ FIXED: Use an absolute path and add error checking for network stream screenshots.
                 screenshot_path = os.path.abspath(os.path.join(SCREENSHOT_DIR, f"live_network_{time.time()}.jpg"))
                 try:
-                    save_success = cv2.imwrite(screenshot_path, annotated_frame)
+                    save_success = annotated_frame.save(screenshot_path)
                     if not save_success:
                         print(f"⚠️ WARNING: Failed to save NETWORK screenshot to {screenshot_path}")
                         screenshot_path = None
+                    else:
+                        warm_report_images(screenshot_path, annotated_frame)
                 except Exception as e:
                     print(f"!!! ERROR saving NETWORK screenshot: {e}")
                     screenshot_path = None
@@ -223,14 +281,20 @@ def camera_analysis_loop_network(source=0):
                         "yolo_object": ", ".join(yolo_strings),
                         "yolo_violence": violence_prediction,
                         "final": severity,
-                        "screenshot": screenshot_path
+                        "screenshot": screenshot_path,
+                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     }
                     with lock:
                         camera_alert_buffer.append(alert_message)
                         camera_report_buffer.append(report_data)
-                    if severity == "danger" and (time.time() - last_alert_time) > ALERT_COOLDOWN:
-                        send_alert(annotated_frame, severity)
-                        last_alert_time = time.time()
+                        if camera_incremental_report is not None:
+                            camera_incremental_report.add_event(report_data)
+                    log_event(frame, yolo_results, violence_prediction, severity,
+                              source=f"camera:{source}", screenshot=screenshot_path)
+                    if severity == "danger":
+                        send_alert(annotated_frame, severity,
+                                   details=f"{', '.join(yolo_classes)} & {violence_prediction} (camera {source})")
+            quality.observe(time.perf_counter() - started)
             frame_count += 1
             time.sleep(0.01)
     except Exception as e:
@@ -242,7 +306,7 @@ def camera_analysis_loop_network(source=0):
 
 @app.route("/api/start_camera", methods=["POST"])
 def start_camera_analysis():
-    global camera_thread
+    global camera_thread, camera_incremental_report
     if camera_thread is None or not camera_thread.is_alive():
         data = request.get_json()
         video_source = data.get('source', 0) if data else 0
@@ -255,6 +319,9 @@ def start_camera_analysis():
         with lock:
             camera_alert_buffer.clear()
             camera_report_buffer.clear()
+            previous_report, camera_incremental_report = camera_incremental_report, IncrementalReport()
+        if previous_report is not None:
+            previous_report.discard()
         camera_thread = threading.Thread(target=target_loop, args=(video_source,), daemon=True)
         camera_thread.start()
         print(f"Starting analysis with {'NETWORK' if is_network_stream else 'LOCAL'} loop for source: {video_source}")
@@ -273,22 +340,45 @@ def stop_camera_analysis():
 
 @app.route("/api/generate-camera-report", methods=["POST"])
 def generate_camera_report():
+    global camera_incremental_report
     with lock:
         if not camera_report_buffer: return jsonify({"status": "No events to report."}), 404
         events_to_report = list(camera_report_buffer)
         camera_report_buffer.clear()
         camera_alert_buffer.clear()
+        # Hand the pre-built pages to the report job; new events start a fresh report.
+        report_pages, camera_incremental_report = camera_incremental_report, IncrementalReport()
     try:
-        summary_text = generate_summary_from_events(events_to_report)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         pdf_path = os.path.join(OUTPUT_FOLDER, f"SentryAI_LiveReport_{timestamp}.pdf")
-        generate_pdf_report(events_to_report, summary_text, pdf_path)
-        send_pdf_with_summary(pdf_path, summary_text)
-        log_report('camera', summary_text, pdf_path)
-        return jsonify({"status": f"Report generated and sent with {len(events_to_report)} events."})
-    except Exception as e:
-        print(f"!!! [Report Generation] AN ERROR OCCURRED: {e} !!!")
-        return jsonify({"status": f"An error occurred during report generation: {e}"}), 500
+        job_id = submit_report(events_to_report, 'camera', pdf_path, incremental=report_pages)
+        return jsonify({
+            "status": f"Report with {len(events_to_report)} events queued; it will be sent when ready.",
+            "job_id": job_id
+        }), 202
+    except queue.Full:
+        # Put the events back so they are not lost; their pages are rebuilt.
+        if report_pages is not None:
+            report_pages.discard()
+        with lock:
+            camera_report_buffer[:0] = events_to_report
+            if camera_incremental_report is not None:
+                camera_incremental_report.discard()
+            camera_incremental_report = IncrementalReport()
+            for event in camera_report_buffer:
+                camera_incremental_report.add_event(event)
+        return jsonify({"status": "Report queue is full, try again later."}), 503
+
+@app.route("/api/report-jobs", methods=["GET"])
+def fetch_report_jobs():
+    return jsonify(list_jobs())
+
+@app.route("/api/report-jobs/<job_id>", methods=["GET"])
+def fetch_report_job(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Report job not found."}), 404
+    return jsonify(job)
 
 @app.route("/api/reports", methods=["GET"])
 def fetch_reports():
@@ -313,22 +403,129 @@ def download_report(filename):
         return send_file(file_path, as_attachment=True)
     return jsonify({"error": "File not found."}), 404
 
+def _event_filters_from_request():
+    """Reads the shared /api/events query parameters."""
+    args = request.args
+    return {
+        "start": args.get("start"),
+        "end": args.get("end"),
+        "severity": args.get("severity"),
+        "source": args.get("source"),
+        "detected_class": args.get("class"),
+    }
+
+@app.route("/api/events", methods=["GET"])
+def fetch_events():
+    try:
+        filters = _event_filters_from_request()
+        result = query_events(
+            limit=request.args.get("limit", 100, type=int),
+            offset=request.args.get("offset", 0, type=int),
+            newest_first=request.args.get("order", "desc") != "asc",
+            **filters
+        )
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/events/stats", methods=["GET"])
+def fetch_event_stats():
+    try:
+        filters = _event_filters_from_request()
+        stats = get_event_stats(bucket_seconds=request.args.get("bucket", 3600, type=int), **filters)
+        return jsonify(stats)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
 @app.route("/api/alerts", methods=["GET"])
 def get_alerts():
     with lock: return jsonify(camera_alert_buffer[-5:][::-1])
 
+@app.route("/api/llm-stats", methods=["GET"])
+def fetch_llm_stats():
+    return jsonify(get_llm_stats())
+
+@app.route("/api/alert-stats", methods=["GET"])
+def fetch_alert_stats():
+    return jsonify(get_alert_stats())
+
+@app.route("/api/encode-stats", methods=["GET"])
+def fetch_encode_stats():
+    return jsonify(get_encode_stats())
+
+# Queue depths are read when /api/metrics is scraped.
+Gauge("sentry_report_queue_depth", "Report jobs waiting for the report worker.", callback=queue_depth)
+Gauge("sentry_alert_pending", "Detections waiting in alert batches.", callback=lambda: get_alert_stats().get("pending", 0))
+Gauge("sentry_alert_pending_photos", "Alert frames held in memory.", callback=lambda: get_alert_stats().get("pending_photos", 0))
+Gauge("sentry_camera_report_buffer", "Camera events not yet in a report.", callback=lambda: len(camera_report_buffer))
+Gauge("sentry_camera_running", "1 while the camera thread is analysing.", callback=lambda: int(is_camera_processing.is_set()))
+# Module counters only grow, so they are exposed as Prometheus counters.
+for _key in ("requests", "api_calls", "retries", "errors", "map_reduce", "local_fallbacks"):
+    Counter(f"sentry_llm_{_key}_total", f"LLM summary {_key.replace('_', ' ')} (see /api/llm-stats).",
+            callback=lambda key=_key: get_llm_stats()[key])
+for _key in ("hits", "misses"):
+    Counter(f"sentry_llm_cache_{_key}_total", f"LLM summary cache {_key}.",
+            callback=lambda key=_key: get_llm_stats()["cache"][key])
+Gauge("sentry_llm_cache_entries", "LLM summaries held in the cache.", callback=lambda: get_llm_stats()["cache"]["entries"])
+for _key in ("frames", "renders", "encodes", "cache_hits"):
+    Counter(f"sentry_encode_{_key}_total", f"Frame render / JPEG encode {_key.replace('_', ' ')} (see /api/encode-stats).",
+            callback=lambda key=_key: get_encode_stats()[key])
+
+@app.route("/api/detect-stats", methods=["GET"])
+def fetch_detect_stats():
+    return jsonify(get_detect_stats())
+
+@app.route("/api/metrics", methods=["GET"])
+def fetch_metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/admin/profile", methods=["POST"])
+def profile_camera():
+    """
+    Profiles the camera analysis thread for N seconds and returns where the time went.
+    Body: {"seconds": 10, "mode": "sample" | "cprofile", "interval_ms": 5}
+    ?format=collapsed returns the sampled stacks as plain text for flamegraph tools.
+    """
+    if ADMIN_TOKEN and request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        return jsonify({"error": "Forbidden."}), 403
+    thread = camera_thread
+    if thread is None or not thread.is_alive():
+        return jsonify({"error": "Camera analysis is not running."}), 409
+    data = request.get_json(silent=True) or {}
+    try:
+        result = profile_thread(thread, seconds=float(data.get("seconds", 10)),
+                                mode=data.get("mode", "sample"),
+                                interval=float(data.get("interval_ms", 5)) / 1000)
+    except ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    if request.args.get("format") == "collapsed" and "collapsed" in result:
+        return Response(result["collapsed"] + "\n", mimetype="text/plain")
+    return jsonify(result)
+
+@app.route("/api/quality", methods=["GET"])
+def fetch_quality():
+    quality = camera_quality
+    if quality is None:
+        return jsonify({"status": "Camera analysis has not run yet."}), 404
+    return jsonify(quality.stats())
+
 @app.route("/api/health", methods=["GET"])
 def health_check():
     return {"status": "ok", "message": "Sentry AI is running"}, 200
 
 def gen_frames_from_thread():
+    last_sent = None
     while True:
         time.sleep(0.03)
         with lock:
             if not is_camera_processing.is_set(): break
-            if latest_camera_frame is None: continue
-            ret, buffer = cv2.imencode('.jpg', latest_camera_frame)
-            frame_bytes = buffer.tobytes()
+            current = latest_camera_frame
+        # Only new frames are sent; each is encoded once however many clients watch.
+        if current is None or current is last_sent: continue
+        frame_bytes = current.jpeg("feed")
+        last_sent = current
         yield (b'--frame\r\n'
                b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
 
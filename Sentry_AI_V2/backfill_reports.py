@@ -1,54 +1,196 @@
 # In backfill_reports.py
+# Incremental indexer for PDF reports in the output folder.
+#
+#   python backfill_reports.py              # index new / changed PDFs once
+#   python backfill_reports.py --watch      # keep indexing, polling every REPORT_INDEX_INTERVAL s
+#   python backfill_reports.py --prune      # also drop catalogue entries of deleted PDFs
+#
+# The size and mtime of every PDF seen are kept in a state file next to
+# the logs, together with the directories listed and a watermark (when
+# the last pass started). A directory whose mtime is older than the
+# watermark has the same entries as then, so it is not listed again
+# (screenshot folders hold thousands of files); only the PDFs known in
+# it are re-stat'ed, which still catches reports rewritten in place. The
+# report catalogue (report_log.json, via database.event_logger) is only
+# touched when a PDF is new or changed, so polling costs next to nothing.
+# Deleted PDFs stay in the state until a --prune pass drops them.
 import os
 import json
+import time
+import argparse
 from datetime import datetime
 
-OUTPUT_FOLDER = "output"
-REPORT_LOG_FILE = "database/logs/event_log.json"
+from database.event_logger import LOG_DIR, PROJECT_ROOT, get_report_paths, sync_reports
 
-def backfill():
-    print("--- Starting backfill process for existing PDFs ---")
-    
-    # Load existing reports to avoid duplicates
-    existing_reports = []
-    if os.path.exists(REPORT_LOG_FILE):
-        with open(REPORT_LOG_FILE, "r") as f:
+OUTPUT_FOLDER = os.path.join(PROJECT_ROOT, "output")
+STATE_FILE = os.path.join(LOG_DIR, "report_index_state.json")
+POLL_INTERVAL = float(os.getenv("REPORT_INDEX_INTERVAL", "10"))   # seconds, --watch
+SETTLE_SECONDS = 5            # younger PDFs may still be being written; picked up next pass
+DIR_MTIME_SLACK_NS = 2_000_000_000   # coarse file system timestamps (e.g. FAT: 2 s)
+LEGACY_SUMMARY = "Summary not available for this legacy report."
+
+# -------------------- State --------------------
+def load_state():
+    if os.path.exists(STATE_FILE):
+        try:
+            with open(STATE_FILE, "r") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, ValueError):
+            print(f"[WARN] Index state {STATE_FILE} is unreadable; rescanning everything.")
+    return {"watermark_ns": 0, "files": {}, "dirs": {}}
+
+def save_state(state):
+    tmp_path = f"{STATE_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_FILE)
+
+# -------------------- Scanning --------------------
+def scan_pdfs(folder, dirs=None, unchanged_before_ns=0, known_pdfs=None):
+    """
+    Yields (path, size, mtime_ns) of every PDF below folder; only PDFs are stat'ed.
+
+    dirs maps each directory listed before to its subdirectories and is
+    updated in place. A directory in it whose mtime is older than
+    unchanged_before_ns is not listed again: its subdirectories come from
+    dirs and only its known PDFs (known_pdfs: directory -> paths) are stat'ed.
+    """
+    previous = dict(dirs or {})
+    if dirs is not None:
+        dirs.clear()
+    stack = [folder]
+    while stack:
+        directory = stack.pop()
+        subdirs = previous.get(directory)
+        if subdirs is not None:
             try:
-                existing_reports = json.load(f)
-            except json.JSONDecodeError:
-                pass # File is empty or corrupt
-    
-    existing_paths = {report.get("pdf_path") for report in existing_reports}
-    
-    new_reports_added = 0
-    # Scan the output folder for PDF files
-    for filename in os.listdir(OUTPUT_FOLDER):
-        if filename.endswith(".pdf"):
-            pdf_path = os.path.join(OUTPUT_FOLDER, filename)
-            
-            # If the report is already logged, skip it
-            if pdf_path in existing_paths:
+                unchanged = os.stat(directory).st_mtime_ns < unchanged_before_ns
+            except OSError:
+                continue
+            if unchanged:
+                if dirs is not None:
+                    dirs[directory] = subdirs
+                stack.extend(subdirs)
+                for path in (known_pdfs or {}).get(directory, ()):
+                    try:
+                        stat = os.stat(path)
+                    except OSError:   # deleted (then the directory would have changed) or unreadable
+                        continue
+                    yield path, stat.st_size, stat.st_mtime_ns
                 continue
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.name.lower().endswith(".pdf"):
+                try:
+                    stat = entry.stat()
+                except OSError:       # removed since the directory was listed
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime_ns
+        if dirs is not None:
+            dirs[directory] = subdirs
+        stack.extend(subdirs)
+
+def catalogue_path(path):
+    """ Path as the app logs it: relative to the project root (e.g. 'output/x.pdf') when inside it. """
+    rel = os.path.relpath(path, PROJECT_ROOT)
+    return path if rel.startswith("..") else rel
+
+def report_type_for(path):
+    name = os.path.basename(path)
+    if "LiveReport" in name:
+        return "camera"
+    return "batch" if os.sep + "batch" + os.sep in path else "upload"
+
+# -------------------- Indexing --------------------
+def absolute_path(rel):
+    return os.path.join(PROJECT_ROOT, rel)
+
+def index_once(state, prune=False):
+    """ One incremental pass. Returns counts of added / updated / removed catalogue entries. """
+    known = state["files"]
+    seen, upserts, new_paths = {}, [], []
+    started_ns = time.time_ns()
+    settle_before = started_ns - SETTLE_SECONDS * 1_000_000_000
+    dirs = dict(state.get("dirs") or {})
+    old_dirs = dict(dirs)
+    known_pdfs = {}
+    for rel in known:
+        path = absolute_path(rel)
+        known_pdfs.setdefault(os.path.dirname(path), []).append(path)
+    unsettled = set()
+    scan = scan_pdfs(OUTPUT_FOLDER, dirs, state.get("watermark_ns", 0) - DIR_MTIME_SLACK_NS, known_pdfs)
+    for path, size, mtime_ns in scan:
+        rel = catalogue_path(path)
+        signature = [size, mtime_ns]
+        if known.get(rel) == signature:
+            seen[rel] = signature
+            continue
+        if mtime_ns > settle_before:
+            if rel in known:
+                seen[rel] = known[rel]
+            # Listed again next pass, so the PDF is found once it has settled.
+            unsettled.add(os.path.dirname(path))
+            continue
+        seen[rel] = signature
+        if rel not in known:
+            new_paths.append(path)
+        upserts.append({
+            "report_type": report_type_for(path),
+            "summary": LEGACY_SUMMARY,
+            "pdf_path": rel,
+            "timestamp": datetime.fromtimestamp(mtime_ns / 1e9),
+        })
+
+    if new_paths:
+        # PDFs the app already logged are left as they are (they have a real summary).
+        catalogued = get_report_paths()
+        already = {catalogue_path(p) for p in new_paths
+                   if os.path.normcase(os.path.abspath(p)) in catalogued}
+        upserts = [u for u in upserts if u["pdf_path"] not in already]
+
+    removed = [rel for rel in known if rel not in seen]
+    counts = sync_reports(upserts, removed if prune else ())
+    if not prune:
+        # Kept until a --prune pass has dropped their catalogue entries.
+        for rel in removed:
+            seen[rel] = known[rel]
+    for directory in unsettled:
+        dirs.pop(directory, None)
+    changed = upserts or (removed and prune) or seen != known or dirs != old_dirs
+    state["files"] = seen
+    state["dirs"] = dirs
+    state["watermark_ns"] = started_ns
+    if changed:
+        save_state(state)
+    return counts
 
-            # Create a new report entry
-            report_type = "camera" if "LiveReport" in filename else "upload"
-            report_entry = {
-                "id": int(os.path.getmtime(pdf_path)), # Use file modification time for a unique ID
-                "timestamp": datetime.fromtimestamp(os.path.getmtime(pdf_path)).strftime("%Y-%m-%d %H:%M:%S"),
-                "report_type": report_type,
-                "summary": "Summary not available for this legacy report.",
-                "pdf_path": pdf_path
-            }
-            
-            existing_reports.append(report_entry)
-            new_reports_added += 1
-            print(f"Added record for: {filename}")
-
-    # Write the updated list back to the log file
-    with open(REPORT_LOG_FILE, "w") as f:
-        json.dump(existing_reports, f, indent=4)
-        
-    print(f"--- Backfill complete. Added {new_reports_added} new report(s). ---")
+def backfill(watch=False, interval=POLL_INTERVAL, prune=False):
+    print("--- Starting incremental report indexing ---")
+    state = load_state()
+    while True:
+        started = time.perf_counter()
+        counts = index_once(state, prune=prune)
+        if any(counts.values()) or not watch:
+            print(f"[INFO] {len(state['files'])} PDF(s) tracked, {len(state['dirs'])} folder(s), pass took "
+                  f"{(time.perf_counter() - started) * 1000:.1f} ms: {counts['added']} added, "
+                  f"{counts['updated']} updated, {counts['removed']} removed")
+        if not watch:
+            return counts
+        time.sleep(interval)
 
 if __name__ == "__main__":
-    backfill()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Index new or changed PDF reports into the report catalogue")
+    parser.add_argument("--watch", action="store_true", help="keep running and poll for new reports")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="seconds between polls (--watch)")
+    parser.add_argument("--prune", action="store_true", help="drop catalogue entries whose PDF was deleted")
+    args = parser.parse_args()
+    try:
+        backfill(watch=args.watch, interval=args.interval, prune=args.prune)
+    except KeyboardInterrupt:
+        print("--- Indexer stopped ---")
@@ -0,0 +1,281 @@
+# batch_cli.py
+# Headless batch analysis of video archives.
+#
+#   python batch_cli.py /archive/2024-06 "/mnt/cams/**/*.mp4" --workers 4
+#   python batch_cli.py /archive --scan triage --summarizer local
+#
+# Each worker process loads the models once and analyses whole videos.
+# Per video, <output>/<name>/ gets the annotated event screenshots,
+# events.json and a PDF report (also listed in the report catalogue).
+# A manifest records every finished file, so an interrupted run picks up
+# where it stopped; files that changed since are analysed again. If a
+# worker process dies, the pool is recreated and the videos it may have
+# been running are retried one at a time, so only a video that keeps
+# killing its worker is recorded as failed.
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from datetime import datetime
+from functools import partial
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from database.event_logger import log_report
+
+# -------------------- Config --------------------
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".gif")
+DEFAULT_OUTPUT = os.path.join("output", "batch")
+EVENT_SEVERITIES = ("danger", "suspicious")
+YOLO_CONF_THRESHOLD = 0.4
+
+# -------------------- Inputs & manifest --------------------
+def find_videos(inputs):
+    """ Video files from paths, directories (recursive) and glob patterns; sorted, without duplicates. """
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                found.update(os.path.join(root, f) for f in files if f.lower().endswith(VIDEO_EXTENSIONS))
+        elif os.path.isfile(item):
+            found.add(item)
+        else:
+            found.update(p for p in glob.glob(item, recursive=True)
+                         if os.path.isfile(p) and p.lower().endswith(VIDEO_EXTENSIONS))
+    return sorted(os.path.abspath(p) for p in found)
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+def output_name(path):
+    """ Per-video folder name: the file stem plus a short hash, so equal names in different folders don't clash. """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}_{hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]}"
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, ValueError):
+        print(f"[WARN] Manifest {path} is unreadable; starting a new one.")
+        return {}
+
+def save_manifest(path, manifest):
+    # Written to a temp file and swapped in, so an interrupted run never leaves half a manifest.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def needs_run(entry, path, retry_failed=False):
+    """ New or changed since the manifest entry was written, or failed before and retrying. """
+    if not entry or {k: entry.get(k) for k in ("size", "mtime")} != file_signature(path):
+        return True
+    return entry.get("status") != "done" and retry_failed
+
+# -------------------- Worker --------------------
+_models = {}
+
+def _init_worker(env, threads):
+    """
+    Runs once per worker process: applies the run's settings, loads both
+    models and gives the worker its share of the CPU threads, so N workers
+    do not each start a full-size torch / OpenCV thread pool.
+    """
+    os.environ.update(env)
+    import cv2
+    import torch
+    from detector.yolo_detector import detect_from_frame
+    from detector.violence_detector import run_violence_detection
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+    _models["detect"] = detect_from_frame
+    _models["violence"] = run_violence_detection
+
+def _analyse(frame):
+    from detector.detections import top_violence_class
+    from detector.severity_selector import select_severity
+
+    yolo_results = _models["detect"](frame, threshold=YOLO_CONF_THRESHOLD)
+    violence_results = _models["violence"](frame)
+    violence_prediction, _ = top_violence_class(violence_results)
+    return yolo_results, violence_results, violence_prediction, select_severity(yolo_results, violence_prediction)
+
+def video_time(index, fps):
+    """ Position of a frame in the video as HH:MM:SS.mmm. """
+    millis = round(index * 1000 / fps)
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    return f"{hours:02d}:{minutes:02d}:{millis // 1000:02d}.{millis % 1000:03d}"
+
+def process_video(path, out_dir, scan_mode="full", stride=1, report=True):
+    """ Analyses one video in a worker; returns its manifest entry (never raises). """
+    from input.camera_stream import capture_frames
+    from pipeline.triage import TemporalTriage, video_info
+    from pipeline.annotate import draw_annotations
+    from pipeline.encoded_frame import EncodedFrame
+    from reports.report_generator import warm_report_images
+
+    started = time.time()
+    entry = {"status": "failed", **file_signature(path), "output": out_dir}
+    try:
+        screenshot_dir = os.path.join(out_dir, "screenshots")
+        os.makedirs(screenshot_dir, exist_ok=True)
+        if scan_mode == "triage":
+            scan = TemporalTriage(path, _analyse, lambda result: result[3] in EVENT_SEVERITIES)
+            fps = scan.fps
+        else:
+            scan = ((frame, index, _analyse(frame)) for frame, index in capture_frames(path, stride=stride))
+            fps, _ = video_info(path)
+
+        events = []
+        frames = 0
+        for frame, index, (yolo_results, violence_results, violence_prediction, severity) in scan:
+            frames += 1
+            if severity not in EVENT_SEVERITIES:
+                continue
+            screenshot_path = os.path.join(screenshot_dir, f"frame_{index:06d}.jpg")
+            annotated_frame = EncodedFrame(render=partial(draw_annotations, frame, yolo_results, violence_results))
+            if annotated_frame.save(screenshot_path):
+                warm_report_images(screenshot_path, annotated_frame)
+            yolo_strings = ", ".join(f"{det['class']} ({det.get('confidence', 0.0):.2f})" for det in yolo_results)
+            events.append({
+                "frame": index,
+                "yolo": yolo_strings,
+                "violence": violence_prediction,
+                "yolo_object": yolo_strings,
+                "yolo_violence": violence_prediction,
+                "final": severity,
+                "screenshot": os.path.abspath(screenshot_path),
+                # Position in the video: the wall clock says nothing about an archived file.
+                "timestamp": video_time(index, fps),
+            })
+
+        with open(os.path.join(out_dir, "events.json"), "w") as f:
+            json.dump({"video": path, "scan": getattr(scan, "stats", {"mode": scan_mode, "frames": frames}),
+                       "events": events}, f, indent=2)
+        entry["events"] = len(events)
+
+        if report and events:
+            from llm.llm_summary import generate_summary_with_source
+            from reports.report_generator import generate_pdf_report
+
+            summary_text, summary_source = generate_summary_with_source(events)
+            pdf_path = os.path.join(out_dir, f"SentryAI_Report_{output_name(path)}.pdf")
+            generate_pdf_report(events, summary_text, pdf_path, summary_source=summary_source)
+            if not os.path.exists(pdf_path):
+                raise IOError(f"PDF report was not written: {pdf_path}")
+            entry.update(report=os.path.abspath(pdf_path), summary=summary_text)
+        entry["status"] = "done"
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+    entry["seconds"] = round(time.time() - started, 2)
+    entry["finished"] = datetime.now().isoformat(timespec="seconds")
+    return entry
+
+# -------------------- Main --------------------
+def main():
+    parser = argparse.ArgumentParser(description="Headless, resumable batch analysis of video files")
+    parser.add_argument("inputs", nargs="+", help="video files, directories (searched recursively) or glob patterns")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="folder for per-video results")
+    parser.add_argument("--manifest", help="resume manifest (default: <output>/manifest.json)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="worker processes, each with its own copy of the models")
+    parser.add_argument("--scan", choices=["full", "triage"], default="full", help="analyse every frame, or triage")
+    parser.add_argument("--stride", type=int, default=1, help="full scan: analyse every Nth frame")
+    parser.add_argument("--summarizer", choices=["gemini", "local"], help="override SUMMARIZER for the reports")
+    parser.add_argument("--no-report", action="store_true", help="only write events and screenshots")
+    parser.add_argument("--retry-failed", action="store_true", help="also re-run files that failed before")
+    parser.add_argument("--dry-run", action="store_true", help="list what would be processed")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    manifest_path = args.manifest or os.path.join(args.output, "manifest.json")
+    manifest = load_manifest(manifest_path)
+
+    videos = find_videos(args.inputs)
+    pending = [p for p in videos if needs_run(manifest.get(p), p, args.retry_failed)]
+    print(f"[INFO] {len(videos)} video(s) found, {len(videos) - len(pending)} already processed or failed, "
+          f"{len(pending)} to go with {args.workers} worker(s).")
+    if args.dry_run or not pending:
+        for path in pending:
+            print(f"    {path}")
+        return
+
+    env = {"SUMMARIZER": args.summarizer} if args.summarizer else {}
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    started, failed, done = time.time(), 0, 0
+
+    def record(path, entry):
+        nonlocal failed, done
+        done += 1
+        if entry.get("report"):
+            # Registered from the parent; the catalogue lock covers the app and the indexer.
+            log_report("batch", entry.get("summary", ""), entry["report"])
+        entry.pop("summary", None)
+        manifest[path] = entry
+        save_manifest(manifest_path, manifest)
+        if entry["status"] == "done":
+            print(f"[INFO] ({done}/{len(pending)}) {os.path.basename(path)}: "
+                  f"{entry.get('events', 0)} event(s) in {entry.get('seconds', 0)}s")
+        else:
+            failed += 1
+            print(f"[ERROR] ({done}/{len(pending)}) {os.path.basename(path)}: {entry.get('error')}")
+
+    # Spawned workers start clean, rather than forking a parent that may hold model / thread state.
+    context = multiprocessing.get_context("spawn")
+    queued, suspects = deque(pending), deque()
+    while queued or suspects:
+        # Videos that were running when a worker died go one at a time, so a crash
+        # there can only be caused by that video.
+        isolate = bool(suspects)
+        source, window = (suspects, 1) if isolate else (queued, args.workers)
+        in_flight = {}
+        broken = False
+        with ProcessPoolExecutor(max_workers=window, mp_context=context,
+                                 initializer=_init_worker, initargs=(env, threads)) as pool:
+            while (source or in_flight) and not broken:
+                # At most one video per worker is submitted, so a crash leaves few suspects.
+                while source and len(in_flight) < window:
+                    path = source.popleft()
+                    in_flight[pool.submit(process_video, path, os.path.join(args.output, output_name(path)),
+                                          args.scan, args.stride, not args.no_report)] = path
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    path = in_flight.pop(future)
+                    try:
+                        entry = future.result()
+                    except BrokenProcessPool:
+                        broken = True
+                        in_flight[future] = path
+                        continue
+                    except Exception as e:
+                        entry = {"status": "failed", **file_signature(path), "error": f"{type(e).__name__}: {e}"}
+                    record(path, entry)
+            if broken:
+                print("[WARN] A worker process died; restarting the pool.")
+                for future, path in in_flight.items():
+                    try:
+                        entry = future.result(timeout=0)
+                    except Exception as e:
+                        if not isolate:
+                            suspects.append(path)
+                            continue
+                        entry = {"status": "failed", **file_signature(path),
+                                 "error": f"worker process died ({type(e).__name__})"}
+                    record(path, entry)
+    print(f"[INFO] Batch finished in {time.time() - started:.1f}s: {len(pending) - failed} done, {failed} failed. "
+          f"Manifest: {manifest_path}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import os
+import json
+import gzip
+import time
+import threading
+from bisect import bisect_left
+from datetime import datetime
+
+from database.event_index import build_rollups, parse_event_time, rollups_from_json, rollups_to_json
+
+# -------------------- Config --------------------
+# Hot log is rotated as soon as ANY of these limits is reached.
+ROTATE_MAX_EVENTS = int(os.getenv("EVENT_ROTATE_MAX_EVENTS", "5000"))
+ROTATE_MAX_BYTES = int(os.getenv("EVENT_ROTATE_MAX_BYTES", str(5 * 1024 * 1024)))
+ROTATE_MAX_AGE_SECONDS = int(os.getenv("EVENT_ROTATE_MAX_AGE_SECONDS", str(24 * 3600)))
+
+# Archived segments are dropped when older than this or when the archive grows too big.
+RETENTION_DAYS = float(os.getenv("EVENT_RETENTION_DAYS", "90"))
+ARCHIVE_MAX_BYTES = int(os.getenv("EVENT_ARCHIVE_MAX_BYTES", str(500 * 1024 * 1024)))
+
+MANIFEST_NAME = "manifest.json"
+BLOCK_EVENTS = 500  # events per independently compressed gzip member
+
+class EventArchive:
+    """
+    Compressed, time-partitioned segments of the event log.
+
+    Each segment is a gzip JSON Lines file written as a series of small gzip
+    members (BLOCK_EVENTS events each). It is still a plain ``.jsonl.gz`` file,
+    but a reader can seek straight to the block holding a given time instead of
+    decompressing everything before it. Next to it sits a ``.rollup.json`` file
+    with the block offsets and the segment's per-minute counts, which lets stats
+    queries skip reading the segment entirely. ``manifest.json`` lists the
+    segments with their time span, size and counts.
+    """
+
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        self.manifest_path = os.path.join(archive_dir, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._sidecars = {}
+        os.makedirs(archive_dir, exist_ok=True)
+
+    # -------------------- Manifest --------------------
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return []
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f).get("segments", [])
+        except (json.JSONDecodeError, ValueError):
+            return []
+
+    def _write_manifest(self, segments):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"updated": datetime.now().isoformat(), "segments": segments}, f, indent=4)
+        os.replace(tmp_path, self.manifest_path)
+
+    def segments(self):
+        """ Manifest entries of all archived segments, oldest first. """
+        with self._lock:
+            return sorted(self._read_manifest(), key=lambda e: e["start"])
+
+    # -------------------- Reading --------------------
+    def _sidecar(self, entry):
+        name = entry["rollups"]
+        if name not in self._sidecars:
+            try:
+                with open(os.path.join(self.archive_dir, name), "r") as f:
+                    self._sidecars[name] = json.load(f)
+            except (OSError, json.JSONDecodeError, ValueError):
+                self._sidecars[name] = None
+        return self._sidecars[name]
+
+    def iter_events(self, entry, start=None, end=None):
+        """
+        Streams the events of one segment, decompressing incrementally.
+
+        With ``start`` the blocks before it are skipped without being read; with
+        ``end`` reading stops at the first later event. Events outside the range
+        that share a block with it are still yielded, callers filter exactly.
+        """
+        path = os.path.join(self.archive_dir, entry["file"])
+        if not os.path.exists(path):
+            return
+        sidecar = self._sidecar(entry)
+        offset = 0
+        if start is not None and sidecar and sidecar.get("blocks"):
+            blocks = sidecar["blocks"]
+            i = max(0, bisect_left([b[1] for b in blocks], start) - 1)
+            offset = blocks[i][0]
+        with open(path, "rb") as raw:
+            raw.seek(offset)
+            with gzip.open(raw, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    if end is not None and (parse_event_time(event.get("timestamp")) or 0.0) >= end:
+                        return
+                    yield event
+
+    def load_rollups(self, entry):
+        """ Per-minute rollups of one segment (from its sidecar file). """
+        sidecar = self._sidecar(entry)
+        if sidecar is None:
+            # Sidecar lost: recompute it from the segment itself.
+            return build_rollups(self.iter_events(entry))
+        return rollups_from_json(sidecar["rollups"])
+
+    # -------------------- Rotation --------------------
+    @staticmethod
+    def should_rotate(count, oldest, log_path):
+        """ True when the hot log (count events, oldest timestamp) has hit its count, size or age limit. """
+        if not count:
+            return False
+        if count >= ROTATE_MAX_EVENTS:
+            return True
+        if os.path.exists(log_path) and os.path.getsize(log_path) >= ROTATE_MAX_BYTES:
+            return True
+        oldest = parse_event_time(oldest)
+        return oldest is not None and time.time() - oldest >= ROTATE_MAX_AGE_SECONDS
+
+    def rotate(self, events):
+        """
+        Writes the given hot events as a new compressed segment and registers it.
+
+        Returns:
+            dict: the manifest entry of the new segment
+        """
+        events = sorted(events, key=lambda ev: parse_event_time(ev.get("timestamp")) or 0.0)
+        times = [parse_event_time(ev.get("timestamp")) or 0.0 for ev in events]
+        stamp = datetime.fromtimestamp(times[0]).strftime('%Y%m%d_%H%M%S_%f')
+        base, n = f"events_{stamp}", 1
+        while os.path.exists(os.path.join(self.archive_dir, f"{base}.jsonl.gz")):
+            n += 1
+            base = f"events_{stamp}_{n}"
+        segment_file, rollup_file = f"{base}.jsonl.gz", f"{base}.rollup.json"
+
+        blocks = []
+        with open(os.path.join(self.archive_dir, segment_file), "wb") as f:
+            for i in range(0, len(events), BLOCK_EVENTS):
+                blocks.append([f.tell(), times[i]])
+                lines = "".join(json.dumps(event) + "\n" for event in events[i:i + BLOCK_EVENTS])
+                f.write(gzip.compress(lines.encode("utf-8")))
+        with open(os.path.join(self.archive_dir, rollup_file), "w") as f:
+            json.dump({"blocks": blocks, "rollups": rollups_to_json(build_rollups(events))}, f)
+
+        severities = {}
+        for event in events:
+            severity = event.get("severity", "normal")
+            severities[severity] = severities.get(severity, 0) + 1
+        entry = {
+            "file": segment_file,
+            "rollups": rollup_file,
+            "start": times[0],
+            "end": times[-1],
+            "count": len(events),
+            "by_severity": severities,
+            "bytes": os.path.getsize(os.path.join(self.archive_dir, segment_file)),
+        }
+        with self._lock:
+            segments = self._read_manifest()
+            segments.append(entry)
+            self._write_manifest(segments)
+        print(f"[INFO] Archived {len(events)} events to {segment_file} ({entry['bytes']} bytes).")
+        return entry
+
+    # -------------------- Retention --------------------
+    def apply_retention(self, now=None):
+        """ Deletes segments past the retention age or beyond the archive size cap. """
+        now = time.time() if now is None else now
+        cutoff = now - RETENTION_DAYS * 86400
+        with self._lock:
+            segments = sorted(self._read_manifest(), key=lambda e: e["start"])
+            total_bytes = sum(e.get("bytes", 0) for e in segments)
+            kept, removed = [], []
+            for entry in segments:
+                if entry["end"] < cutoff or total_bytes > ARCHIVE_MAX_BYTES:
+                    removed.append(entry)
+                    total_bytes -= entry.get("bytes", 0)
+                else:
+                    kept.append(entry)
+            if not removed:
+                return []
+            for entry in removed:
+                self._sidecars.pop(entry["rollups"], None)
+                for name in (entry["file"], entry["rollups"]):
+                    try:
+                        os.remove(os.path.join(self.archive_dir, name))
+                    except FileNotFoundError:
+                        pass
+            self._write_manifest(kept)
+        print(f"[INFO] Retention removed {len(removed)} archived event segment(s).")
+        return removed
@@ -0,0 +1,403 @@
+import threading
+from bisect import bisect_left
+from datetime import datetime
+from itertools import islice
+
+# -------------------- Config --------------------
+ROLLUP_SECONDS = 60          # granularity of the finest pre-aggregated rollups
+ROLLUP_LEVELS = (60, 3600)   # minute and hour rollups, finest first
+DEFAULT_QUERY_LIMIT = 100
+MAX_QUERY_LIMIT = 1000
+INDEXED_FIELDS = ("severity", "source", "class")
+
+# -------------------- Helpers --------------------
+def parse_event_time(value):
+    """Converts an ISO timestamp, epoch number or datetime into epoch seconds."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(str(value).replace(" ", "T")).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid time value: {value}")
+
+def event_classes(event):
+    """Returns the distinct detected classes of a logged event (objects + violence)."""
+    classes = {det.get("class") for det in event.get("yolo_results") or [] if det.get("class")}
+    violence = str(event.get("i3d_prediction") or "").split(" (")[0].strip()
+    if violence == "violence":
+        classes.add(violence)
+    return sorted(classes)
+
+def _index_keys(event):
+    """Returns (epoch, severity, source, classes) for a logged event."""
+    ts = parse_event_time(event.get("timestamp")) or 0.0
+    return ts, event.get("severity", "normal"), str(event.get("source", "unknown")), event_classes(event)
+
+def _floor(ts, step):
+    return int(ts // step) * step
+
+def _minute(ts):
+    return _floor(ts, ROLLUP_SECONDS)
+
+def _plan(lo, hi, levels):
+    """
+    Splits [lo, hi) into (level, a, b) pieces: whole units of the coarsest level in
+    the middle, finer levels towards the edges and raw events (level None) last.
+    """
+    if lo >= hi:
+        return []
+    if not levels:
+        return [(None, lo, hi)]
+    step = levels[-1]
+    full_lo = lo if lo == _floor(lo, step) else _floor(lo, step) + step
+    full_hi = _floor(hi, step)
+    if full_lo >= full_hi:
+        return _plan(lo, hi, levels[:-1])
+    return _plan(lo, full_lo, levels[:-1]) + [(step, full_lo, full_hi)] + _plan(full_hi, hi, levels[:-1])
+
+def _as_set(values):
+    """Normalizes a filter value (None, str, 'a,b' or iterable) into a set or None."""
+    if values is None or values == "":
+        return None
+    if isinstance(values, str):
+        values = values.split(",")
+    values = {str(v).strip() for v in values if str(v).strip()}
+    return values or None
+
+def new_rollup():
+    """An empty per-minute rollup: counts by (severity, source) and (class, severity, source)."""
+    return {"total": 0, "by_key": {}, "by_class": {}}
+
+def add_to_rollup(rollup, severity, source, classes):
+    key = (severity, source)
+    rollup["total"] += 1
+    rollup["by_key"][key] = rollup["by_key"].get(key, 0) + 1
+    for cls in classes:
+        ckey = (cls, severity, source)
+        rollup["by_class"][ckey] = rollup["by_class"].get(ckey, 0) + 1
+
+def merge_rollups(target, other, step=ROLLUP_SECONDS):
+    """Adds the counts of ``other`` into ``target`` (both {period start: rollup})."""
+    for minute, rollup in other.items():
+        dest = target.setdefault(_floor(int(minute), step), new_rollup())
+        dest["total"] += rollup["total"]
+        for field in ("by_key", "by_class"):
+            for key, count in rollup[field].items():
+                dest[field][key] = dest[field].get(key, 0) + count
+    return target
+
+def build_rollups(events):
+    """Per-minute rollups for a list of logged events."""
+    rollups = {}
+    for event in events:
+        ts, severity, source, classes = _index_keys(event)
+        add_to_rollup(rollups.setdefault(_minute(ts), new_rollup()), severity, source, classes)
+    return rollups
+
+def rollups_to_json(rollups):
+    return {
+        str(minute): {
+            "total": r["total"],
+            "by_key": [[*key, n] for key, n in r["by_key"].items()],
+            "by_class": [[*key, n] for key, n in r["by_class"].items()],
+        }
+        for minute, r in rollups.items()
+    }
+
+def rollups_from_json(data):
+    return {
+        int(minute): {
+            "total": r["total"],
+            "by_key": {tuple(item[:-1]): item[-1] for item in r["by_key"]},
+            "by_class": {tuple(item[:-1]): item[-1] for item in r["by_class"]},
+        }
+        for minute, r in data.items()
+    }
+
+class _Stats:
+    """Accumulates stats results from rollups and raw events."""
+
+    def __init__(self, severities, sources, classes, start, bucket):
+        self.severities, self.sources, self.classes = severities, sources, classes
+        self.start, self.bucket = start, bucket
+        self.total = 0
+        self.by_severity, self.by_source, self.by_class = {}, {}, {}
+        self.histogram = {}
+
+    def _bucket_of(self, ts):
+        return self.start + int((ts - self.start) // self.bucket) * self.bucket
+
+    def _matches(self, severity, source):
+        return (self.severities is None or severity in self.severities) and \
+               (self.sources is None or source in self.sources)
+
+    def add_rollup(self, minute, rollup):
+        bucket = self._bucket_of(minute)
+        if self.classes is None:
+            for (severity, source), count in rollup["by_key"].items():
+                if self._matches(severity, source):
+                    self._count(bucket, severity, source, count)
+        else:
+            # An event is counted once even when it carries several filtered classes,
+            # so multi-class filters fall back to the raw events (see EventIndex.stats).
+            for (cls, severity, source), count in rollup["by_class"].items():
+                if cls in self.classes and self._matches(severity, source):
+                    self._count(bucket, severity, source, count)
+        for (cls, severity, source), count in rollup["by_class"].items():
+            if (self.classes is None or cls in self.classes) and self._matches(severity, source):
+                self.by_class[cls] = self.by_class.get(cls, 0) + count
+
+    def add_event(self, ts, severity, source, classes):
+        if not self._matches(severity, source):
+            return
+        if self.classes is not None and not self.classes.intersection(classes):
+            return
+        self._count(self._bucket_of(ts), severity, source, 1)
+        for cls in classes:
+            if self.classes is None or cls in self.classes:
+                self.by_class[cls] = self.by_class.get(cls, 0) + 1
+
+    def _count(self, bucket, severity, source, count):
+        self.total += count
+        self.by_severity[severity] = self.by_severity.get(severity, 0) + count
+        self.by_source[source] = self.by_source.get(source, 0) + count
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + count
+
+    def as_dict(self):
+        return {
+            "total": self.total,
+            "by_severity": self.by_severity,
+            "by_source": self.by_source,
+            "by_class": self.by_class,
+            "bucket_seconds": self.bucket,
+            "histogram": [
+                {"start": datetime.fromtimestamp(b).isoformat(), "count": self.histogram[b]}
+                for b in sorted(self.histogram)
+            ],
+        }
+
+# -------------------- Event Index --------------------
+class EventIndex:
+    """
+    In-memory indexes over the event store.
+
+    Keeps hot events ordered by time, posting lists (sorted event positions) for
+    severity, source and detected class, and per-minute / per-hour rollups, so
+    that time-range / filter queries and histograms never rescan the whole log.
+
+    When an ``archive`` is given (see database.event_archive), the rollups of its
+    compressed segments are merged in as well and segment events are streamed
+    only when a query actually needs them.
+    """
+
+    def __init__(self, loader, archive=None):
+        self._loader = loader
+        self._archive = archive
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        self._events = []
+        self._keys = []
+        self._times = []
+        self._postings = {field: {} for field in INDEXED_FIELDS}
+        self._rollups = {level: {} for level in ROLLUP_LEVELS}
+        self._segments = []
+
+    # ---- Building ----
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._reset()
+        keyed = sorted(((_index_keys(ev), ev) for ev in self._loader()), key=lambda item: item[0][0])
+        for keys, event in keyed:
+            self._append(keys, event)
+        if self._archive is not None:
+            self._segments = self._archive.segments()
+            for entry in self._segments:
+                minute_rollups = self._archive.load_rollups(entry)
+                for level, rollups in self._rollups.items():
+                    merge_rollups(rollups, minute_rollups, level)
+        self._loaded = True
+
+    def _append(self, keys, event):
+        ts, severity, source, classes = keys
+        pos = len(self._events)
+        self._events.append(event)
+        self._keys.append(keys)
+        self._times.append(ts)
+        self._postings["severity"].setdefault(severity, []).append(pos)
+        self._postings["source"].setdefault(source, []).append(pos)
+        for cls in classes:
+            self._postings["class"].setdefault(cls, []).append(pos)
+        for level, rollups in self._rollups.items():
+            add_to_rollup(rollups.setdefault(_floor(ts, level), new_rollup()), severity, source, classes)
+
+    def add(self, event):
+        """Indexes a newly logged event."""
+        with self._lock:
+            if not self._loaded:
+                return  # picked up by the first load
+            keys = _index_keys(event)
+            if self._times and keys[0] < self._times[-1]:
+                # Out-of-order timestamp: positions would shift, so rebuild lazily.
+                self.reload()
+            else:
+                self._append(keys, event)
+
+    def reload(self):
+        """Drops the indexes; they are rebuilt from the store on the next query."""
+        with self._lock:
+            self._loaded = False
+            self._reset()
+
+    # ---- Querying ----
+    def _range(self, start, end):
+        lo = 0 if start is None else bisect_left(self._times, start)
+        hi = len(self._times) if end is None else bisect_left(self._times, end)
+        return lo, hi
+
+    def _candidates(self, lo, hi, filters):
+        """Positions in [lo, hi) matching every filter, using the posting lists."""
+        slices = []
+        for field, values in filters.items():
+            if values is None:
+                continue
+            merged = []
+            for value in values:
+                postings = self._postings[field].get(value, [])
+                merged.extend(postings[bisect_left(postings, lo):bisect_left(postings, hi)])
+            if len(values) > 1:
+                merged = sorted(set(merged))
+            slices.append(merged)
+        if not slices:
+            return range(lo, hi)
+        slices.sort(key=len)
+        result = slices[0]
+        for other in slices[1:]:
+            other = set(other)
+            result = [pos for pos in result if pos in other]
+        return result
+
+    def _overlapping_segments(self, start, end):
+        return [
+            entry for entry in self._segments
+            if (start is None or entry["end"] >= start) and (end is None or entry["start"] < end)
+        ]
+
+    def _archived_keys(self, segments, start, end):
+        """Streams (keys, event) of archived events in [start, end)."""
+        for entry in segments:
+            for event in self._archive.iter_events(entry, start, end):
+                keys = _index_keys(event)
+                if (start is None or keys[0] >= start) and (end is None or keys[0] < end):
+                    yield keys, event
+
+    @staticmethod
+    def _keys_match(keys, filters):
+        _, severity, source, classes = keys
+        return (filters["severity"] is None or severity in filters["severity"]) and \
+               (filters["source"] is None or source in filters["source"]) and \
+               (filters["class"] is None or not filters["class"].isdisjoint(classes))
+
+    def _iter_matches(self, positions, segments, start, end, filters, newest_first):
+        """Matching events, hot ones from the posting lists and archived ones streamed."""
+        if newest_first:
+            for pos in reversed(positions):
+                yield self._events[pos]
+            for entry in reversed(segments):
+                matches = [ev for keys, ev in self._archived_keys([entry], start, end)
+                           if self._keys_match(keys, filters)]
+                yield from reversed(matches)
+        else:
+            for keys, ev in self._archived_keys(segments, start, end):
+                if self._keys_match(keys, filters):
+                    yield ev
+            for pos in positions:
+                yield self._events[pos]
+
+    def query(self, start=None, end=None, severity=None, source=None, detected_class=None,
+              limit=DEFAULT_QUERY_LIMIT, offset=0, newest_first=True):
+        """
+        Returns events in [start, end) matching the filters.
+
+        Args:
+            start, end: epoch seconds, ISO strings or None for an open range
+            severity, source, detected_class: a value, 'a,b' string or iterable
+            limit, offset: pagination over the ordered matches
+
+        Returns:
+            dict: {"total": int, "events": [event, ...]}
+        """
+        start, end = parse_event_time(start), parse_event_time(end)
+        limit = max(0, min(int(limit), MAX_QUERY_LIMIT))
+        offset = max(0, int(offset))
+        filters = {"severity": _as_set(severity), "source": _as_set(source), "class": _as_set(detected_class)}
+        with self._lock:
+            self._ensure_loaded()
+            lo, hi = self._range(start, end)
+            positions = self._candidates(lo, hi, filters)
+            segments = self._overlapping_segments(start, end)
+            if not segments:
+                total = len(positions)
+                if newest_first:
+                    selected = [positions[total - 1 - i] for i in range(offset, min(total, offset + limit))]
+                else:
+                    selected = positions[offset:offset + limit]
+                return {"total": total, "events": [self._events[pos] for pos in selected]}
+            # Archived segments: count from the rollups, stream only the requested page.
+            total = self.stats(start, end, severity, source, detected_class)["total"]
+            matches = self._iter_matches(positions, segments, start, end, filters, newest_first)
+            events = list(islice(matches, offset, offset + limit))
+        return {"total": total, "events": events}
+
+    def stats(self, start=None, end=None, severity=None, source=None, detected_class=None,
+              bucket_seconds=3600):
+        """
+        Counts and a histogram of events in [start, end) matching the filters.
+
+        Whole hours and minutes are answered from the rollups; only the partial
+        minutes at the edges of the range are read from the raw events.
+        """
+        start, end = parse_event_time(start), parse_event_time(end)
+        bucket = max(ROLLUP_SECONDS, int(bucket_seconds) // ROLLUP_SECONDS * ROLLUP_SECONDS)
+        severities, sources, classes = _as_set(severity), _as_set(source), _as_set(detected_class)
+        # Only rollup levels that never straddle a histogram bucket can be used.
+        levels = tuple(level for level in ROLLUP_LEVELS if bucket % level == 0)
+        if classes is not None and len(classes) > 1:
+            levels = ()  # class rollups would count multi-class events twice
+        with self._lock:
+            self._ensure_loaded()
+            bounds = [(e["start"], e["end"]) for e in self._segments]
+            if self._times:
+                bounds.append((self._times[0], self._times[-1]))
+            if not bounds:
+                return _Stats(severities, sources, classes, 0, bucket).as_dict()
+            first = min(b[0] for b in bounds) if start is None else start
+            last = max(b[1] for b in bounds) + 1 if end is None else end
+            result = _Stats(severities, sources, classes, _floor(first, levels[-1] if levels else ROLLUP_SECONDS), bucket)
+            for level, lo, hi in _plan(first, last, levels):
+                if level is None:
+                    pos_lo, pos_hi = self._range(lo, hi)
+                    for pos in range(pos_lo, pos_hi):
+                        result.add_event(*self._keys[pos])
+                    for keys, _ in self._archived_keys(self._overlapping_segments(lo, hi), lo, hi):
+                        result.add_event(*keys)
+                    continue
+                rollups = self._rollups[level]
+                if (hi - lo) // level < len(rollups):
+                    keys = [k for k in range(lo, hi, level) if k in rollups]
+                else:
+                    keys = sorted(k for k in rollups if lo <= k < hi)
+                for key in keys:
+                    result.add_rollup(key, rollups[key])
+        return result.as_dict()
@@ -1,76 +1,274 @@
 # In database/event_logger.py
 import os
 import json
+import tempfile
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 import cv2
 
+from database.event_index import EventIndex
+from database.event_archive import EventArchive
+from pipeline.metrics import stage
+
+try:
+    import fcntl
+except ImportError:        # Windows
+    fcntl = None
+    import msvcrt
+
 # --- ✅ NEW: Robust, Absolute Path Calculation ---
 # This ensures the log files are always found in the correct place,
 # no matter how the application is started.
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-LOG_DIR = os.path.join(SCRIPT_DIR, "logs")
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+LOG_DIR = os.getenv("SENTRY_LOG_DIR", os.path.join(SCRIPT_DIR, "logs"))  # override e.g. for benchmarks
 os.makedirs(LOG_DIR, exist_ok=True)
 
 # --- File paths now use the absolute LOG_DIR ---
-EVENT_LOG_FILE = os.path.join(LOG_DIR, "event_log.json")
+# The hot event log is JSON Lines: one event per line, appended with a single write.
+EVENT_LOG_FILE = os.path.join(LOG_DIR, "event_log.jsonl")
+LEGACY_EVENT_LOG_FILE = os.path.join(LOG_DIR, "event_log.json")   # JSON array, converted on first use
 REPORT_LOG_FILE = os.path.join(LOG_DIR, "report_log.json")
+REPORT_LOCK_FILE = os.path.join(LOG_DIR, "report_log.lock")
+EVENT_ARCHIVE_DIR = os.path.join(LOG_DIR, "archive")
+
+# Old events are rotated out of EVENT_LOG_FILE into compressed segments here.
+event_archive = EventArchive(EVENT_ARCHIVE_DIR)
+
+_event_lock = threading.Lock()
+# Event count and oldest timestamp of the hot log, so rotation checks never read it.
+_hot_log = {"count": None, "oldest": None}
+
+def _read_hot_events():
+    events = []
+    if not os.path.exists(EVENT_LOG_FILE):
+        return events
+    with open(EVENT_LOG_FILE, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                events.append(json.loads(line))
+            except (json.JSONDecodeError, ValueError):
+                continue   # a line torn by a crash mid-write
+    return events
+
+def _read_legacy_events():
+    if not os.path.exists(LEGACY_EVENT_LOG_FILE):
+        return []
+    try:
+        with open(LEGACY_EVENT_LOG_FILE, "r") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, ValueError):
+        return []
+
+def _convert_legacy_log():
+    """ Moves the events of an old JSON-array event_log.json into the JSON Lines log. """
+    if not os.path.exists(LEGACY_EVENT_LOG_FILE):
+        return
+    events = _read_legacy_events()
+    with open(EVENT_LOG_FILE, "a") as f:
+        f.write("".join(json.dumps(event) + "\n" for event in events))
+    os.remove(LEGACY_EVENT_LOG_FILE)
+    print(f"[INFO] Converted {len(events)} event(s) from {LEGACY_EVENT_LOG_FILE} to JSON Lines.")
+
+def _load_hot_state():
+    # Called with _event_lock held; reads the hot log once per process.
+    if _hot_log["count"] is not None:
+        return
+    _convert_legacy_log()
+    events = _read_hot_events()
+    _hot_log["count"] = len(events)
+    _hot_log["oldest"] = events[0].get("timestamp") if events else None
 
 # --- Original Event Logging (for individual frames) ---
-def log_event(frame, yolo_results, i3d_pred, severity):
-    """ Log individual events to JSON file. """
+def log_event(frame, yolo_results, i3d_pred, severity, source="unknown", screenshot=None):
+    """
+    Appends one event to the hot log (one line, one write).
+
+    Args:
+        source: where the frame came from, e.g. 'upload:clip.mp4' or 'camera:0'
+        screenshot: path of an already saved screenshot; when given, no extra
+                    danger snapshot is written.
+    """
     event = {
         "timestamp": datetime.now().isoformat(),
         "severity": severity,
-        "yolo_results": yolo_results,
+        "source": str(source),
+        "yolo_results": list(yolo_results),
         "i3d_prediction": i3d_pred
     }
-    logs = []
-    if os.path.exists(EVENT_LOG_FILE):
-        try:
-            with open(EVENT_LOG_FILE, "r") as f:
-                logs = json.load(f)
-        except (json.JSONDecodeError, ValueError):
-            logs = []
-    logs.append(event)
-    with open(EVENT_LOG_FILE, "w") as f:
-        json.dump(logs, f, indent=4)
-    if severity == "danger":
+    if screenshot:
+        event["screenshot"] = screenshot
+    line = json.dumps(event) + "\n"
+    with stage("log"), _event_lock:
+        _load_hot_state()
+        with open(EVENT_LOG_FILE, "a") as f:
+            f.write(line)
+        _hot_log["count"] += 1
+        if _hot_log["oldest"] is None:
+            _hot_log["oldest"] = event["timestamp"]
+        if event_archive.should_rotate(_hot_log["count"], _hot_log["oldest"], EVENT_LOG_FILE):
+            # Keep the hot log small: move it into a compressed segment (once per rotation, not per event).
+            event_archive.rotate(_read_hot_events())
+            event_archive.apply_retention()
+            open(EVENT_LOG_FILE, "w").close()
+            _hot_log.update(count=0, oldest=None)
+            event_index.reload()
+        else:
+            event_index.add(event)
+    if severity == "danger" and screenshot is None and frame is not None:
         SNAP_DIR = Path(LOG_DIR) / "snapshots"
         SNAP_DIR.mkdir(exist_ok=True)
         filename = SNAP_DIR / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
         cv2.imwrite(str(filename), frame)
 
 def get_events():
-    """ Retrieve all logged events. """
-    if not os.path.exists(EVENT_LOG_FILE):
+    """ Retrieve all events in the hot log (archived segments: see query_events). """
+    # No lock: lines are only ever appended whole, and a torn last line is skipped.
+    return _read_legacy_events() + _read_hot_events()
+
+# --- Indexed Event Queries ---
+event_index = EventIndex(get_events, archive=event_archive)
+
+def query_events(**filters):
+    """ Time-range / filter query over hot and archived events. See EventIndex.query. """
+    return event_index.query(**filters)
+
+def get_event_stats(**filters):
+    """ Counts and histogram over the event store. See EventIndex.stats. """
+    return event_index.stats(**filters)
+
+# --- Report Logging (for final summaries and PDFs) ---
+_report_lock = threading.Lock()
+
+@contextmanager
+def _report_log_locked():
+    """
+    Holds the catalogue for one read-modify-write cycle. The Flask app,
+    batch_cli.py and backfill_reports.py all write report_log.json, so the
+    thread lock is paired with an OS lock on REPORT_LOCK_FILE.
+    """
+    with _report_lock, open(REPORT_LOCK_FILE, "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)      # released when the file is closed
+            yield
+            return
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _load_reports():
+    if not os.path.exists(REPORT_LOG_FILE):
         return []
     try:
-        with open(EVENT_LOG_FILE, "r") as f:
+        with open(REPORT_LOG_FILE, "r") as f:
             return json.load(f)
     except (json.JSONDecodeError, ValueError):
         return []
 
-# --- Report Logging (for final summaries and PDFs) ---
-def log_report(report_type: str, summary: str, pdf_path: str):
-    """ Logs a generated report summary to a separate JSON file. """
-    report_entry = {
-        "id": int(datetime.now().timestamp()), # Simple unique ID
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "report_type": report_type,
-        "summary": summary,
-        "pdf_path": pdf_path
-    }
-    reports = []
-    if os.path.exists(REPORT_LOG_FILE):
+def _save_reports(reports):
+    # Swapped in atomically, so readers in other processes never see half a file.
+    fd, tmp_path = tempfile.mkstemp(dir=LOG_DIR, prefix="report_log.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(reports, f, indent=4)
+        os.replace(tmp_path, REPORT_LOG_FILE)
+    except BaseException:
         try:
-            with open(REPORT_LOG_FILE, "r") as f:
-                reports = json.load(f)
-        except (json.JSONDecodeError, ValueError):
-            reports = []
-    reports.append(report_entry)
-    with open(REPORT_LOG_FILE, "w") as f:
-        json.dump(reports, f, indent=4)
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def _unique_report_id(when, taken):
+    """ Seconds-since-epoch ID as before, moved forward past IDs already in use. """
+    report_id = int(when.timestamp())
+    while report_id in taken:
+        report_id += 1
+    taken.add(report_id)
+    return report_id
+
+def _report_key(pdf_path):
+    # Relative paths (e.g. 'output/x.pdf' as logged by the app) are relative to the project root.
+    return os.path.normcase(os.path.abspath(os.path.join(PROJECT_ROOT, pdf_path)))
+
+def log_report(report_type: str, summary: str, pdf_path: str):
+    """
+    Logs a generated report summary to a separate JSON file. Returns the report ID.
+    If the PDF is already catalogued (e.g. picked up by backfill_reports.py while
+    the summary was still being written), that entry is completed instead.
+    """
+    now = datetime.now()
+    with _report_log_locked():
+        reports = _load_reports()
+        key = _report_key(pdf_path)
+        report_entry = next((r for r in reports if _report_key(r.get("pdf_path", "")) == key), None)
+        if report_entry is None:
+            report_entry = {"id": _unique_report_id(now, {r.get("id") for r in reports})}
+            reports.append(report_entry)
+        report_entry.update({
+            "timestamp": now.strftime("%Y-%m-%d %H:%M:%S"),
+            "report_type": report_type,
+            "summary": summary,
+            "pdf_path": pdf_path
+        })
+        _save_reports(reports)
+    return report_entry["id"]
+
+def sync_reports(upserts=(), removed_paths=()):
+    """
+    Applies a batch of catalogue changes with one read and one write.
+
+    Args:
+        upserts: dicts with report_type, summary, pdf_path and timestamp (datetime);
+                 an entry for the same PDF is refreshed (keeping its ID and summary)
+                 instead of being added twice
+        removed_paths: PDFs that no longer exist; their entries are dropped
+
+    Returns:
+        dict: counts of added / updated / removed entries
+    """
+    counts = {"added": 0, "updated": 0, "removed": 0}
+    if not upserts and not removed_paths:
+        return counts
+    with _report_log_locked():
+        reports = _load_reports()
+        removed = {_report_key(p) for p in removed_paths}
+        kept = [r for r in reports if _report_key(r.get("pdf_path", "")) not in removed]
+        counts["removed"] = len(reports) - len(kept)
+        by_path = {_report_key(r.get("pdf_path", "")): r for r in kept}
+        taken = {r.get("id") for r in kept}
+        for item in upserts:
+            existing = by_path.get(_report_key(item["pdf_path"]))
+            timestamp = item["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
+            if existing is not None:
+                existing["timestamp"] = timestamp
+                counts["updated"] += 1
+                continue
+            entry = {
+                "id": _unique_report_id(item["timestamp"], taken),
+                "timestamp": timestamp,
+                "report_type": item["report_type"],
+                "summary": item["summary"],
+                "pdf_path": item["pdf_path"]
+            }
+            kept.append(entry)
+            by_path[_report_key(entry["pdf_path"])] = entry
+            counts["added"] += 1
+        _save_reports(kept)
+    return counts
+
+def get_report_paths():
+    """ Normalized absolute paths of every PDF in the catalogue. """
+    with _report_lock:
+        return {_report_key(r.get("pdf_path", "")) for r in _load_reports() if r.get("pdf_path")}
 
 def get_reports():
     """ Retrieves all reports, newest first. """
@@ -95,29 +293,15 @@ def get_reports():
 
 def delete_report(report_id_to_delete: int):
     """Deletes a report record from the JSON file and returns its path."""
-    if not os.path.exists(REPORT_LOG_FILE):
-        return None
-    
-    reports = []
-    path_to_delete = None
-    
-    with open(REPORT_LOG_FILE, "r") as f:
-        try:
-            reports = json.load(f)
-        except (json.JSONDecodeError, ValueError):
-            return None
-    
-    updated_reports = []
-    report_was_found = False
-    for report in reports:
-        if report.get("id") == report_id_to_delete:
-            path_to_delete = report.get("pdf_path")
-            report_was_found = True
-        else:
-            updated_reports.append(report)
-            
-    if report_was_found:
-        with open(REPORT_LOG_FILE, "w") as f:
-            json.dump(updated_reports, f, indent=4)
-            
-    return path_to_delete
\ No newline at end of file
+    with _report_log_locked():
+        reports = _load_reports()
+        path_to_delete = None
+        updated_reports = []
+        for report in reports:
+            if report.get("id") == report_id_to_delete:
+                path_to_delete = report.get("pdf_path")
+            else:
+                updated_reports.append(report)
+        if len(updated_reports) != len(reports):
+            _save_reports(updated_reports)
+    return path_to_delete
@@ -0,0 +1,123 @@
+import numpy as np
+
+# ===================================================================
+# Detection records
+#
+# Model outputs are converted to a NumPy structured array in one step
+# per frame. Vectorized code (e.g. severity selection) works on the
+# array directly; the list of dicts that older callers expect is only
+# built when the Detections are first used as a list.
+# ===================================================================
+
+# Severities as ordered codes, so the worst one is simply the maximum.
+SEVERITY_LEVELS = ["unknown", "normal", "suspicious", "danger"]
+SEVERITY_CODES = {name: code for code, name in enumerate(SEVERITY_LEVELS)}
+
+DETECTION_DTYPE = np.dtype([
+    ("bbox", np.float32, 4),      # x1, y1, x2, y2
+    ("confidence", np.float32),
+    ("class_id", np.int32),
+    ("severity", np.int8),        # index into SEVERITY_LEVELS
+])
+
+class Detections(list):
+    """
+    Detections of one frame as a structured NumPy array (``array``, dtype
+    DETECTION_DTYPE). The list items are the usual dicts
+    ({'class', 'severity', 'confidence', 'bbox'}), built on first list
+    access, so existing callers keep working while frames whose records are
+    never read skip the per-box dicts.
+
+    The C JSON encoder reads list storage directly: serialize ``list(dets)``.
+    """
+    __slots__ = ("array", "_names", "_extra", "_with_severity", "_built")
+
+    def __init__(self, array, names, extra=None, with_severity=True):
+        super().__init__()
+        self.array = array
+        self._names = names
+        self._extra = extra
+        self._with_severity = with_severity
+        self._built = not len(array)
+
+    def _build(self):
+        self._built = True
+        array = self.array
+        classes = [self._names[i] for i in array["class_id"].tolist()]
+        records = [
+            {"class": c, "confidence": conf, "bbox": box, **(self._extra or {})}
+            for c, conf, box in zip(classes, array["confidence"].tolist(), array["bbox"].tolist())
+        ]
+        if self._with_severity:
+            for record, code in zip(records, array["severity"].tolist()):
+                record["severity"] = SEVERITY_LEVELS[code]
+        list.extend(self, records)
+
+    def __len__(self):
+        return list.__len__(self) if self._built else len(self.array)
+
+    def __reduce_ex__(self, protocol):
+        # Records are only stored once built (and possibly changed since).
+        return _restore_detections, (self.array, self._names, self._extra, self._with_severity,
+                                     list.copy(self) if self._built else None)
+
+    @property
+    def severity_codes(self):
+        return self.array["severity"]
+
+def _restore_detections(array, names, extra, with_severity, records):
+    detections = Detections(array, names, extra, with_severity)
+    if records is not None:
+        list.extend(detections, records)
+        detections._built = True
+    return detections
+
+def _built_first(name):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        if not self._built:
+            self._build()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = name
+    return wrapper
+
+# Every list operation that reads or changes the items builds the records first.
+for _name in ("__iter__", "__reversed__", "__getitem__", "__setitem__", "__delitem__", "__contains__",
+              "__eq__", "__ne__", "__lt__", "__le__", "__gt__", "__ge__", "__add__", "__mul__",
+              "__iadd__", "__imul__", "__repr__", "append", "extend", "insert",
+              "pop", "remove", "clear", "copy", "index", "count", "sort", "reverse"):
+    setattr(Detections, _name, _built_first(_name))
+
+def results_to_array(results, severity_table=None, threshold=0.0):
+    """
+    Converts Ultralytics results into a DETECTION_DTYPE array with a single
+    device -> NumPy transfer per result (no per-box tensor access), sorted by
+    descending confidence.
+    """
+    data = [r.boxes.data.cpu().numpy() for r in results if r.boxes is not None and len(r.boxes)]
+    if not data:
+        return np.zeros(0, dtype=DETECTION_DTYPE)
+    data = np.concatenate(data)                       # rows: x1, y1, x2, y2, [track id,] conf, cls
+    data = data[data[:, -2] >= threshold]
+    data = data[np.argsort(-data[:, -2], kind="stable")]
+    array = np.zeros(len(data), dtype=DETECTION_DTYPE)
+    array["bbox"] = data[:, :4]
+    array["confidence"] = data[:, -2]
+    array["class_id"] = data[:, -1]
+    if severity_table is not None:
+        array["severity"] = severity_table[array["class_id"]]
+    return array
+
+def empty_detections(extra=None):
+    """ Detections of a model that was not run on this frame. """
+    return Detections(np.zeros(0, dtype=DETECTION_DTYPE), {}, extra=extra, with_severity=False)
+
+def top_violence_class(detections):
+    """ (class, confidence) of the most confident detection, or ('non-violence', 0.0). """
+    if not detections:
+        return "non-violence", 0.0
+    array = getattr(detections, "array", None)
+    if array is not None and not detections._built:
+        return detections._names[int(array["class_id"][0])], float(array["confidence"][0])
+    return detections[0]["class"], detections[0]["confidence"]
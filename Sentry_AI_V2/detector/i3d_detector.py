@@ -3,6 +3,8 @@ import numpy as np
 from tensorflow.keras.models import load_model
 import os
 
+from detector.preprocess import InputSpec, FramePreprocessor, ClipBuffer
+
 # -------------------- Config --------------------
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
@@ -10,6 +12,7 @@ MODEL_PATH = os.path.join(PROJECT_ROOT, "models", "ucf_crime_heavy_model.keras")
 
 FRAME_SIZE = (128, 128)
 CLIP_LEN = 40
+INPUT_SPEC = InputSpec(size=FRAME_SIZE, color="rgb", dtype="float32", scale=1 / 255.0)
 THRESHOLD = 0.5  # minimum confidence to consider prediction
 
 CLASS_LABELS = {
@@ -24,21 +27,26 @@ model = load_model(MODEL_PATH, compile=False)
 print("[INFO] I3D model loaded.")
 
 # -------------------- Helpers --------------------
+preprocessor = FramePreprocessor()
+
 def preprocess_frame(frame):
-    """Resize and normalize a single frame"""
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    frame_resized = cv2.resize(frame_rgb, FRAME_SIZE).astype("float32") / 255.0
-    return frame_resized
+    """Resize and normalize a single frame (returns a new array)"""
+    return preprocessor.preprocess(frame, INPUT_SPEC)
 
-def run_prediction(frame_buffer):
-    """Predict action from a clip"""
-    clip = np.array(frame_buffer)
-    while clip.shape[0] < CLIP_LEN:
-        clip = np.vstack([clip, clip[-1:]])
+def run_prediction(frame_buffer, threshold=THRESHOLD):
+    """Predict action from a clip (a ClipBuffer or a list of preprocessed frames)"""
+    if isinstance(frame_buffer, ClipBuffer):
+        clip = frame_buffer.clip()
+    else:
+        clip = np.array(frame_buffer)
+        while clip.shape[0] < CLIP_LEN:
+            clip = np.vstack([clip, clip[-1:]])
     clip = np.expand_dims(clip, axis=0)  # (1, CLIP_LEN, H, W, 3)
     preds = model.predict(clip, verbose=0)[0]
     label = int(np.argmax(preds))
     confidence = float(np.max(preds))
+    if confidence < threshold:
+        return "unknown", confidence
     return CLASS_LABELS.get(label, "unknown"), confidence
 
 def detect_from_video(video_path, show=True, threshold=THRESHOLD):
@@ -47,7 +55,7 @@ def detect_from_video(video_path, show=True, threshold=THRESHOLD):
     Returns the final prediction and shows live overlay if show=True.
     """
     cap = cv2.VideoCapture(video_path)
-    frame_buffer = []
+    frame_buffer = ClipBuffer(INPUT_SPEC, CLIP_LEN, preprocessor)
     last_pred = "Collecting frames..."
     last_color = (0, 255, 255)
     last_conf = 0.0
@@ -57,15 +65,15 @@ def detect_from_video(video_path, show=True, threshold=THRESHOLD):
         if not ret:
             break
 
-        frame_buffer.append(preprocess_frame(frame))
+        frame_buffer.append(frame)
         text = f"Collecting {len(frame_buffer)}/{CLIP_LEN} frames..."
         color = (0, 255, 255)
 
         # Run prediction when clip is full
-        if len(frame_buffer) == CLIP_LEN:
+        if frame_buffer.full:
             last_pred, last_conf = run_prediction(frame_buffer, threshold=threshold)
             last_color = (0, 0, 255) if last_pred != "normal" else (0, 255, 0)
-            frame_buffer = []  # reset buffer
+            frame_buffer.reset()
 
         if show:
             output_frame = frame.copy()
@@ -0,0 +1,109 @@
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# ===================================================================
+# Clip model preprocessing
+#
+# Every clip model declares the input it expects as an InputSpec. A
+# FramePreprocessor turns a camera frame into that input, reusing its
+# resize / colour conversion scratch buffers between frames.
+# ClipBuffer writes the preprocessed frames straight into one
+# preallocated (clip_len, H, W, 3) array instead of building a list of
+# per-frame arrays and stacking them.
+# ===================================================================
+
+InputSpec = namedtuple("InputSpec", ["size", "color", "dtype", "scale", "mean", "std"])
+InputSpec.__new__.__defaults__ = ("rgb", "float32", 1 / 255.0, None, None)
+InputSpec.__doc__ = """
+Model input description.
+
+    size:  (width, height) the frame is resized to
+    color: 'rgb' or 'bgr' channel order
+    dtype: output dtype
+    scale: multiplier applied first (1/255 maps uint8 to [0, 1])
+    mean, std: optional per-channel normalization applied after scaling
+"""
+
+class FramePreprocessor:
+    """
+    Converts frames to model inputs. Not thread-safe: use one per thread.
+
+    The uint8 resize and colour conversion go into scratch buffers kept
+    per (size, channel order), so no intermediate image is allocated per
+    frame.
+    """
+
+    def __init__(self):
+        self._scratch = {}       # (size, color) -> reusable uint8 buffers
+
+    def _resize(self, frame, size, color):
+        key = (size, color)
+        scratch = self._scratch.get(key)
+        if scratch is None:
+            shape = (size[1], size[0], 3)
+            scratch = self._scratch[key] = (np.empty(shape, np.uint8), np.empty(shape, np.uint8))
+        resized, converted = scratch
+        cv2.resize(frame, size, dst=resized)
+        if color == "rgb":
+            cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=converted)
+            return converted
+        return resized
+
+    def preprocess(self, frame, spec, out=None):
+        """
+        Model input for a BGR frame.
+
+        Args:
+            out: optional preallocated array to write into (e.g. a slot of a
+                 ClipBuffer). Without it a new array is returned.
+        """
+        image = self._resize(frame, spec.size, spec.color)
+        if out is None:
+            out = np.empty(image.shape, dtype=spec.dtype)
+        np.multiply(image, spec.scale, out=out, casting="unsafe")
+        if spec.mean is not None:
+            out -= np.asarray(spec.mean, dtype=out.dtype)
+        if spec.std is not None:
+            out /= np.asarray(spec.std, dtype=out.dtype)
+        return out
+
+class ClipBuffer:
+    """ Fixed-size clip of preprocessed frames in one reused array. """
+
+    def __init__(self, spec, clip_len, preprocessor=None):
+        self.spec = spec
+        self.clip_len = clip_len
+        self.preprocessor = preprocessor or FramePreprocessor()
+        width, height = spec.size
+        self.array = np.empty((clip_len, height, width, 3), dtype=spec.dtype)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def full(self):
+        return self.count == self.clip_len
+
+    def append(self, frame):
+        if self.full:
+            raise IndexError("clip is full; call reset() or take() first")
+        self.preprocessor.preprocess(frame, self.spec, out=self.array[self.count])
+        self.count += 1
+
+    def clip(self):
+        """ The clip, padded to clip_len by repeating the last frame. Valid until the next append/reset. """
+        if 0 < self.count < self.clip_len:
+            self.array[self.count:] = self.array[self.count - 1]
+        return self.array
+
+    def take(self):
+        """ A copy of the padded clip (safe to hand to another thread), then resets. """
+        clip = self.clip().copy()
+        self.reset()
+        return clip
+
+    def reset(self):
+        self.count = 0
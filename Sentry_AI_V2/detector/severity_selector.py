@@ -1,4 +1,6 @@
-from detector.yolo_detector import detect_from_frame
+import numpy as np
+
+from detector.detections import SEVERITY_CODES, SEVERITY_LEVELS
 
 # Violence YOLO → severity mapping
 VIOLENCE_SEVERITY_MAP = {
@@ -12,20 +14,17 @@ def select_severity(yolo_detections, violence_prediction):
     
     Args:
         yolo_detections: list of dicts [{"class":..., "severity":..., ...}, ...]
+                         (a Detections list is reduced on its severity array directly)
         violence_prediction: string output from Violence YOLO ("violence", "non-violence")
         
     Returns:
         final_severity: "normal", "suspicious", or "danger"
     """
-    # 1️⃣ Default severity from Violence YOLO
-    final_severity = VIOLENCE_SEVERITY_MAP.get(violence_prediction, "normal")
-
-    # 2️⃣ Override if Object YOLO finds higher severity
-    for det in yolo_detections:
-        if det["severity"] == "danger":
-            final_severity = "danger"
-            break
-        elif det["severity"] == "suspicious" and final_severity != "danger":
-            final_severity = "suspicious"
-
-    return final_severity
+    # Default severity from Violence YOLO; object detections can only raise it.
+    codes = getattr(yolo_detections, "severity_codes", None)
+    if codes is None:
+        codes = np.fromiter((SEVERITY_CODES.get(det["severity"], 0) for det in yolo_detections), dtype=np.int8)
+    final_code = SEVERITY_CODES[VIOLENCE_SEVERITY_MAP.get(violence_prediction, "normal")]
+    if codes.size:
+        final_code = max(final_code, int(codes.max()))
+    return SEVERITY_LEVELS[max(final_code, SEVERITY_CODES["normal"])]
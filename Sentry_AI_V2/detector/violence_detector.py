@@ -1,7 +1,9 @@
 # violence_detector.py
 import os
 from ultralytics import YOLO
-import numpy as np
+
+from detector.detections import Detections, results_to_array, top_violence_class
+from pipeline.metrics import MODEL_CALLS, stage
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
@@ -14,40 +16,17 @@ print("[INFO] YOLOv11 Violence model loaded.")
 
 VIOLENCE_CLASSES = {0: "non-violence", 1: "violence"}
 
-def run_violence_detection(frame, threshold=0.5):
+def run_violence_detection(frame, threshold=0.5, imgsz=None):
     """
     Run YOLOv11 violence detection on a single frame.
+    imgsz: inference size override (e.g. lowered by the live quality controller)
     Returns:
         detections: list of dicts with bbox, class, confidence, type
+                    (highest confidence first; empty if nothing was detected)
     """
-    results = violence_model(frame)
-    detections = []
-
-    for r in results:
-        for box in r.boxes:
-            conf = float(box.conf[0])
-            if conf < threshold:
-                continue
-
-            cls_id = int(box.cls[0])
-            cls_name = violence_model.names[cls_id]
-
-            x1, y1, x2, y2 = box.xyxy[0].tolist()
-            detections.append({
-                "class": cls_name,
-                "confidence": conf,
-                "bbox": [x1, y1, x2, y2],
-                "type": "violence"
-            })
-
-    # If nothing detected, return non-violence with fake bbox covering whole frame
-    if not detections:
-        h, w = frame.shape[:2]
-        detections.append({
-            "class": "non-violence",
-            "confidence": 0.0,
-            "bbox": [0, 0, w, h],
-            "type": "violence"
-        })
-
-    return detections
+    options = {"imgsz": imgsz} if imgsz else {}
+    MODEL_CALLS.inc(model="violence")
+    with stage("violence_detect"):
+        results = violence_model(frame, conf=threshold, verbose=False, **options)
+    return Detections(results_to_array(results, threshold=threshold), violence_model.names,
+                      extra={"type": "violence"}, with_severity=False)
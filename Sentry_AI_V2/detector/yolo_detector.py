@@ -1,5 +1,12 @@
 from ultralytics import YOLO
 import os
+import math
+import threading
+import numpy as np
+
+from detector.detections import SEVERITY_CODES, Detections, results_to_array
+from pipeline.metrics import MODEL_CALLS, Counter, stage
+
 # -------------------- Config --------------------
 DANGER_CLASSES = [ 'gun']
 SUSPICIOUS_CLASSES = ['mask', 'helmet', 'knife','fire']
@@ -11,6 +18,19 @@ MODEL_PATH = os.path.join(PROJECT_ROOT, "models", "object_yolo.pt")
 
 CONF_THRESHOLD = 0.4              # confidence threshold
 
+# Coarse-to-fine mode: a low-resolution pass over the whole frame, then
+# full-resolution passes only on crops around uncertain danger / suspicious
+# candidates (small guns and knives are what a low-res pass misses first).
+DETECT_MODE = os.getenv("DETECT_MODE", "full")                  # "full" or "coarse_to_fine"
+COARSE_IMGSZ = int(os.getenv("DETECT_COARSE_IMGSZ", "320"))
+FINE_IMGSZ = 640                  # the models' default input size
+CANDIDATE_CONF = 0.15             # coarse boxes this confident can become candidates
+REFINE_BELOW = 0.6                # ... when below this confidence
+MAX_REFINE_CROPS = 4
+CROP_MARGIN = 1.0                 # context around a candidate, in box sizes per side
+MIN_CROP = 160                    # px
+MERGE_IOU = 0.5
+
 model = YOLO(MODEL_PATH)
 
 # -------------------- Helpers --------------------
@@ -25,32 +45,142 @@ def classify_detection(cls_name):
     else:
         return "unknown"
 
-def detect_from_frame(frame, threshold=CONF_THRESHOLD):
+def class_severity_table(names):
+    """ Severity code per class id of a model, for vectorized lookups. """
+    table = np.zeros(max(names) + 1, dtype=np.int8)
+    for cls_id, cls_name in names.items():
+        table[cls_id] = SEVERITY_CODES[classify_detection(cls_name)]
+    return table
+
+_SEVERITY_TABLE = class_severity_table(model.names)
+
+_REFINE_CLASS_IDS = np.array([cls_id for cls_id, name in model.names.items()
+                              if name in DANGER_CLASSES + SUSPICIOUS_CLASSES], dtype=np.int32)
+
+PIXELS = Counter("sentry_detect_pixels_total",
+                 "Object detector input pixels (mode=full: one pass at the default size, for comparison).", ["mode"])
+_stats_lock = threading.Lock()
+_stats = {"frames": 0, "coarse_to_fine_frames": 0, "crops": 0, "refined_detections": 0,
+          "pixels": 0, "full_pixels": 0}
+
+def _input_pixels(shape, imgsz, stride=32):
+    """ Pixels the model sees for an image letterboxed to imgsz (minimal padding, as in predict). """
+    h, w = shape[:2]
+    r = imgsz / max(h, w)
+    return math.ceil(h * r / stride) * stride * math.ceil(w * r / stride) * stride
+
+def _count(frame_shape, pixels, coarse_to_fine=False, crops=0, refined=0):
+    full = _input_pixels(frame_shape, FINE_IMGSZ)
+    PIXELS.inc(pixels, mode="coarse_to_fine" if coarse_to_fine else "single")
+    PIXELS.inc(full, mode="full")
+    with _stats_lock:
+        _stats["frames"] += 1
+        _stats["coarse_to_fine_frames"] += coarse_to_fine
+        _stats["crops"] += crops
+        _stats["refined_detections"] += refined
+        _stats["pixels"] += pixels
+        _stats["full_pixels"] += full
+
+def get_detect_stats():
+    """ Detector input pixels vs. one full-size pass per frame, and coarse-to-fine crop counts. """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["mode"] = DETECT_MODE
+    stats["saved_ratio"] = round(1 - stats["pixels"] / stats["full_pixels"], 3) if stats["full_pixels"] else None
+    stats["pixels_per_frame"] = round(stats["pixels"] / stats["frames"]) if stats["frames"] else None
+    return stats
+
+def _box_iou(box, boxes):
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-6)
+
+def _merge(array, iou=MERGE_IOU):
+    """ Keeps the most confident of overlapping same-class boxes; sorted by confidence. """
+    array = array[np.argsort(-array["confidence"], kind="stable")]
+    keep = np.ones(len(array), dtype=bool)
+    for i in range(len(array)):
+        if not keep[i]:
+            continue
+        rest = np.flatnonzero(keep[i + 1:]) + i + 1
+        same = rest[array["class_id"][rest] == array["class_id"][i]]
+        if same.size:
+            keep[same[_box_iou(array["bbox"][i], array["bbox"][same]) > iou]] = False
+    return array[keep]
+
+def _crop_window(box, shape):
+    h, w = shape[:2]
+    x1, y1, x2, y2 = box
+    pad = max(x2 - x1, y2 - y1) * CROP_MARGIN
+    cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+    half = max((max(x2 - x1, y2 - y1) + 2 * pad) / 2, MIN_CROP / 2)
+    left, top = int(max(0, cx - half)), int(max(0, cy - half))
+    right, bottom = int(min(w, math.ceil(cx + half))), int(min(h, math.ceil(cy + half)))
+    return left, top, right, bottom
+
+def detect_coarse_to_fine(frame, threshold=CONF_THRESHOLD, coarse_imgsz=COARSE_IMGSZ):
+    """
+    Two-stage detection: the whole frame at coarse_imgsz, then the crops around
+    low-confidence danger / suspicious candidates at full resolution. Refined
+    boxes are mapped back to frame coordinates and merged with the coarse ones.
+    Returns the same Detections as detect_from_frame.
+    """
+    MODEL_CALLS.inc(model="object")
+    with stage("object_detect"):
+        results = model(frame, conf=min(CANDIDATE_CONF, threshold), imgsz=coarse_imgsz, verbose=False)
+    coarse = results_to_array(results, _SEVERITY_TABLE)
+    pixels = _input_pixels(frame.shape, coarse_imgsz)
+
+    uncertain = (coarse["confidence"] < REFINE_BELOW) & np.isin(coarse["class_id"], _REFINE_CLASS_IDS)
+    candidates = coarse[uncertain][:MAX_REFINE_CROPS]
+    pool = [coarse[coarse["confidence"] >= threshold]]
+    windows = []
+    for box in candidates["bbox"]:
+        window = _crop_window(box, frame.shape)
+        # Candidates inside an already refined window are covered by it.
+        if any(w[0] <= box[0] and w[1] <= box[1] and box[2] <= w[2] and box[3] <= w[3] for w in windows):
+            continue
+        windows.append(window)
+        left, top, right, bottom = window
+        crop = frame[top:bottom, left:right]
+        imgsz = min(FINE_IMGSZ, math.ceil(max(crop.shape[:2]) / 32) * 32)
+        MODEL_CALLS.inc(model="object")
+        with stage("object_refine"):
+            results = model(crop, conf=threshold, imgsz=imgsz, verbose=False)
+        refined = results_to_array(results, _SEVERITY_TABLE, threshold)
+        refined["bbox"] += np.array([left, top, left, top], dtype=np.float32)
+        pool.append(refined)
+        pixels += _input_pixels(crop.shape, imgsz)
+
+    merged = _merge(np.concatenate(pool))
+    _count(frame.shape, pixels, coarse_to_fine=True, crops=len(windows),
+           refined=sum(len(a) for a in pool[1:]))
+    return Detections(merged, model.names)
+
+def detect_from_frame(frame, threshold=CONF_THRESHOLD, imgsz=None):
     """
     Run YOLO detection on a single frame (NumPy array).
     Returns a list of detections: 
     [{'class':..., 'severity':..., 'confidence':..., 'bbox':[x1,y1,x2,y2]}, ...]
+    (a Detections list, which also carries them as a structured array)
+
+    imgsz: inference size override (e.g. lowered by the live quality controller)
+    With DETECT_MODE=coarse_to_fine and no override, see detect_coarse_to_fine.
     """
-    results = model(frame)
-    detections = []
-
-    for r in results:
-        for box in r.boxes:
-            conf = float(box.conf[0])
-            if conf < threshold:
-                continue  # skip low-confidence predictions
-
-            cls_id = int(box.cls[0])
-            cls_name = model.names[cls_id]
-            severity = classify_detection(cls_name)
-            detections.append({
-                "class": cls_name,
-                "severity": severity,
-                "confidence": conf,
-                "bbox": box.xyxy[0].tolist()  # [x1, y1, x2, y2]
-            })
-
-    return detections
+    if imgsz is None and DETECT_MODE == "coarse_to_fine":
+        return detect_coarse_to_fine(frame, threshold)
+    options = {"imgsz": imgsz} if imgsz else {}
+    # Low-confidence boxes are dropped inside the model's NMS already.
+    MODEL_CALLS.inc(model="object")
+    with stage("object_detect"):
+        results = model(frame, conf=threshold, verbose=False, **options)
+    _count(frame.shape, _input_pixels(frame.shape, imgsz or FINE_IMGSZ))
+    return Detections(results_to_array(results, _SEVERITY_TABLE, threshold), model.names)
 
 # -------------------- Optional testing --------------------
 def detect_from_image(image_path, threshold=CONF_THRESHOLD):
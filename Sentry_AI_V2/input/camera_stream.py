@@ -0,0 +1,202 @@
+import os
+import queue
+import threading
+
+import cv2
+
+from pipeline.metrics import Counter, stage
+
+# ===================================================================
+# Frame capture with decode-ahead
+#
+# A producer thread owns the cv2.VideoCapture and decodes into a
+# bounded queue while the caller runs inference on the previous frame,
+# so decoding and inference overlap instead of taking turns. Skipped
+# frames (stride > 1) are only grabbed, never decoded, and frames can be
+# downscaled right after decoding.
+#
+# For files the queue applies back-pressure (no frame is lost). For live
+# cameras and streams the oldest queued frame is dropped instead, so
+# the consumer always gets a recent frame rather than a growing backlog.
+#
+# When only some frame ranges are wanted, long gaps between them are
+# skipped with a seek to a little before the next range (the margin
+# absorbs backends that land on a keyframe after the target) instead of
+# grabbing every frame in between.
+# ===================================================================
+
+PREFETCH_FRAMES = int(os.getenv("PREFETCH_FRAMES", "8"))      # 0 decodes synchronously
+DECODE_MAX_WIDTH = int(os.getenv("DECODE_MAX_WIDTH", "0"))    # 0 keeps the source size
+LIVE_PREFETCH_FRAMES = 2
+DECODE_SEEK_MIN_GAP = int(os.getenv("DECODE_SEEK_MIN_GAP", "250"))   # frames; shorter gaps are grabbed through
+DECODE_SEEK_MARGIN = int(os.getenv("DECODE_SEEK_MARGIN", "25"))      # frames grabbed before a range after a seek
+
+FRAMES_DROPPED = Counter("sentry_frames_dropped_total", "Live frames dropped because analysis fell behind.", [])
+
+_END = object()
+
+def is_live_source(source):
+    """ Webcam indices and stream URLs are live; paths of existing files are not. """
+    return isinstance(source, int) or not os.path.isfile(str(source))
+
+def _resize(frame, max_width):
+    if max_width and frame.shape[1] > max_width:
+        height = round(frame.shape[0] * max_width / frame.shape[1])
+        frame = cv2.resize(frame, (max_width, height), interpolation=cv2.INTER_AREA)
+    return frame
+
+def _seek(cap, index, target):
+    """
+    Seeks forward to frame `target`; returns the new position, or `index`
+    when the backend cannot seek exactly (reading then continues in order).
+    """
+    with stage("seek"):
+        if not cap.set(cv2.CAP_PROP_POS_FRAMES, target):
+            return index
+        position = cap.get(cv2.CAP_PROP_POS_FRAMES)
+    if position == target:
+        return target
+    # The stream moved somewhere unexpected: go back to where we were.
+    cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+    return index if cap.get(cv2.CAP_PROP_POS_FRAMES) == index else None
+
+def _decode(cap, stride, max_width, stop=None, ranges=None):
+    """
+    Yields (frame, source frame index), grabbing without decoding the frames in between.
+    ranges: sorted inclusive (start, end) frame ranges to decode instead of every stride-th frame;
+            gaps of DECODE_SEEK_MIN_GAP frames or more are skipped with a seek.
+    """
+    index = 0
+    ranges = list(ranges) if ranges is not None else None
+    can_seek = ranges is not None and DECODE_SEEK_MIN_GAP > 0
+    while stop is None or not stop.is_set():
+        if ranges is not None:
+            while ranges and ranges[0][1] < index:
+                ranges.pop(0)
+            if not ranges:
+                return
+            target = ranges[0][0] - DECODE_SEEK_MARGIN
+            if can_seek and target - index >= DECODE_SEEK_MIN_GAP:
+                position = _seek(cap, index, target)
+                if position is None:
+                    raise IOError("Lost the stream position while seeking")
+                can_seek = position == target
+                index = position
+            skip = index < ranges[0][0]
+        else:
+            skip = index % stride
+        with stage("decode"):
+            if skip:
+                ok, frame = cap.grab(), None
+            else:
+                ok, frame = cap.read()
+                if ok:
+                    frame = _resize(frame, max_width)
+        if not ok:
+            return
+        if frame is not None:
+            yield frame, index
+        index += 1
+
+class FramePrefetcher:
+    """
+    Decodes a source on a background thread into a bounded queue of (frame, index).
+    The prefetcher owns the capture and releases it when decoding stops.
+    """
+
+    def __init__(self, cap, size=PREFETCH_FRAMES, stride=1, max_width=DECODE_MAX_WIDTH, drop_oldest=False,
+                 ranges=None):
+        self.cap = cap
+        self.stride = stride
+        self.ranges = ranges
+        self.max_width = max_width
+        self.drop_oldest = drop_oldest
+        self._queue = queue.Queue(maxsize=max(1, size))
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="frame-prefetch", daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self.drop_oldest and item is not _END:
+                    try:
+                        self._queue.get_nowait()
+                        FRAMES_DROPPED.inc()
+                    except queue.Empty:
+                        pass
+
+    def _run(self):
+        try:
+            for item in _decode(self.cap, self.stride, self.max_width, self._stop, self.ranges):
+                self._put(item)
+        except Exception as e:
+            self._error = e
+        finally:
+            # Released here, never while a read may still be in progress on this thread.
+            self.cap.release()
+            self._put(_END)
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                if self._error is not None:
+                    raise self._error
+                return
+            yield item
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def close(self):
+        """ Stops the producer (it finishes the frame it is decoding, then releases the capture). """
+        self._stop.set()
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        self._thread.join(timeout=5)
+
+def capture_frames(source=0, prefetch=None, stride=1, max_width=DECODE_MAX_WIDTH, ranges=None):
+    """
+    Yields (frame, frame_index) from a video file, webcam index or stream URL.
+
+    Args:
+        prefetch: frames decoded ahead on a background thread (default
+                  PREFETCH_FRAMES for files, LIVE_PREFETCH_FRAMES for live
+                  sources; 0 decodes in the caller's thread)
+        stride: yield every Nth frame; the others are grabbed but not decoded
+        max_width: downscale wider frames right after decoding (0 = off)
+        ranges: only decode these sorted, inclusive (start, end) frame index
+                ranges (instead of stride); reading stops after the last one
+
+    frame_index is the position in the source, so it stays meaningful with a stride.
+
+    Raises:
+        IOError: if the source cannot be opened
+    """
+    if stride < 1:
+        raise ValueError("stride must be at least 1")
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video source: {source}")
+    live = is_live_source(source)
+    if prefetch is None:
+        prefetch = LIVE_PREFETCH_FRAMES if live else PREFETCH_FRAMES
+    if prefetch <= 0:
+        try:
+            yield from _decode(cap, stride, max_width, ranges=ranges)
+        finally:
+            cap.release()
+        return
+    prefetcher = FramePrefetcher(cap, prefetch, stride, max_width, drop_oldest=live, ranges=ranges)
+    try:
+        yield from prefetcher
+    finally:
+        prefetcher.close()
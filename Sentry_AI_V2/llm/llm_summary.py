@@ -1,7 +1,18 @@
 import os
+import time
+import math
+import random
+import threading
 import requests
 import json
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from llm.summary_cache import SummaryCache
+from pipeline.metrics import TASK_SECONDS, stage
+from llm.local_summary import generate_local_summary, event_classes as _event_classes, find_incidents as _find_incidents
 
 # Load .env variables
 load_dotenv()
@@ -9,33 +20,191 @@ load_dotenv()
 # -------------------- Gemini API Config --------------------
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = "gemini-2.0-flash"
-GEMINI_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent"
+GEMINI_URL = os.getenv(
+    "GEMINI_URL",
+    f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent"
+)
 
-# -------------------- Generate Summary --------------------
-def generate_summary_from_events(event_buffer):
+# -------------------- Prompt Budget --------------------
+# Upper bound for the prompt sent to Gemini. Event lists that do not fit
+# are compressed into a digest (counts, time spans, peaks) instead.
+LLM_TOKEN_BUDGET = int(os.getenv("LLM_TOKEN_BUDGET", "2000"))
+CHARS_PER_TOKEN = 4          # rough average for English / Gemini tokenizers
+MAX_PEAKS = 5
+
+# Sessions whose raw prompt exceeds LLM_MAP_REDUCE_FACTOR x the budget are
+# summarized per time window (in parallel) and then merged.
+LLM_MAP_REDUCE_FACTOR = float(os.getenv("LLM_MAP_REDUCE_FACTOR", "4"))
+LLM_MAP_REDUCE_MAX_WINDOWS = int(os.getenv("LLM_MAP_REDUCE_MAX_WINDOWS", "8"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+# -------------------- Summarizer Selection --------------------
+# "gemini": use Gemini, falling back to the local template summarizer when the
+# API fails or takes longer than LLM_LATENCY_BUDGET seconds. "local": always
+# use the local summarizer.
+SUMMARIZER = os.getenv("SUMMARIZER", "gemini").lower()
+LLM_LATENCY_BUDGET = float(os.getenv("LLM_LATENCY_BUDGET", "30"))
+
+# -------------------- HTTP Client --------------------
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = 0.5       # seconds; doubled per attempt, with +-50% jitter
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# One pooled keep-alive session for all Gemini calls (TLS handshake is paid once).
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+summary_cache = SummaryCache()
+
+_stats_lock = threading.Lock()
+_latencies = deque(maxlen=200)   # seconds, successful API calls only
+_counters = {"requests": 0, "api_calls": 0, "retries": 0, "errors": 0, "map_reduce": 0, "local_fallbacks": 0}
+
+def _count(name, n=1):
+    with _stats_lock:
+        _counters[name] += n
+
+def get_llm_stats():
+    """ Request counters, cache hit rate and recent API latency. """
+    with _stats_lock:
+        latencies = sorted(_latencies)
+        stats = dict(_counters)
+    if latencies:
+        stats["latency_avg"] = round(sum(latencies) / len(latencies), 3)
+        stats["latency_p50"] = round(latencies[len(latencies) // 2], 3)
+        stats["latency_p95"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3)
+    stats["cache"] = summary_cache.stats()
+    return stats
+
+def _remaining(deadline):
+    """ Seconds left until a time.monotonic() deadline (None: no deadline). """
+    return None if deadline is None else deadline - time.monotonic()
+
+def _post_with_retries(url, headers, body, deadline=None):
     """
-    Generates a textual summary of events using Gemini LLM API.
+    POSTs with connect/read timeouts, retrying transient failures with jittered backoff.
+    With a deadline, timeouts are capped to the time left and no attempt starts past it.
+    """
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        if attempt:
+            _count("retries")
+            backoff = LLM_BACKOFF_BASE * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+            remaining = _remaining(deadline)
+            if remaining is not None and remaining <= backoff:
+                raise requests.Timeout("LLM latency budget exhausted before the next retry")
+            time.sleep(backoff)
+        remaining = _remaining(deadline)
+        if remaining is not None and remaining <= 0:
+            raise requests.Timeout("LLM latency budget exhausted")
+        connect_timeout, read_timeout = LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT
+        if remaining is not None:
+            connect_timeout, read_timeout = min(connect_timeout, remaining), min(read_timeout, remaining)
+        _count("api_calls")
+        try:
+            response = _session.post(url, headers=headers, data=body,
+                                     timeout=(connect_timeout, read_timeout))
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            print(f"[WARN] Gemini request failed ({e.__class__.__name__}), retrying...")
+            continue
+        if response.status_code in RETRY_STATUS_CODES and attempt < LLM_MAX_RETRIES:
+            print(f"[WARN] Gemini returned HTTP {response.status_code}, retrying...")
+            continue
+        return response
 
-    Args:
-        event_buffer (list): List of dicts, each containing:
-                             {'frame': int, 'yolo_object': str, 'yolo_violence': str, 'final': str}
+PROMPT_HEADER = "Summarize the following surveillance events detected by Mini SentryAI+:\n\n"
+
+def estimate_tokens(text):
+    """ Cheap token estimate (~4 characters per token). """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _event_line(ev):
+    return (
+        f"- Frame {ev['frame']}: "
+        f"Object Detection = {ev.get('yolo_object', 'N/A')}, "
+        f"Violence Detection = {ev.get('yolo_violence', 'N/A')}, "
+        f"Final Severity = {ev['final']}\n"
+    )
+
+def _describe_incident(events):
+    severities = Counter(ev["final"] for ev in events)
+    classes = Counter(cls for ev in events for cls in _event_classes(ev))
+    span = f"frames {events[0].get('frame')}-{events[-1].get('frame')}"
+    if events[0].get("timestamp") and events[-1].get("timestamp"):
+        span += f" ({events[0]['timestamp']} to {events[-1]['timestamp']})"
+    top = ", ".join(f"{c} x{n}" for c, n in classes.most_common(3)) or "no objects"
+    sev = ", ".join(f"{s} x{n}" for s, n in severities.most_common())
+    return f"- {span}: {len(events)} events ({sev}); objects: {top}\n"
+
+def build_event_digest(event_buffer, token_budget=LLM_TOKEN_BUDGET, header=PROMPT_HEADER):
+    """
+    Compresses an event list into a prompt that fits within token_budget.
+
+    Short lists are passed through line by line. Longer ones become a digest:
+    totals, per-severity / per-class / violence counts, the time span, the
+    busiest incidents and, if room is left, the most severe individual events.
 
     Returns:
-        str: LLM-generated summary
+        str: the prompt text
     """
+    raw = header + "".join(_event_line(ev) for ev in event_buffer)
+    if estimate_tokens(raw) <= token_budget:
+        return raw
+
+    frames = [ev.get("frame", 0) for ev in event_buffer]
+    severities = Counter(ev["final"] for ev in event_buffer)
+    classes = Counter(cls for ev in event_buffer for cls in _event_classes(ev))
+    violence = Counter(str(ev.get("yolo_violence", ev.get("violence", "N/A"))) for ev in event_buffer)
+    timestamps = sorted(ev["timestamp"] for ev in event_buffer if ev.get("timestamp"))
+
+    sections = [
+        header + "(The individual events were aggregated to keep the request short.)\n\n",
+        f"Total significant events: {len(event_buffer)} (frames {min(frames)} to {max(frames)})\n"
+        + (f"Time span: {timestamps[0]} to {timestamps[-1]}\n" if timestamps else ""),
+        "Events by final severity: " + ", ".join(f"{k} = {v}" for k, v in severities.most_common()) + "\n",
+        "Detected objects (frames containing each): "
+        + (", ".join(f"{k} = {v}" for k, v in classes.most_common()) or "none") + "\n",
+        "Violence model output: " + ", ".join(f"{k} = {v}" for k, v in violence.most_common()) + "\n",
+    ]
+    incidents = _find_incidents(event_buffer)
+    peaks = sorted(incidents, key=lambda inc: (sum(e["final"] == "danger" for e in inc), len(inc)), reverse=True)
+    sections.append(f"\nDistinct incidents: {len(incidents)}. Most significant:\n")
+    sections.extend(_describe_incident(inc) for inc in sorted(peaks[:MAX_PEAKS], key=lambda inc: inc[0].get("frame", 0)))
+
+    digest = ""
+    for section in sections:
+        if estimate_tokens(digest + section) > token_budget:
+            break
+        digest += section
+
+    # Spend what is left of the budget on the most severe individual events.
+    notable = sorted(event_buffer, key=lambda ev: ev["final"] == "danger", reverse=True)
+    sample = "\nSample of individual danger/suspicious events:\n"
+    if estimate_tokens(digest + sample) < token_budget:
+        digest += sample
+        for ev in notable:
+            line = _event_line(ev)
+            if estimate_tokens(digest + line) > token_budget:
+                break
+            digest += line
+    return digest
+
+# -------------------- Gemini Call --------------------
+def _call_gemini(text_input, deadline=None):
+    """ Sends one prompt to Gemini (or answers it from the cache) and returns the text. """
+    _count("requests")
+    cached = summary_cache.get(text_input, GEMINI_MODEL)
+    if cached is not None:
+        print("[INFO] LLM summary served from cache.")
+        return cached
+
     if not GEMINI_API_KEY:
         raise Exception("GEMINI_API_KEY is not set or empty!")
 
-    # Prepare input text for LLM
-    text_input = "Summarize the following surveillance events detected by Mini SentryAI+:\n\n"
-    for ev in event_buffer:
-        text_input += (
-            f"- Frame {ev['frame']}: "
-            f"Object Detection = {ev.get('yolo_object', 'N/A')}, "
-            f"Violence Detection = {ev.get('yolo_violence', 'N/A')}, "
-            f"Final Severity = {ev['final']}\n"
-        )
-
     payload = {
         "contents": [
             {"parts": [{"text": text_input}]}
@@ -48,10 +217,21 @@ def generate_summary_from_events(event_buffer):
     }
 
     # Send POST request to Gemini API
-    response = requests.post(GEMINI_URL, headers=headers, data=json.dumps(payload))
+    started = time.perf_counter()
+    try:
+        with stage("llm_api", TASK_SECONDS):
+            response = _post_with_retries(GEMINI_URL, headers, json.dumps(payload), deadline=deadline)
+    except Exception:
+        _count("errors")
+        raise
+    elapsed = time.perf_counter() - started
+    print(f"[INFO] Gemini responded in {elapsed:.2f}s (HTTP {response.status_code}).")
 
     if response.status_code != 200:
+        _count("errors")
         raise Exception(f"Gemini API error: {response.status_code} {response.text}")
+    with _stats_lock:
+        _latencies.append(elapsed)
 
     result = response.json()
 
@@ -59,10 +239,132 @@ def generate_summary_from_events(event_buffer):
     try:
         summary_text = result["candidates"][0]["content"]["parts"][0]["text"]
     except Exception:
-        summary_text = "Summary unavailable: Gemini API returned unexpected format."
+        return "Summary unavailable: Gemini API returned unexpected format."
+
+    summary_cache.put(text_input, GEMINI_MODEL, summary_text)
+    return summary_text
+
+# -------------------- Map-Reduce --------------------
+def _split_windows(event_buffer, count):
+    """ Splits events into `count` consecutive windows of similar size, never cutting an incident. """
+    incidents = _find_incidents(event_buffer)
+    target = len(event_buffer) / count
+    windows, current = [], []
+    for incident in incidents:
+        current.extend(incident)
+        if len(current) >= target and len(windows) < count - 1:
+            windows.append(current)
+            current = []
+    if current:
+        windows.append(current)
+    return windows
+
+def _summarize_map_reduce(event_buffer, raw_tokens, deadline=None):
+    """
+    Summarizes each time window in parallel, then merges the partial
+    summaries with one final call. Every prompt stays within LLM_TOKEN_BUDGET,
+    so long sessions keep per-window detail instead of a single coarse digest.
+    """
+    count = min(LLM_MAP_REDUCE_MAX_WINDOWS, math.ceil(raw_tokens / LLM_TOKEN_BUDGET))
+    windows = _split_windows(event_buffer, count)
+    _count("map_reduce")
+    print(f"[INFO] Map-reduce summary over {len(windows)} windows ({LLM_MAX_CONCURRENCY} concurrent calls).")
 
+    def frames(window):
+        return f"frames {window[0].get('frame')} to {window[-1].get('frame')}"
+
+    prompts = [
+        build_event_digest(window, header=(
+            f"Summarize part {i} of {len(windows)} of a surveillance session detected by Mini SentryAI+ "
+            f"({frames(window)}). Be concise and mention the frames of key incidents:\n\n"
+        ))
+        for i, window in enumerate(windows, 1)
+    ]
+    started = time.perf_counter()
+    with stage("llm_map", TASK_SECONDS), \
+            ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm-map") as pool:
+        partials = list(pool.map(lambda prompt: _call_gemini(prompt, deadline), prompts))
+    map_elapsed = time.perf_counter() - started
+
+    severities = Counter(ev["final"] for ev in event_buffer)
+    merge_prompt = (
+        f"Below are summaries of {len(windows)} consecutive parts of one surveillance session "
+        f"detected by Mini SentryAI+ ({len(event_buffer)} significant events; "
+        + ", ".join(f"{k} = {v}" for k, v in severities.most_common())
+        + "). Merge them into a single coherent summary of the whole session.\n\n"
+    )
+    # Keep the merge prompt within budget as well.
+    share = max(1, (LLM_TOKEN_BUDGET - estimate_tokens(merge_prompt)) // len(windows)) * CHARS_PER_TOKEN
+    for i, (window, partial) in enumerate(zip(windows, partials), 1):
+        merge_prompt += f"Part {i} ({frames(window)}):\n{partial.strip()[:share]}\n\n"
+    summary_text = _call_gemini(merge_prompt, deadline)
+    print(f"[INFO] Map-reduce summary: map {map_elapsed:.2f}s, "
+          f"total {time.perf_counter() - started:.2f}s.")
     return summary_text
 
+# -------------------- Generate Summary --------------------
+def generate_summary_from_events(event_buffer, deadline=None):
+    """
+    Generates a textual summary of events using Gemini LLM API.
+
+    Args:
+        event_buffer (list): List of dicts, each containing:
+                             {'frame': int, 'yolo_object': str, 'yolo_violence': str, 'final': str}
+        deadline: optional time.monotonic() value; API calls and retries stop there
+
+    Returns:
+        str: LLM-generated summary
+    """
+    raw_tokens = estimate_tokens(PROMPT_HEADER + "".join(_event_line(ev) for ev in event_buffer))
+    if LLM_MAP_REDUCE_MAX_WINDOWS > 1 and raw_tokens > LLM_TOKEN_BUDGET * LLM_MAP_REDUCE_FACTOR:
+        return _summarize_map_reduce(event_buffer, raw_tokens, deadline)
+
+    # Prepare input text for LLM, bounded by LLM_TOKEN_BUDGET
+    text_input = build_event_digest(event_buffer)
+    prompt_tokens = estimate_tokens(text_input)
+    print(f"[INFO] LLM prompt: ~{prompt_tokens} tokens for {len(event_buffer)} events "
+          f"(raw ~{raw_tokens} tokens, {100 - 100 * prompt_tokens // max(raw_tokens, 1)}% smaller).")
+    return _call_gemini(text_input, deadline)
+
+def generate_summary_with_source(event_buffer):
+    """
+    Summarizes the events with the configured summarizer, never raising.
+
+    Gemini gets LLM_LATENCY_BUDGET seconds; if it fails or runs out of time
+    the local template summary is used instead. The budget is also passed
+    down as the request deadline, so an abandoned call stops there instead
+    of running on through its retries.
+
+    Returns:
+        tuple: (summary_text, source) where source describes the summarizer,
+               e.g. "Gemini (gemini-2.0-flash)" or "Local template (Gemini timed out after 30s)"
+    """
+    with stage("llm_summary", TASK_SECONDS):
+        if SUMMARIZER == "local":
+            with stage("llm_local", TASK_SECONDS):
+                return generate_local_summary(event_buffer), "Local template"
+
+        # A thread per call: a slow call never holds up the next summary.
+        deadline = time.monotonic() + LLM_LATENCY_BUDGET
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(generate_summary_from_events(event_buffer, deadline=deadline))
+            except Exception as e:
+                future.set_exception(e)
+        threading.Thread(target=run, name="llm-summary", daemon=True).start()
+        try:
+            return future.result(timeout=LLM_LATENCY_BUDGET), f"Gemini ({GEMINI_MODEL})"
+        except FutureTimeout:
+            reason = f"Gemini timed out after {LLM_LATENCY_BUDGET:g}s"
+        except Exception as e:
+            reason = "Gemini unavailable"
+            print(f"[WARN] LLM summary failed ({e}), using the local summarizer.")
+        _count("local_fallbacks")
+        with stage("llm_local", TASK_SECONDS):
+            return generate_local_summary(event_buffer), f"Local template ({reason})"
+
 # -------------------- Test Run --------------------
 if __name__ == "__main__":
     dummy_events = [
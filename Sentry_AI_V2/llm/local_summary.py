@@ -0,0 +1,86 @@
+import re
+from collections import Counter
+
+# ===================================================================
+# Local template summarizer
+#
+# Deterministic, dependency-free summary built from the event list
+# itself. Used when Gemini is unavailable, too slow for the latency
+# budget, or when it is selected as the default summarizer.
+# ===================================================================
+
+INCIDENT_GAP_FRAMES = 30     # events closer than this belong to the same incident
+MAX_INCIDENTS = 5
+
+def event_classes(ev):
+    """ Object class names from 'gun (0.91), knife (0.55)'. """
+    text = str(ev.get("yolo_object", ev.get("yolo", "")) or "")
+    return [re.sub(r"\s*\(.*?\)\s*", "", part).strip() for part in text.split(",") if part.strip()]
+
+def find_incidents(event_buffer):
+    """ Groups events into incidents: runs of events separated by < INCIDENT_GAP_FRAMES. """
+    incidents = []
+    for ev in sorted(event_buffer, key=lambda e: e.get("frame", 0)):
+        if incidents and ev.get("frame", 0) - incidents[-1][-1].get("frame", 0) < INCIDENT_GAP_FRAMES:
+            incidents[-1].append(ev)
+        else:
+            incidents.append([ev])
+    return incidents
+
+def _plural(count, word):
+    return f"{count} {word}{'' if count == 1 else 's'}"
+
+def generate_local_summary(event_buffer):
+    """
+    Writes a plain-language summary of the events without any API call.
+
+    The same events always produce the same text.
+
+    Returns:
+        str: the summary
+    """
+    if not event_buffer:
+        return "No significant events were detected during this session."
+
+    severities = Counter(ev["final"] for ev in event_buffer)
+    classes = Counter(cls for ev in event_buffer for cls in event_classes(ev))
+    violent = sum(1 for ev in event_buffer
+                  if str(ev.get("yolo_violence", ev.get("violence", ""))).lower() == "violence")
+    frames = [ev.get("frame", 0) for ev in event_buffer]
+    timestamps = sorted(ev["timestamp"] for ev in event_buffer if ev.get("timestamp"))
+    incidents = find_incidents(event_buffer)
+
+    span = f"frames {min(frames)} to {max(frames)}"
+    if timestamps:
+        span = f"{timestamps[0]} to {timestamps[-1]} ({span})"
+    paragraphs = [
+        f"Mini SentryAI+ recorded {_plural(len(event_buffer), 'significant event')} between {span}, "
+        f"grouped into {_plural(len(incidents), 'distinct incident')}. "
+        f"{_plural(severities.get('danger', 0), 'event')} reached danger level and "
+        f"{severities.get('suspicious', 0)} were rated suspicious."
+    ]
+
+    findings = []
+    if classes:
+        findings.append("Objects detected: " + ", ".join(
+            f"{cls} in {_plural(n, 'frame')}" for cls, n in classes.most_common()) + ".")
+    if violent:
+        findings.append(f"The violence model flagged {_plural(violent, 'frame')}.")
+    if findings:
+        paragraphs.append(" ".join(findings))
+
+    ranked = sorted(incidents, key=lambda inc: (sum(e["final"] == "danger" for e in inc), len(inc)), reverse=True)
+    lines = []
+    for incident in sorted(ranked[:MAX_INCIDENTS], key=lambda inc: inc[0].get("frame", 0)):
+        dangers = sum(e["final"] == "danger" for e in incident)
+        objects = Counter(cls for ev in incident for cls in event_classes(ev))
+        top = ", ".join(cls for cls, _ in objects.most_common(3)) or "no objects"
+        lines.append(f"- Frames {incident[0].get('frame')}-{incident[-1].get('frame')}: "
+                     f"{_plural(len(incident), 'event')} ({dangers} danger), {top}.")
+    paragraphs.append("Most significant incidents:\n" + "\n".join(lines))
+
+    if severities.get("danger"):
+        paragraphs.append("Recommendation: review the danger-level incidents above and the attached screenshots.")
+    else:
+        paragraphs.append("Recommendation: no danger-level activity was found; review suspicious incidents as needed.")
+    return "\n\n".join(paragraphs)
@@ -0,0 +1,97 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+
+# -------------------- Config --------------------
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUMMARY_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(PROJECT_ROOT, "output", "llm_cache.json"))
+SUMMARY_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500"))
+
+def normalize_prompt(text):
+    """ Collapses whitespace and case so cosmetically different prompts share a key. """
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+def cache_key(prompt, model):
+    return hashlib.sha256(f"{model}\n{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+class SummaryCache:
+    """
+    Persistent cache of LLM summaries keyed by (normalized prompt, model).
+
+    Entries live in a single JSON file that is loaded lazily and rewritten
+    atomically on every insert. Entries older than the TTL are ignored and
+    dropped; beyond ``max_entries`` the least recently used ones are evicted.
+    """
+
+    def __init__(self, path=SUMMARY_CACHE_PATH, ttl=SUMMARY_CACHE_TTL_SECONDS, max_entries=SUMMARY_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = None
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        try:
+            with open(self.path, "r") as f:
+                self._entries = json.load(f)
+        except (OSError, json.JSONDecodeError, ValueError):
+            self._entries = {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, prompt, model):
+        """ Cached summary for this prompt/model, or None. """
+        key = cache_key(prompt, model)
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry["created"] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry["used"] = time.time()
+            return entry["summary"]
+
+    def put(self, prompt, model, summary):
+        key = cache_key(prompt, model)
+        now = time.time()
+        with self._lock:
+            self._load()
+            self._entries[key] = {"model": model, "summary": summary, "created": now, "used": now}
+            expired = [k for k, e in self._entries.items() if now - e["created"] > self.ttl]
+            for k in expired:
+                del self._entries[k]
+            if len(self._entries) > self.max_entries:
+                by_use = sorted(self._entries, key=lambda k: self._entries[k].get("used", 0))
+                for k in by_use[:len(self._entries) - self.max_entries]:
+                    del self._entries[k]
+            try:
+                self._save()
+            except OSError as e:
+                print(f"!!! WARNING: Could not persist LLM summary cache: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries or {}),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
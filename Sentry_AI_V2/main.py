@@ -1,34 +1,32 @@
 import os
 import cv2
-import time
 from datetime import datetime
 from input.camera_stream import capture_frames
 from detector.yolo_detector import detect_from_frame
-from detector.violence_detector import run_violence_detection
+from detector.violence_detector import run_violence_detection, top_violence_class
 from detector.severity_selector import select_severity
 from database.event_logger import log_event
-from llm.llm_summary import generate_summary_from_events
+from llm.llm_summary import generate_summary_with_source
 from reports.report_generator import generate_pdf_report
-from alerts.telegram_bot import send_alert, send_pdf_with_summary  # Telegram integration
+from pipeline.encoded_frame import EncodedFrame
+from alerts.telegram_bot import send_alert, send_pdf_with_summary, alert_dispatcher  # Telegram integration
 
 # -------------------- Config --------------------
 VIDEO_SOURCE = r"./tests/demo1.gif"  # or 0 for webcam
 SCREENSHOT_DIR = r"./output/screenshots"
 os.makedirs(SCREENSHOT_DIR, exist_ok=True)
 YOLO_CONF_THRESHOLD = 0.4
-ALERT_COOLDOWN = 15  # seconds between consecutive danger alerts
 
 event_buffer = []  # Collected events for report
-last_alert_time = 0
 last_logged = {"severity": "normal", "yolo": ""}  # Prevent duplicate logs
 
 # -------------------- Main --------------------
 def main():
-    global last_alert_time, last_logged
+    global last_logged
     print("[INFO] Starting Mini SentryAI+...")
 
     frame_id = 0
-    # We no longer need the 'clip' from capture_frames in a YOLO+YOLO setup
+    # Frames are decoded ahead on a background thread while the models run.
     for frame, _ in capture_frames(VIDEO_SOURCE):
         frame_id += 1
 
@@ -38,9 +36,8 @@ def main():
         # -------------------- YOLO Violence Detection --------------------
         # ✅ FIXED: Correctly handle the list of detections returned by the function.
         violence_results = run_violence_detection(frame)
-        # The primary prediction is the first (and often only) item in the list.
-        violence_pred = violence_results[0]['class']
-        violence_conf = violence_results[0]['confidence']
+        # The primary prediction is the most confident item ('non-violence' if there is none).
+        violence_pred, violence_conf = top_violence_class(violence_results)
 
         # -------------------- Severity selection --------------------
         severity = select_severity(yolo_results, violence_pred)
@@ -53,7 +50,8 @@ def main():
             yolo_classes.append(f"{cls} ({conf:.2f})")
 
         # Log every frame to JSON (for history)
-        log_event(frame, yolo_results, f"{violence_pred} ({violence_conf:.2f})", severity)
+        log_event(frame, yolo_results, f"{violence_pred} ({violence_conf:.2f})", severity,
+                  source=f"main:{VIDEO_SOURCE}")
 
         # -------------------- Save annotated screenshot --------------------
         if severity in ["danger", "suspicious"]:
@@ -83,8 +81,10 @@ def main():
                 cv2.putText(annotated_frame, f"Final Severity: {severity}", (35, 50),
                             cv2.FONT_HERSHEY_SIMPLEX, 1.0, severity_color, 2)
 
+                # Encoded once, shared by the screenshot and the alert.
+                encoded_frame = EncodedFrame(annotated_frame)
                 screenshot_path = os.path.join(SCREENSHOT_DIR, f"event_{frame_id}.jpg")
-                cv2.imwrite(screenshot_path, annotated_frame)
+                encoded_frame.save(screenshot_path)
 
                 event_buffer.append({
                     "frame": frame_id,
@@ -96,10 +96,9 @@ def main():
 
                 last_logged = {"severity": severity, "yolo": current_yolo}
 
-                # -------------------- Telegram alert with cooldown --------------------
-                if severity == "danger" and (time.time() - last_alert_time) > ALERT_COOLDOWN:
-                    send_alert(annotated_frame, severity)
-                    last_alert_time = time.time()
+                # -------------------- Telegram alert (bursts are coalesced) --------------------
+                if severity == "danger":
+                    send_alert(encoded_frame, severity, details=f"{current_yolo} & {violence_pred}")
 
         # -------------------- Visualization --------------------
         # Draw object detections
@@ -130,16 +129,20 @@ def main():
             break
 
     cv2.destroyAllWindows()
+    alert_dispatcher.join()  # let queued alerts go out before the process exits
 
     # -------------------- Generate LLM summary --------------------
     if event_buffer:
-        summary_text = generate_summary_from_events(event_buffer)
-        print("[INFO] LLM Summary Generated:")
+        summary_text, summary_source = generate_summary_with_source(event_buffer)
+        print(f"[INFO] Summary Generated by {summary_source}:")
         print(summary_text)
 
         # -------------------- Generate PDF report --------------------
         pdf_path = os.path.join("./output", "MiniSentryAI_Report.pdf")
-        generate_pdf_report(event_buffer, summary_text, pdf_path)
+        try:
+            generate_pdf_report(event_buffer, summary_text, pdf_path, summary_source=summary_source)
+        except Exception:
+            return
         print(f"[INFO] PDF report saved to {pdf_path}")
 
         # -------------------- Send final PDF via Telegram --------------------
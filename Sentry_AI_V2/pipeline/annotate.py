@@ -0,0 +1,26 @@
+import cv2
+
+# -------------------- Annotation Helper Function --------------------
+def draw_annotations(frame, yolo_results, violence_results):
+    """Draws bounding boxes for both object and violence detection."""
+    annotated_frame = frame.copy()
+    for det in yolo_results:
+        try:
+            x1, y1, x2, y2 = map(int, det["bbox"])
+            label = f"Object: {det['class']} ({det.get('confidence', 0.0):.2f})"
+            color = (0, 255, 0)
+            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(annotated_frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        except Exception as e:
+            print(f"Could not draw object annotation: {e}")
+    for det in violence_results:
+        if det.get("class") == "violence":
+            try:
+                x1, y1, x2, y2 = map(int, det["bbox"])
+                label = f"Action: {det['class']} ({det.get('confidence', 0.0):.2f})"
+                color = (0, 0, 255)
+                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
+                cv2.putText(annotated_frame, label, (x1, y2 + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+            except Exception as e:
+                print(f"Could not draw violence annotation: {e}")
+    return annotated_frame
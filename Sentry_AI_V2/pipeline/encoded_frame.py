@@ -0,0 +1,114 @@
+import threading
+
+import cv2
+
+from pipeline.metrics import stage
+
+# ===================================================================
+# Encode-once frames
+#
+# The same annotated frame used to be JPEG-encoded separately for the
+# screenshot, the Telegram alert and - on every poll, even when the
+# frame had not changed - for each MJPEG feed client. An EncodedFrame
+# wraps the image and keeps the bytes of every preset it was encoded
+# with, so each (quality, size) combination is encoded at most once.
+#
+# The image itself can be lazy: given a render function (e.g. drawing
+# the detections onto the raw frame) it is only produced the first time
+# pixels are needed - by the feed, a screenshot or an alert. Frames
+# nobody looks at are never annotated.
+# ===================================================================
+
+# name -> (JPEG quality, max width in px or None to keep the size)
+JPEG_PRESETS = {
+    "full": (95, None),      # screenshots and alerts (cv2.imwrite default quality)
+    "feed": (75, 960),       # live MJPEG preview
+}
+
+_stats_lock = threading.Lock()
+_stats = {"frames": 0, "renders": 0, "encodes": 0, "cache_hits": 0}
+
+class EncodedFrame:
+    """
+    A BGR image plus its cached JPEG encodings, keyed by preset name.
+
+    Pass either the image or a ``render`` function that returns it; the
+    function is called at most once, on first access to ``image``.
+    """
+    __slots__ = ("_image", "_render", "_jpeg", "_lock")
+
+    def __init__(self, image=None, render=None):
+        if image is None and render is None:
+            raise ValueError("EncodedFrame needs an image or a render function")
+        self._image = image
+        self._render = render
+        self._jpeg = {}
+        self._lock = threading.RLock()
+        _count("frames")
+
+    @property
+    def image(self):
+        with self._lock:
+            if self._image is None:
+                with stage("annotate"):
+                    self._image = self._render()
+                self._render = None
+                _count("renders")
+            return self._image
+
+    @property
+    def rendered(self):
+        return self._image is not None
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    def jpeg(self, preset="full"):
+        """ JPEG bytes for the preset, encoded on first use. """
+        with self._lock:
+            data = self._jpeg.get(preset)
+            if data is None:
+                image = self.image
+                with stage("encode"):
+                    data = self._jpeg[preset] = _encode(image, *JPEG_PRESETS[preset])
+                _count("encodes")
+            else:
+                _count("cache_hits")
+            return data
+
+    def save(self, path, preset="full"):
+        """ Writes the preset's JPEG bytes to path. Returns False on failure, like cv2.imwrite. """
+        try:
+            data = self.jpeg(preset)
+            with open(path, "wb") as f:
+                f.write(data)
+            return True
+        except (OSError, ValueError) as e:
+            print(f"⚠️ WARNING: Failed to save frame to {path}: {e}")
+            return False
+
+def as_encoded(frame):
+    """ Wraps a plain image; EncodedFrames are returned unchanged. """
+    return frame if isinstance(frame, EncodedFrame) else EncodedFrame(frame)
+
+def _encode(image, quality, max_width):
+    if max_width and image.shape[1] > max_width:
+        height = round(image.shape[0] * max_width / image.shape[1])
+        image = cv2.resize(image, (max_width, height), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buffer.tobytes()
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+def get_encode_stats():
+    """ Process-wide frame / lazy render counts and JPEG encodes vs. reuses of an already encoded preset. """
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats["encodes"] + stats["cache_hits"]
+    stats["saved_ratio"] = round(stats["cache_hits"] / total, 3) if total else None
+    return stats
@@ -0,0 +1,175 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# ===================================================================
+# Pipeline metrics
+#
+# Small, dependency-free counters, gauges and histograms rendered in
+# the Prometheus text exposition format (served at /api/metrics).
+# Stage timings come from the `stage()` context manager / `timed_iter`
+# wrapper in the frame loops; slower background work (LLM summaries,
+# report builds, alert delivery) goes to a histogram with longer
+# buckets. Queue depths and module counters are read at scrape time
+# through callbacks.
+# ===================================================================
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """
+    Base class. Metrics either record values themselves, or are given a
+    callback that returns the current value (or {label tuple: value}) at
+    scrape time.
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        if self.callback is None:
+            with self._lock:
+                return [(self.name, key, (), value) for key, value in sorted(self._values.items())]
+        try:
+            current = self.callback()
+        except Exception as e:
+            print(f"[WARN] Metric callback for {self.name} failed: {e}")
+            return []
+        if not isinstance(current, dict):
+            current = {(): current}
+        return [(self.name, key if isinstance(key, tuple) else (key,), (), value)
+                for key, value in sorted(current.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, key, extra, value in self._samples():
+            lines.append(f"{name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    """ Monotonically increasing count; the callback form exposes counts kept elsewhere. """
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+class Gauge(_Metric):
+    """ Value that goes up and down: set() it, or give a callback. """
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(_Metric):
+    """ Cumulative-bucket histogram of observed values (seconds, by default). """
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def snapshot(self):
+        """ {label tuple: (sum, count)} - used for per-stage breakdowns. """
+        with self._lock:
+            return {key: (entry[1], entry[2]) for key, entry in self._values.items()}
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    samples.append((f"{self.name}_bucket", key, (("le", _format_value(bound)),), cumulative))
+                samples.append((f"{self.name}_sum", key, (), total))
+                samples.append((f"{self.name}_count", key, (), count))
+        return samples
+
+def render_metrics():
+    """ All registered metrics in Prometheus text format. """
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# -------------------- Pipeline metrics --------------------
+STAGE_SECONDS = Histogram("sentry_stage_seconds", "Time spent per pipeline stage.", ["stage"])
+TASK_SECONDS = Histogram("sentry_task_seconds", "Time spent per background task stage "
+                         "(LLM summary, report build, alert delivery).", ["stage"], buckets=TASK_BUCKETS)
+FRAMES = Counter("sentry_frames_total", "Frames processed.", ["pipeline"])
+EVENTS = Counter("sentry_events_total", "Significant events detected.", ["pipeline", "severity"])
+MODEL_CALLS = Counter("sentry_model_calls_total", "Model inference calls.", ["model"])
+
+@contextmanager
+def stage(name, histogram=STAGE_SECONDS):
+    """ Times the enclosed block into sentry_stage_seconds{stage=name} (or the given histogram). """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, stage=name)
+
+def timed_iter(iterable, name="decode_wait"):
+    """ Yields from iterable, timing each step (e.g. waiting for the next decoded frame) as a stage. """
+    iterator = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=name)
+        yield item
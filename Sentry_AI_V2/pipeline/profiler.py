@@ -0,0 +1,167 @@
+import io
+import os
+import sys
+import math
+import time
+import pstats
+import cProfile
+import threading
+from collections import Counter
+
+from pipeline.metrics import STAGE_SECONDS
+
+# ===================================================================
+# On-demand profiling of a running analysis thread
+#
+# Nothing is installed while no profile is running. A profile request
+# either samples the thread's stack from a helper thread every few
+# milliseconds (mode "sample", output in collapsed-stack format that
+# flamegraph.pl / speedscope read directly), or asks the thread itself
+# to run cProfile for the duration (mode "cprofile"; the loop enables
+# it at its next checkpoint() call, since cProfile only sees the thread
+# that enabled it). Both add a per-stage breakdown from the
+# sentry_stage_seconds histogram over the same window.
+# ===================================================================
+
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+SAMPLE_INTERVAL = 0.005        # seconds between stack samples
+MIN_SAMPLE_INTERVAL = 0.001    # shorter intervals would spin and stall the sampled thread
+CPROFILE_TOP_FUNCTIONS = 40
+
+class ProfilerBusy(RuntimeError):
+    """ Raised when a profile is requested while another one is running. """
+
+_session_lock = threading.Lock()
+_cprofile_request = None
+
+# -------------------- Sampling --------------------
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _collapse(frame, root):
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.append(root)
+    return ";".join(reversed(stack))
+
+def sample_thread(thread, seconds, interval=SAMPLE_INTERVAL):
+    """ Counter of collapsed stacks ("root;caller;callee") seen in thread over seconds. """
+    stacks = Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline and thread.is_alive():
+        frame = sys._current_frames().get(thread.ident)
+        if frame is not None:
+            stacks[_collapse(frame, thread.name)] += 1
+        del frame
+        time.sleep(interval)
+    return stacks
+
+# -------------------- cProfile --------------------
+class _CProfileRequest:
+    """ cProfile run executed by the target thread itself, driven by checkpoint(). """
+
+    def __init__(self, thread_id, seconds):
+        self.thread_id = thread_id
+        self.seconds = seconds
+        self.profile = None
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+    def step(self):
+        if threading.get_ident() != self.thread_id or self.done.is_set():
+            return
+        now = time.perf_counter()
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.started = now
+            self.profile.enable()
+        elif now - self.started >= self.seconds:
+            self.profile.disable()
+            self.finished = now
+            self.done.set()
+
+def checkpoint():
+    """ Called once per frame by the analysis loops; a no-op unless a cProfile run is pending. """
+    request = _cprofile_request
+    if request is not None:
+        request.step()
+
+def _cprofile_thread(thread, seconds):
+    global _cprofile_request
+    request = _cprofile_request = _CProfileRequest(thread.ident, seconds)
+    try:
+        # Frames can be slow; allow a grace period for the loop to reach its checkpoints.
+        finished = request.done.wait(seconds + max(5.0, seconds))
+    finally:
+        _cprofile_request = None
+    if not finished:
+        return {"error": "The thread did not complete the profile (stopped or stalled)."}
+    out = io.StringIO()
+    stats = pstats.Stats(request.profile, stream=out)
+    stats.sort_stats("cumulative").print_stats(CPROFILE_TOP_FUNCTIONS)
+    return {"profiled_seconds": round(request.finished - request.started, 3), "stats": out.getvalue()}
+
+# -------------------- Entry point --------------------
+def _stage_breakdown(before, after, seconds):
+    stages = {}
+    for key, (total, count) in after.items():
+        start_total, start_count = before.get(key, (0.0, 0))
+        if count > start_count:
+            spent = total - start_total
+            stages[key[0]] = {
+                "seconds": round(spent, 4),
+                "calls": count - start_count,
+                "avg_ms": round(spent * 1000 / (count - start_count), 3),
+                "share": round(spent / seconds, 3) if seconds else None,
+            }
+    return dict(sorted(stages.items(), key=lambda item: item[1]["seconds"], reverse=True))
+
+def profile_thread(thread, seconds=10, mode="sample", interval=SAMPLE_INTERVAL):
+    """
+    Profiles a running thread for `seconds` (blocks meanwhile).
+
+    Args:
+        mode: "sample" (stack sampling, collapsed-stack output) or
+              "cprofile" (deterministic; the thread must call checkpoint())
+
+    Returns:
+        dict: mode, seconds, stages (time per pipeline stage; process-wide,
+              so a concurrent upload is included) and either
+              samples + collapsed or profiled_seconds + stats
+
+    Raises:
+        ProfilerBusy: if another profile is running
+        ValueError: on an unknown mode, or a duration or interval that is not
+                    a positive number (intervals below MIN_SAMPLE_INTERVAL are raised to it)
+    """
+    if mode not in ("sample", "cprofile"):
+        raise ValueError(f"Unknown profile mode: {mode}")
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise ValueError("seconds must be a positive number")
+    if not math.isfinite(interval) or interval <= 0:
+        raise ValueError("interval_ms must be a positive number")
+    seconds = min(seconds, PROFILE_MAX_SECONDS)
+    interval = max(interval, MIN_SAMPLE_INTERVAL)
+    if not _session_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running.")
+    try:
+        before = STAGE_SECONDS.snapshot()
+        started = time.perf_counter()
+        if mode == "sample":
+            stacks = sample_thread(thread, seconds, interval)
+            result = {
+                "samples": sum(stacks.values()),
+                "collapsed": "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()),
+            }
+        else:
+            result = _cprofile_thread(thread, seconds)
+        elapsed = time.perf_counter() - started
+        result.update(mode=mode, seconds=round(elapsed, 3),
+                      stages=_stage_breakdown(before, STAGE_SECONDS.snapshot(), elapsed))
+        return result
+    finally:
+        _session_lock.release()
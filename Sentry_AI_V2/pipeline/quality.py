@@ -0,0 +1,133 @@
+import os
+import time
+import threading
+from collections import namedtuple
+
+from pipeline.metrics import Counter, Gauge
+
+# ===================================================================
+# Adaptive quality for the live loops
+#
+# On CPU-only hosts a busy scene makes inference slower than the camera
+# and the loop falls behind. AdaptiveQuality measures how long each
+# analysed frame takes against the time budget it has (stride frames at
+# the target FPS) and steps through QUALITY_LEVELS: smaller inference
+# size, then analysing only every Nth frame, then skipping the violence
+# model. It steps back up once there is headroom again. Changes are
+# rate limited and logged, and the current level is exported as metrics.
+# ===================================================================
+
+ADAPTIVE_QUALITY = os.getenv("ADAPTIVE_QUALITY", "1") != "0"
+TARGET_FPS = float(os.getenv("TARGET_FPS", "10"))
+MAX_FRAME_LATENCY = float(os.getenv("MAX_FRAME_LATENCY", "0.5"))   # seconds per analysed frame
+QUALITY_WINDOW = 15           # analysed frames per decision
+QUALITY_COOLDOWN = 3.0        # seconds between adjustments
+DEGRADE_LOAD = 1.0            # slower than the budget -> lower quality
+RECOVER_LOAD = 0.6            # well inside the budget -> try the next better level
+
+# imgsz None keeps the model's own input size.
+QualityLevel = namedtuple("QualityLevel", ["imgsz", "stride", "violence"])
+QUALITY_LEVELS = [
+    QualityLevel(None, 1, True),
+    QualityLevel(480, 1, True),
+    QualityLevel(480, 2, True),
+    QualityLevel(416, 2, False),
+    QualityLevel(320, 3, False),
+]
+
+QUALITY_LEVEL = Gauge("sentry_quality_level", "Live quality level (0 = full quality).")
+QUALITY_IMGSZ = Gauge("sentry_quality_imgsz", "Inference image size of the live loop (0 = model default).")
+QUALITY_STRIDE = Gauge("sentry_quality_stride", "Analyse every Nth camera frame.")
+QUALITY_VIOLENCE = Gauge("sentry_quality_violence_enabled", "1 while the violence model runs in the live loop.")
+QUALITY_LOAD = Gauge("sentry_quality_load", "Analysis time / time budget over the last window.")
+QUALITY_ADJUSTMENTS = Counter("sentry_quality_adjustments_total", "Live quality changes.", ["direction"])
+
+class AdaptiveQuality:
+    """
+    Chooses the live loop's QualityLevel from the measured per-frame analysis time.
+
+    Usage per camera frame:
+        settings = quality.settings
+        if not quality.should_analyse(frame_index): continue
+        ... analyse with settings.imgsz / settings.violence ...
+        quality.observe(seconds_spent)
+    """
+
+    def __init__(self, target_fps=TARGET_FPS, max_latency=MAX_FRAME_LATENCY, levels=QUALITY_LEVELS,
+                 window=QUALITY_WINDOW, cooldown=QUALITY_COOLDOWN, enabled=ADAPTIVE_QUALITY):
+        self.target_fps = target_fps
+        self.max_latency = max_latency
+        self.levels = levels
+        self.window = window
+        self.cooldown = cooldown
+        self.enabled = enabled
+        self.level = 0
+        self.load = 0.0
+        self.history = []             # (time, from, to, load) of every adjustment
+        self._samples = []
+        self._last_change = 0.0
+        self._lock = threading.Lock()
+        self._export()
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def should_analyse(self, frame_index):
+        return frame_index % self.settings.stride == 0
+
+    def observe(self, seconds):
+        """ Records the analysis time of one frame; may change the level. """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._samples.append(seconds)
+            if len(self._samples) < self.window:
+                return
+            samples, self._samples = self._samples, []
+            average = sum(samples) / len(samples)
+            # Time available per analysed frame: `stride` camera frames at the target rate.
+            budget = min(self.settings.stride / self.target_fps, self.max_latency)
+            self.load = average / budget
+            now = time.monotonic()
+            if now - self._last_change < self.cooldown:
+                self._export()
+                return
+            if self.load > DEGRADE_LOAD and self.level < len(self.levels) - 1:
+                self._change(self.level + 1, now, "down")
+            elif self.load < RECOVER_LOAD and self.level > 0:
+                self._change(self.level - 1, now, "up")
+            self._export()
+
+    def _change(self, level, now, direction):
+        previous, self.level = self.level, level
+        self._last_change = now
+        self.history.append((time.time(), previous, level, round(self.load, 3)))
+        del self.history[:-50]
+        QUALITY_ADJUSTMENTS.inc(direction=direction)
+        s = self.settings
+        print(f"[INFO] Live quality {direction}: level {previous} -> {level} "
+              f"(imgsz {s.imgsz or 'default'}, every {s.stride} frame(s), "
+              f"violence {'on' if s.violence else 'off'}); load {self.load:.2f} at {self.target_fps:g} fps target")
+
+    def _export(self):
+        s = self.settings
+        QUALITY_LEVEL.set(self.level)
+        QUALITY_IMGSZ.set(s.imgsz or 0)
+        QUALITY_STRIDE.set(s.stride)
+        QUALITY_VIOLENCE.set(int(s.violence))
+        QUALITY_LOAD.set(round(self.load, 3))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "target_fps": self.target_fps,
+                "max_latency": self.max_latency,
+                "level": self.level,
+                "settings": self.settings._asdict(),
+                "load": round(self.load, 3),
+                "adjustments": [
+                    {"time": t, "from": a, "to": b, "load": load} for t, a, b, load in self.history
+                ],
+            }
@@ -0,0 +1,106 @@
+import os
+
+import cv2
+
+from input.camera_stream import capture_frames
+
+# ===================================================================
+# Temporal triage for long uploads
+#
+# Most of a long recording is quiet, and running both detectors on
+# every frame is what makes uploads slow. Triage runs them on a sparse
+# sample first (TRIAGE_SPARSE_FPS), then scans densely only in windows
+# around the samples that came out suspicious or danger. Frames outside
+# the windows are grabbed, never decoded or analysed. Events shorter
+# than the sampling gap that no sample lands on can be missed; the
+# full scan remains the default.
+# ===================================================================
+
+TRIAGE_SPARSE_FPS = float(os.getenv("TRIAGE_SPARSE_FPS", "1"))
+TRIAGE_WINDOW_SECONDS = float(os.getenv("TRIAGE_WINDOW_SECONDS", "2"))
+DEFAULT_FPS = 25.0
+
+def video_info(path, default_fps=DEFAULT_FPS):
+    """ (fps, frame count) from the container; the count is 0 when unknown. """
+    cap = cv2.VideoCapture(path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    finally:
+        cap.release()
+    fps = fps if fps and fps == fps and fps < 1000 else default_fps
+    return fps, int(count) if count and count > 0 else 0
+
+def merge_windows(indices, radius):
+    """ Sorted, merged inclusive (start, end) ranges of +-radius frames around each index. """
+    windows = []
+    for index in sorted(indices):
+        start, end = max(0, index - radius), index + radius
+        if windows and start <= windows[-1][1] + 1:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+        else:
+            windows.append((start, end))
+    return windows
+
+class TemporalTriage:
+    """
+    Sparse-then-dense scan of a video file.
+
+        scan = TemporalTriage(path, analyse, is_event)
+        for frame, index, analysis in scan:   # frames inside the dense windows, in order
+            ...
+        scan.stats                             # frames analysed vs. a full scan
+
+    analyse(frame) returns any per-frame result; is_event(result) says
+    whether a sparse sample opens a dense window. Sparse results are
+    reused in the dense pass, so no frame is analysed twice.
+    """
+
+    def __init__(self, path, analyse, is_event, sparse_fps=TRIAGE_SPARSE_FPS,
+                 window_seconds=TRIAGE_WINDOW_SECONDS):
+        self.path = path
+        self.analyse = analyse
+        self.is_event = is_event
+        self.fps, self.frame_count = video_info(path)
+        self.stride = max(1, round(self.fps / sparse_fps))
+        # A window reaches at least to the neighbouring samples, so the gap is scanned on both sides.
+        self.radius = max(self.stride, round(window_seconds * self.fps))
+        self.windows = []
+        self.stats = {}
+
+    def __iter__(self):
+        sparse = {}
+        flagged = []
+        last_index = -1
+        for frame, index in capture_frames(self.path, stride=self.stride):
+            result = sparse[index] = self.analyse(frame)
+            if self.is_event(result):
+                flagged.append(index)
+            last_index = index
+        self.windows = merge_windows(flagged, self.radius)
+
+        dense = 0
+        window_frames = 0
+        for frame, index in capture_frames(self.path, ranges=self.windows):
+            if index in sparse:
+                result = sparse[index]
+            else:
+                result = self.analyse(frame)
+                dense += 1
+            window_frames += 1
+            last_index = max(last_index, index)
+            yield frame, index, result
+
+        total = max(self.frame_count, last_index + 1, 1)
+        analysed = len(sparse) + dense
+        self.stats = {
+            "mode": "triage",
+            "fps": round(self.fps, 2),
+            "frames": total,
+            "sparse_frames": len(sparse),
+            "flagged_samples": len(flagged),
+            "windows": len(self.windows),
+            "window_frames": window_frames,
+            "analysed_frames": analysed,
+            "saved_ratio": round(1 - analysed / total, 3),
+        }
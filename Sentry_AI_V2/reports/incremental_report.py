@@ -0,0 +1,161 @@
+import os
+import queue
+import bisect
+import threading
+import time
+
+from reports.report_generator import (
+    PDFReport, get_cover_image, choose_layout, incident_rank,
+    CONTACT_SHEET_COLS, CONTACT_SHEET_ROWS, INDEX_ROW_H, TOP_INCIDENTS
+)
+
+# ===================================================================
+# Incremental report assembly
+#
+# While a session runs, each significant event is laid out as its own
+# report page (screenshot downscaled, details table drawn) on a
+# background thread. Generating the report then only lays out the
+# summary pages, moves them in after the cover and writes the file, so
+# its cost no longer grows with the session length.
+#
+# Once a session grows past the compact-layout threshold, the compact
+# sections are built the same way: each event adds its contact-sheet
+# thumbnail and its event index row, and gets a full page only while it
+# ranks among the top incidents. Finalizing just puts the pages in
+# order and leaves out the full pages of events that dropped out of
+# the top.
+# ===================================================================
+
+_STOP = object()
+EVENTS_ALIAS = "{events}"    # total event count, known only when the report is finalized
+
+class IncrementalReport:
+    """ A PDF report that is built page by page as events arrive. """
+
+    def __init__(self):
+        self._pdf = PDFReport()
+        self._pdf.set_auto_page_break(auto=True, margin=15)
+        self._pdf.add_cover_page(get_cover_image(self._pdf.w))
+        self._events = []
+        self._detail_pages = {}   # event position -> (page number, embedded image or None)
+        self._top = []            # rank keys of the current top incidents, ascending
+        self._sheet_pages = []    # (page number, y below the title), one per CONTACT_SHEET_COLS x ROWS events
+        self._index_pages = []
+        self._index_y = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def add_event(self, event):
+        """ Queues an event page for background layout. Never blocks the caller. """
+        with self._lock:
+            if self._closed:
+                return
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="report-pages", daemon=True)
+                self._thread.start()
+        self._queue.put(event)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            if event is _STOP:
+                return
+            try:
+                self._add(event)
+            except Exception as e:
+                print(f"!!! ERROR: Could not lay out report page for frame {event.get('frame')}: {e}")
+
+    def _add(self, event):
+        position = len(self._events)
+        self._events.append(event)
+        in_top = self._track_rank(position)
+        if choose_layout(len(self._events)) == "full":
+            self._add_detail_page(position)
+            return
+        if not self._sheet_pages:
+            # Just crossed the threshold: catch up on the events before this one.
+            for earlier in range(position):
+                self._add_compact_entry(earlier)
+        self._add_compact_entry(position)
+        if in_top and position not in self._detail_pages:
+            self._add_detail_page(position)
+
+    def _track_rank(self, position):
+        """ Adds the event to the running top incidents; True if it is among them. """
+        key = incident_rank(self._events[position], position)
+        bisect.insort(self._top, key)
+        if len(self._top) > TOP_INCIDENTS:
+            self._top.pop(0)
+        return key >= self._top[0]
+
+    def _add_detail_page(self, position):
+        image = self._pdf.add_event_details(self._events[position])
+        self._detail_pages[position] = (self._pdf.page, image)
+
+    def _add_compact_entry(self, position):
+        """ The event's contact-sheet thumbnail and event index row. """
+        pdf = self._pdf
+        event = self._events[position]
+        per_page = CONTACT_SHEET_COLS * CONTACT_SHEET_ROWS
+        slot = position % per_page
+        if slot == 0:
+            pdf.add_page()
+            pdf.section_title(f"Event Overview ({position + 1}-{{sheet_end_{len(self._sheet_pages)}}} of {EVENTS_ALIAS})")
+            self._sheet_pages.append((pdf.page, pdf.get_y()))
+        page, top = self._sheet_pages[-1]
+        pdf.draw_on_page(page, top, lambda: pdf.draw_thumbnail(event, slot, top))
+
+        if not self._index_pages or self._index_y + INDEX_ROW_H > pdf.h - pdf.b_margin:
+            pdf.add_page()
+            if not self._index_pages:
+                pdf.section_title(f"Event Index ({EVENTS_ALIAS} events)")
+            pdf.draw_index_header()
+            self._index_pages.append(pdf.page)
+            self._index_y = pdf.get_y()
+        self._index_y = pdf.draw_on_page(self._index_pages[-1], self._index_y, lambda: pdf.draw_index_row(event))
+
+    def _stop(self):
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def finalize(self, summary_text, output_path, summary_source=None):
+        """ Waits for queued pages, adds the summary pages after the cover and writes the PDF. """
+        started = time.perf_counter()
+        self._stop()
+        pdf = self._pdf
+        render_summary = lambda: pdf.render_summary(summary_text, self._events, summary_source=summary_source)
+        if choose_layout(len(self._events)) == "compact":
+            summary_pages = pdf.add_pages(render_summary)
+            top = sorted(-key[2] for key in self._top if -key[2] in self._detail_pages)
+            dropped = [image for position, (_, image) in self._detail_pages.items()
+                       if position not in set(top) and image]
+            per_page = CONTACT_SHEET_COLS * CONTACT_SHEET_ROWS
+            pdf.text_aliases[EVENTS_ALIAS] = len(self._events)
+            for k in range(len(self._sheet_pages)):
+                pdf.text_aliases[f"{{sheet_end_{k}}}"] = min((k + 1) * per_page, len(self._events))
+            pdf.arrange_pages(
+                [1] + summary_pages + [self._detail_pages[position][0] for position in top]
+                + [page for page, _ in self._sheet_pages] + self._index_pages,
+                dropped_images=dropped
+            )
+        else:
+            # The summary goes right after the cover, on as many pages as it takes.
+            pdf.insert_pages(1, render_summary)
+        pdf.output(output_path)
+        elapsed = time.perf_counter() - started
+        size_kb = os.path.getsize(output_path) / 1024
+        print(f"PDF Report generated successfully at {output_path} "
+              f"({pdf.pages_count} pages, {size_kb:.0f} KB, {elapsed:.2f}s to finalize)")
+
+    def discard(self):
+        """ Stops the background layout without writing anything. """
+        self._stop()
@@ -1,4 +1,10 @@
 import os
+import re
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
 from fpdf import FPDF, XPos, YPos
 from datetime import datetime
 from PIL import Image
@@ -11,6 +17,206 @@ from PIL import Image
 # cover image, requiring NO changes to app.py.
 # ===================================================================
 
+# -------------------- Image Preparation --------------------
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COVER_IMAGE_PATH = os.path.join(PROJECT_ROOT, "cover.png")
+IMAGE_CACHE_DIR = os.path.join(PROJECT_ROOT, "output", "report_cache")
+IMAGE_CACHE_MAX_FILES = 2000
+
+REPORT_IMAGE_DPI = 120       # ~900 px across a full-width A4 screenshot
+REPORT_JPEG_QUALITY = 80
+RESAMPLE_SLACK = 1.25        # images up to 25% wider than the target are embedded as decoded
+REPORT_IMAGE_WORKERS = 4     # PIL releases the GIL while decoding / resizing
+MM_PER_INCH = 25.4
+PAGE_WIDTH_MM = 190          # A4 width minus the default 10 mm margins
+WARM_MAX_PENDING = 32        # screenshots waiting for prepare-on-save before new ones are skipped
+
+# -------------------- Layout Selection --------------------
+# Above this many events the report switches to the compact layout:
+# full pages for the top incidents only, then a thumbnail contact sheet
+# and a tabular index of every event.
+COMPACT_LAYOUT_THRESHOLD = int(os.getenv("REPORT_COMPACT_THRESHOLD", "50"))
+TOP_INCIDENTS = int(os.getenv("REPORT_TOP_INCIDENTS", "10"))
+CONTACT_SHEET_COLS = 3
+CONTACT_SHEET_ROWS = 4
+INDEX_ROW_H = 6              # mm per event index row
+SEVERITY_RANK = {"danger": 2, "suspicious": 1}
+
+_cache_lock = threading.Lock()
+_cover_image = None          # (path, width_px, height_px), prepared once per process
+
+def _target_pixels(width_mm, dpi=REPORT_IMAGE_DPI):
+    return max(1, int(round(width_mm / MM_PER_INCH * dpi)))
+
+def _cache_path(image_path, target_w, quality):
+    stat = os.stat(image_path)
+    key = hashlib.sha1(
+        f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{target_w}|{quality}".encode("utf-8")
+    ).hexdigest()
+    return os.path.join(IMAGE_CACHE_DIR, f"{key}.jpg")
+
+def prepare_image(image_path, width_mm, dpi=REPORT_IMAGE_DPI, quality=REPORT_JPEG_QUALITY):
+    """
+    Downscales and re-encodes an image for embedding at ``width_mm`` on the page.
+
+    Results are cached on disk, keyed by source path, mtime and target size, so a
+    screenshot is only decoded and resized once no matter how many reports use it.
+
+    Returns:
+        tuple: (path_to_embed, width_px, height_px)
+    """
+    target_w = _target_pixels(width_mm, dpi)
+    cached_path = _cache_path(image_path, target_w, quality)
+    if os.path.exists(cached_path):
+        with Image.open(cached_path) as img:
+            return cached_path, img.width, img.height
+
+    with Image.open(image_path) as img:
+        if img.width > target_w:
+            target_h = max(1, round(img.height * target_w / img.width))
+            img.draft("RGB", (target_w, target_h))  # JPEG: decode directly at 1/2, 1/4 or 1/8 scale
+            img = img.convert("RGB")
+            # The decoder's scale is usually close enough; only resample when it is well above the target.
+            if img.width > target_w * RESAMPLE_SLACK:
+                img = img.resize((target_w, target_h), Image.BILINEAR, reducing_gap=2.0)
+        else:
+            img = img.convert("RGB")
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cached_path}.{threading.get_ident()}.tmp"
+        img.save(tmp_path, "JPEG", quality=quality)
+        os.replace(tmp_path, cached_path)
+        size = img.size
+    _prune_image_cache()
+    return cached_path, size[0], size[1]
+
+def _prune_image_cache():
+    """Keeps the on-disk image cache bounded by dropping the oldest entries."""
+    with _cache_lock:
+        entries = [e for e in os.scandir(IMAGE_CACHE_DIR) if e.name.endswith(".jpg")]
+        if len(entries) <= IMAGE_CACHE_MAX_FILES:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - IMAGE_CACHE_MAX_FILES]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+def prepare_event_images(event_buffer, width_mm):
+    """Warms the image cache for all event screenshots in parallel."""
+    # Screenshots still queued for prepare-on-save are cheaper to wait for than to prepare again.
+    _warm_pool.submit(lambda: None).result()
+    paths = {e.get("screenshot") for e in event_buffer}
+    paths = [p for p in paths if p and os.path.exists(p)]
+    if len(paths) < 2:
+        return
+
+    def _prepare(path):
+        try:
+            prepare_image(path, width_mm)
+        except Exception as e:
+            print(f"!!! ERROR: Could not prepare screenshot {path}: {e}")
+
+    with ThreadPoolExecutor(max_workers=REPORT_IMAGE_WORKERS) as pool:
+        list(pool.map(_prepare, paths))
+
+def contact_sheet_thumb_width(page_width=PAGE_WIDTH_MM, gap=4):
+    return (page_width - gap * (CONTACT_SHEET_COLS - 1)) / CONTACT_SHEET_COLS
+
+# -------------------- Prepare on Save --------------------
+# A screenshot's pixels are still in memory right after it is saved, so its
+# report images (full page width and contact-sheet thumbnail) are produced
+# from them there, on a background thread: no JPEG decode, and the report
+# later finds them in the cache instead of preparing them on its own path.
+_warm_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report-images")
+_warm_lock = threading.Lock()
+_warm_pending = 0
+
+def warm_report_images(image_path, image):
+    """
+    Queues the report images of a just-saved screenshot for background preparation.
+
+    Args:
+        image: the BGR array (or EncodedFrame) that was written to image_path
+
+    Returns:
+        bool: False if too many are already waiting (the report then prepares it itself)
+    """
+    global _warm_pending
+    with _warm_lock:
+        if _warm_pending >= WARM_MAX_PENDING:
+            return False
+        _warm_pending += 1
+    _warm_pool.submit(_warm, image_path, image)
+    return True
+
+def _shrink(pixels, target_w):
+    """ Like the JPEG draft in prepare_image: power-of-two area reduction, then resampling only if still well above target_w. """
+    height, width = pixels.shape[:2]
+    factor = 1
+    while width // (factor * 2) >= target_w:
+        factor *= 2
+    if factor > 1:
+        # Integer factors take OpenCV's fast INTER_AREA path.
+        pixels = cv2.resize(pixels, (width // factor, height // factor), interpolation=cv2.INTER_AREA)
+    if pixels.shape[1] > target_w * RESAMPLE_SLACK:
+        target_h = max(1, round(pixels.shape[0] * target_w / pixels.shape[1]))
+        pixels = cv2.resize(pixels, (target_w, target_h), interpolation=cv2.INTER_LINEAR)
+    return pixels
+
+def _warm(image_path, image):
+    global _warm_pending
+    try:
+        pixels = getattr(image, "image", image)
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        # Widest first: each size is shrunk from the previous one.
+        for width_mm in (PAGE_WIDTH_MM, contact_sheet_thumb_width()):
+            target_w = _target_pixels(width_mm)
+            pixels = _shrink(pixels, target_w)
+            cached_path = _cache_path(image_path, target_w, REPORT_JPEG_QUALITY)
+            if os.path.exists(cached_path):
+                continue
+            ok, buffer = cv2.imencode(".jpg", pixels, [cv2.IMWRITE_JPEG_QUALITY, REPORT_JPEG_QUALITY])
+            if not ok:
+                raise ValueError("JPEG encoding failed")
+            tmp_path = f"{cached_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(buffer.tobytes())
+            os.replace(tmp_path, cached_path)
+        _prune_image_cache()
+    except Exception as e:
+        print(f"!!! ERROR: Could not prepare report images for {image_path}: {e}")
+    finally:
+        with _warm_lock:
+            _warm_pending -= 1
+
+def choose_layout(event_count):
+    """ 'compact' for large sessions, 'full' (one page per event) otherwise. """
+    return "compact" if event_count > COMPACT_LAYOUT_THRESHOLD else "full"
+
+def _max_confidence(event):
+    scores = re.findall(r"\((\d+(?:\.\d+)?)\)", str(event.get("yolo", "")))
+    return max((float(s) for s in scores), default=0.0)
+
+def incident_rank(event, position):
+    """ Sort key of an event at position in the buffer: severity, then detection confidence, earlier first. """
+    return (SEVERITY_RANK.get(event.get("final"), 0), _max_confidence(event), -position)
+
+def top_incidents(event_buffer, count=TOP_INCIDENTS):
+    """ The most severe events (severity, then detection confidence), in frame order. """
+    ranked = sorted(enumerate(event_buffer), key=lambda item: incident_rank(item[1], item[0]), reverse=True)
+    return [event for _, event in sorted(ranked[:count], key=lambda item: item[0])]
+
+def get_cover_image(page_w=210):
+    """Returns the prepared cover image, preparing it on first use only."""
+    global _cover_image
+    if _cover_image is None and os.path.exists(COVER_IMAGE_PATH):
+        try:
+            _cover_image = prepare_image(COVER_IMAGE_PATH, page_w)
+        except Exception as e:
+            print(f"!!! ERROR: Could not prepare cover image: {e}")
+    return _cover_image
+
 class PDFReport(FPDF):
     """ A class to create a final, polished, and branded PDF report. """
 
@@ -22,12 +228,20 @@ class PDFReport(FPDF):
     COLOR_LIGHT_GREY_TEXT = (200, 200, 200)
     COLOR_GREY_BORDER = (80, 80, 80)
 
+    # Written in the header and replaced by the final page number on output,
+    # so pages moved later (see arrange_pages) keep the numbering right.
+    PAGE_NUMBER_ALIAS = "{page}"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.text_aliases = {}   # alias -> text, replaced on every page on output
+
     def header(self):
         if self.page_no() == 1: return # No header on the cover page
         self.set_font("Helvetica", "", 9)
         self.set_text_color(150)
         self.cell(0, 10, "Sentry AI Surveillance Report", 0, 0, "L")
-        self.cell(0, 10, f"Page {self.page_no()}", 0, 0, "R")
+        self.cell(0, 10, f"Page {self.PAGE_NUMBER_ALIAS}", 0, 0, "R")
         self.ln(15)
 
     def footer(self):
@@ -43,16 +257,75 @@ class PDFReport(FPDF):
             self.set_fill_color(*self.COLOR_CHARCOAL)
             self.rect(0, 0, self.w, self.h, 'F')
 
-    def add_cover_page(self, cover_image_path):
-        """ Creates a cover page that preserves the image's aspect ratio on a dark background. """
+    def add_pages(self, render_function):
+        """ Runs render_function on new pages at the end, as many as it fills; returns their numbers. """
+        first_new = self.page + 1
+        self.add_page()
+        render_function()
+        return list(range(first_new, self.page + 1))
+
+    def arrange_pages(self, order, dropped_images=()):
+        """ Puts the pages in the given order of current page numbers.
+
+        Pages left out are dropped; dropped_images lists the images drawn on
+        them, so those are not embedded unless still used on a kept page.
+        """
+        open_page = self.pages[self.page]
+        self.pages = {number: self.pages[old] for number, old in enumerate(order, 1)}
+        for number, page in self.pages.items():
+            page._index = number
+        # The open page (its footer is drawn on output) must be kept.
+        self.page = next(number for number, page in self.pages.items() if page is open_page)
+        for name in dropped_images:
+            if name in self.images:
+                self.images[name]["usages"] -= 1
+
+    def insert_pages(self, after_page, render_function):
+        """ Runs render_function on new pages - as many as it fills - placed right after after_page. """
+        new_pages = self.add_pages(render_function)
+        rest = [number for number in self.pages if number not in new_pages]
+        self.arrange_pages(rest[:after_page] + new_pages + rest[after_page:])
+
+    def draw_on_page(self, page_no, y, render_function):
+        """ Draws on an earlier page from height y without disturbing the current position; returns the y reached. """
+        prev_page, prev_x, prev_y = self.page, self.x, self.y
+        prev_auto_break, prev_margin = self.auto_page_break, self.b_margin
+        self.page = page_no
+        self.font_family = ""   # the selected font is tracked per document, not per page: select it again
+        self.set_xy(self.l_margin, y)
+        self.set_auto_page_break(False, margin=prev_margin)
+        try:
+            render_function()
+            return self.get_y()
+        finally:
+            self.set_auto_page_break(prev_auto_break, margin=prev_margin)
+            self.page = prev_page
+            self.font_family = ""
+            self.set_xy(prev_x, prev_y)
+
+    def output(self, *args, **kwargs):
+        page_alias = self.PAGE_NUMBER_ALIAS.encode("latin-1")
+        aliases = [(alias.encode("latin-1"), str(text).encode("latin-1")) for alias, text in self.text_aliases.items()]
+        for number, page in self.pages.items():
+            contents = page.contents.replace(page_alias, str(number).encode("latin-1"))
+            for alias, text in aliases:
+                contents = contents.replace(alias, text)
+            page.contents = contents
+        return super().output(*args, **kwargs)
+
+    def add_cover_page(self, cover_image):
+        """ Creates a cover page that preserves the image's aspect ratio on a dark background.
+
+        Args:
+            cover_image: (path, width_px, height_px) as returned by get_cover_image()
+        """
         super().add_page()
         self.set_fill_color(*self.COLOR_COVER_BG)
         self.rect(0, 0, self.w, self.h, 'F')
         
-        if cover_image_path and os.path.exists(cover_image_path):
+        if cover_image:
             try:
-                img = Image.open(cover_image_path)
-                img_w, img_h = img.size
+                cover_image_path, img_w, img_h = cover_image
                 page_w, page_h = self.w, self.h
                 scale = min(page_w / img_w, page_h / img_h)
                 new_w, new_h = img_w * scale, img_h * scale
@@ -70,15 +343,27 @@ class PDFReport(FPDF):
             self.cell(0, 10, "(Cover image not found)", 0, 1, "C")
 
 
-    def add_summary_page(self, summary_text, event_buffer):
+    def add_summary_page(self, summary_text, event_buffer, summary_source=None):
         self.add_page()
+        self.render_summary(summary_text, event_buffer, summary_source=summary_source)
+
+    def render_summary(self, summary_text, event_buffer, summary_source=None):
+        """ Draws the executive summary from the current page on, breaking onto new pages as needed.
+
+        summary_source, if given, is printed under the heading to show which
+        summarizer wrote the text.
+        """
         self.set_font("Helvetica", "B", 24)
         self.set_text_color(*self.COLOR_WHITE)
         self.cell(0, 15, "Executive Summary", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         self.set_draw_color(*self.COLOR_GOLD)
         self.set_line_width(0.8)
         self.line(self.get_x(), self.get_y(), self.w - self.r_margin, self.get_y())
-        self.ln(10)
+        self.ln(3 if summary_source else 10)
+        if summary_source:
+            self.set_font("Helvetica", "I", 9)
+            self.set_text_color(*self.COLOR_LIGHT_GREY_TEXT)
+            self.cell(0, 7, f"Summary generated by: {summary_source}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         
         self.set_font("Helvetica", "", 12)
         self.set_text_color(*self.COLOR_LIGHT_GREY_TEXT)
@@ -98,6 +383,7 @@ class PDFReport(FPDF):
         self.cell(0, 8, f"- Suspicious-Level Observations: {suspicious_events}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
 
     def add_event_details(self, event):
+        """ One page per event; returns the image embedded for its screenshot, or None. """
         self.add_page()
         self.set_font("Helvetica", "B", 16)
         self.set_text_color(*self.COLOR_WHITE)
@@ -128,9 +414,7 @@ class PDFReport(FPDF):
         self.cell(col1_width, 8, "Final Severity:", border=1)
         
         severity = event.get('final', 'normal')
-        if severity == 'danger': self.set_text_color(220, 50, 50)
-        elif severity == 'suspicious': self.set_text_color(*self.COLOR_GOLD)
-        else: self.set_text_color(150, 255, 150) # Light Green
+        self._set_severity_color(severity)
         
         self.set_font("Helvetica", "B", 11)
         self.multi_cell(col2_width, 8, severity.capitalize(), border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
@@ -142,38 +426,162 @@ class PDFReport(FPDF):
         screenshot_path = event.get("screenshot")
         if screenshot_path and os.path.exists(screenshot_path):
             try:
-                self.image(screenshot_path, x=self.get_x(), y=self.get_y(), w=self.w - self.l_margin - self.r_margin)
+                width_mm = self.w - self.l_margin - self.r_margin
+                image_path, _, _ = prepare_image(screenshot_path, width_mm)
+                self.image(image_path, x=self.get_x(), y=self.get_y(), w=width_mm)
+                return image_path
             except Exception as e:
                 self.set_font("Helvetica", "I", 10)
                 self.cell(0, 8, f"Could not load screenshot: {e}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         else:
             self.set_font("Helvetica", "I", 10)
             self.cell(0, 8, "Screenshot not found or path is invalid.", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        return None
+
+    def _set_severity_color(self, severity):
+        if severity == 'danger': self.set_text_color(220, 50, 50)
+        elif severity == 'suspicious': self.set_text_color(*self.COLOR_GOLD)
+        else: self.set_text_color(150, 255, 150) # Light Green
+
+    def section_title(self, title):
+        self.set_font("Helvetica", "B", 16)
+        self.set_text_color(*self.COLOR_WHITE)
+        self.cell(0, 10, title, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        self.ln(3)
+
+    def _fit_text(self, text, width):
+        """ Truncates text with '...' so it fits in a cell of the given width. """
+        text = str(text)
+        if self.get_string_width(text) <= width - 2:
+            return text
+        while text and self.get_string_width(text + "...") > width - 2:
+            text = text[:-1]
+        return text + "..."
+
+    def _thumb_geometry(self):
+        """ (gap, thumbnail width, thumbnail height, caption height) of a contact-sheet cell. """
+        gap = 4
+        thumb_w = contact_sheet_thumb_width(self.w - self.l_margin - self.r_margin, gap)
+        return gap, thumb_w, thumb_w * 9 / 16, 6
+
+    def draw_thumbnail(self, event, slot, top):
+        """ Draws one contact-sheet cell; slot is its position on the page, top the y below the title. """
+        gap, thumb_w, thumb_h, caption_h = self._thumb_geometry()
+        row, col = divmod(slot, CONTACT_SHEET_COLS)
+        x = self.l_margin + col * (thumb_w + gap)
+        y = top + row * (thumb_h + caption_h + gap)
+        self.set_draw_color(*self.COLOR_GREY_BORDER)
+        self.rect(x, y, thumb_w, thumb_h)
+        screenshot_path = event.get("screenshot")
+        if screenshot_path and os.path.exists(screenshot_path):
+            try:
+                image_path, img_w, img_h = prepare_image(screenshot_path, thumb_w)
+                scale = min(thumb_w / img_w, thumb_h / img_h)
+                w, h = img_w * scale, img_h * scale
+                self.image(image_path, x=x + (thumb_w - w) / 2, y=y + (thumb_h - h) / 2, w=w, h=h)
+            except Exception as e:
+                print(f"!!! ERROR: Could not add thumbnail for frame {event.get('frame')}: {e}")
+        severity = event.get("final", "normal")
+        self.set_xy(x, y + thumb_h)
+        self.set_font("Helvetica", "B", 8)
+        self._set_severity_color(severity)
+        self.cell(thumb_w, caption_h,
+                  self._fit_text(f"Frame {event.get('frame', 'N/A')} | {severity.capitalize()} | {event.get('yolo') or '-'}", thumb_w))
+        self.set_text_color(*self.COLOR_LIGHT_GREY_TEXT)
+
+    def add_contact_sheet(self, event_buffer):
+        """ Thumbnail grid of all events, CONTACT_SHEET_COLS x CONTACT_SHEET_ROWS per page. """
+        per_page = CONTACT_SHEET_COLS * CONTACT_SHEET_ROWS
+        prepare_event_images(event_buffer, self._thumb_geometry()[1])
+        for start in range(0, len(event_buffer), per_page):
+            self.add_page()
+            self.section_title(f"Event Overview ({start + 1}-{min(start + per_page, len(event_buffer))} of {len(event_buffer)})")
+            top = self.get_y()
+            for i, event in enumerate(event_buffer[start:start + per_page]):
+                self.draw_thumbnail(event, i, top)
+
+    def _index_columns(self):
+        page_width = self.w - self.l_margin - self.r_margin
+        columns = [("Frame", 20), ("Time", 38), ("Severity", 24), ("Violence", 30)]
+        columns.append(("Objects", page_width - sum(w for _, w in columns)))
+        return columns
+
+    def draw_index_header(self):
+        self.set_font("Helvetica", "B", 9)
+        self.set_text_color(*self.COLOR_WHITE)
+        self.set_draw_color(*self.COLOR_GREY_BORDER)
+        for title, width in self._index_columns():
+            self.cell(width, INDEX_ROW_H + 1, title, border=1)
+        self.ln(INDEX_ROW_H + 1)
+
+    def draw_index_row(self, event):
+        severity = event.get("final", "normal")
+        values = [event.get("frame", "N/A"), event.get("timestamp", "-"), severity.capitalize(),
+                  event.get("violence") or "-", event.get("yolo") or "-"]
+        self.set_font("Helvetica", "", 8)
+        self.set_draw_color(*self.COLOR_GREY_BORDER)
+        for (title, width), value in zip(self._index_columns(), values):
+            if title == "Severity":
+                self._set_severity_color(severity)
+            else:
+                self.set_text_color(*self.COLOR_LIGHT_GREY_TEXT)
+            self.cell(width, INDEX_ROW_H, self._fit_text(value, width), border=1)
+        self.ln(INDEX_ROW_H)
+        self.set_text_color(*self.COLOR_LIGHT_GREY_TEXT)
+
+    def add_event_index(self, event_buffer):
+        """ One table row per event, header repeated on every page. """
+        self.add_page()
+        self.section_title(f"Event Index ({len(event_buffer)} events)")
+        self.draw_index_header()
+        for event in event_buffer:
+            if self.get_y() + INDEX_ROW_H > self.h - self.b_margin:
+                self.add_page()
+                self.draw_index_header()
+            self.draw_index_row(event)
+
+    def add_compact_events(self, event_buffer, top_count=TOP_INCIDENTS):
+        """ Compact layout: top incidents in full, then contact sheet and event index. """
+        for event in top_incidents(event_buffer, top_count):
+            self.add_event_details(event)
+        self.add_contact_sheet(event_buffer)
+        self.add_event_index(event_buffer)
 
 # -------------------- Main PDF Generation Function --------------------
-def generate_pdf_report(event_buffer, summary_text, output_path):
-    """ Generates a professional PDF report for Sentry AI events. """
+def generate_pdf_report(event_buffer, summary_text, output_path, layout=None, summary_source=None):
+    """ Generates a professional PDF report for Sentry AI events.
+
+    Raises whatever writing the file raised, so callers never report or send a missing PDF.
+
+    Args:
+        layout: 'full' (one page per event), 'compact' or None to pick
+                automatically from the event count (see COMPACT_LAYOUT_THRESHOLD).
+        summary_source: which summarizer produced summary_text (shown on the summary page).
+    """
+    started = time.perf_counter()
     pdf = PDFReport()
     pdf.set_auto_page_break(auto=True, margin=15)
     
-    # ✅ FIXED: Use a robust method to find the cover image.
-    # Always resolve relative to app.py (the entry point in project root)
-    # Always resolve relative to the project root (where app.py lives)
-    # Force project root to where app.py is
-    project_root = os.path.dirname(os.path.abspath(os.path.join(__file__, "..")))  
-    cover_image_path = os.path.join(project_root, "cover.png")
-    print("Looking for cover image at:", cover_image_path)
-    
-    pdf.add_cover_page(cover_image_path)
-    pdf.add_summary_page(summary_text, event_buffer)
+    # Cover is resolved relative to the project root (where app.py lives)
+    # and downscaled once per process, not on every report.
+    pdf.add_cover_page(get_cover_image(pdf.w))
+    pdf.add_summary_page(summary_text, event_buffer, summary_source=summary_source)
     
-    if event_buffer:
+    layout = layout or choose_layout(len(event_buffer))
+    if event_buffer and layout == "compact":
+        pdf.add_compact_events(event_buffer)
+    elif event_buffer:
+        prepare_event_images(event_buffer, pdf.w - pdf.l_margin - pdf.r_margin)
         for event in event_buffer:
             pdf.add_event_details(event)
     
     try:
         pdf.output(output_path)
-        print(f"PDF Report generated successfully at {output_path}")
+        elapsed = time.perf_counter() - started
+        size_kb = os.path.getsize(output_path) / 1024
+        print(f"PDF Report generated successfully at {output_path} "
+              f"({pdf.page_no()} pages, {size_kb:.0f} KB, {elapsed:.2f}s)")
     except Exception as e:
         print(f"!!! ERROR: Failed to generate PDF report: {e}")
+        raise
 
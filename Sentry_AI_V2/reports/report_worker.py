@@ -0,0 +1,161 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from llm.llm_summary import generate_summary_with_source
+from reports.report_generator import PAGE_WIDTH_MM, generate_pdf_report, prepare_event_images
+from alerts.telegram_bot import send_pdf_with_summary
+from database.event_logger import log_report
+from pipeline.metrics import TASK_SECONDS, stage
+
+# ===================================================================
+# Background report building
+#
+# Report jobs (LLM summary -> PDF -> Telegram -> report log) run on a
+# dedicated worker thread with its own queue, so HTTP handlers and the
+# camera threads only enqueue work and return immediately.
+# ===================================================================
+
+REPORT_QUEUE_SIZE = 16
+MAX_TRACKED_JOBS = 100
+
+_jobs = OrderedDict()        # job_id -> status dict, oldest first
+_jobs_lock = threading.Lock()
+_queue = queue.Queue(maxsize=REPORT_QUEUE_SIZE)
+_worker = None
+_worker_lock = threading.Lock()
+# Summary and screenshot preparation run side by side for each job.
+_stage_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="report-stage")
+
+def _update(job_id, **fields):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            job.update(fields)
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="report-worker", daemon=True)
+            _worker.start()
+
+def submit_report(events, report_type, pdf_path, incremental=None):
+    """
+    Queues a report for the given events and returns its job id immediately.
+
+    Args:
+        incremental: optional IncrementalReport whose event pages were already
+                     laid out while the events came in; only the summary is
+                     added to it.
+
+    Raises:
+        queue.Full: if too many reports are already waiting
+    """
+    job_id = uuid.uuid4().hex[:12]
+    job = {
+        "id": job_id,
+        "report_type": report_type,
+        "state": "queued",
+        "events": len(events),
+        "pdf_filename": None,
+        "summary": None,
+        "summary_source": None,
+        "error": None,
+        "submitted": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "timings": {},
+    }
+    with _jobs_lock:
+        _jobs[job_id] = job
+        while len(_jobs) > MAX_TRACKED_JOBS:
+            oldest_id, oldest = next(iter(_jobs.items()))
+            if oldest["state"] not in ("done", "failed"):
+                break
+            _jobs.pop(oldest_id)
+    try:
+        _queue.put_nowait((job_id, list(events), report_type, pdf_path, incremental))
+    except queue.Full:
+        with _jobs_lock:
+            _jobs.pop(job_id, None)
+        raise
+    _ensure_worker()
+    return job_id
+
+def get_job(job_id):
+    """ Returns a copy of a job's status, or None if unknown. """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job, timings=dict(job["timings"])) if job else None
+
+def list_jobs():
+    """ All tracked jobs, newest first. """
+    with _jobs_lock:
+        return [dict(job, timings=dict(job["timings"])) for job in reversed(_jobs.values())]
+
+def queue_depth():
+    return _queue.qsize()
+
+def _timed(name, fn, *args):
+    """ Runs fn(*args) as the report stage `name` (sentry_task_seconds{stage="report_<name>"}). """
+    with stage(f"report_{name}", TASK_SECONDS):
+        return fn(*args)
+
+def _build(job_id, events, report_type, pdf_path, incremental):
+    timings = {}
+    started = time.perf_counter()
+    _update(job_id, state="summarizing")
+
+    # LLM summary and screenshot downscaling do not depend on each other.
+    summary_future = _stage_pool.submit(_timed, "summary", generate_summary_with_source, events)
+    images_future = None
+    if incremental is None:
+        images_future = _stage_pool.submit(_timed, "prepare", prepare_event_images, events, PAGE_WIDTH_MM)
+    try:
+        summary_text, summary_source = summary_future.result()
+    except Exception:
+        if incremental is not None:
+            incremental.discard()
+        raise
+    timings["summary"] = round(time.perf_counter() - started, 3)
+    if images_future is not None:
+        images_future.result()
+        timings["prepare"] = round(time.perf_counter() - started, 3)
+
+    _update(job_id, state="rendering", summary=summary_text, summary_source=summary_source)
+    t = time.perf_counter()
+    with stage("report_render", TASK_SECONDS):
+        if incremental is not None:
+            incremental.finalize(summary_text, pdf_path, summary_source=summary_source)
+        else:
+            generate_pdf_report(events, summary_text, pdf_path, summary_source=summary_source)
+    if not os.path.exists(pdf_path):
+        raise IOError(f"PDF report was not written: {pdf_path}")
+    timings["render"] = round(time.perf_counter() - t, 3)
+
+    _update(job_id, state="sending")
+    t = time.perf_counter()
+    _timed("send", send_pdf_with_summary, pdf_path, summary_text)
+    timings["send"] = round(time.perf_counter() - t, 3)
+
+    _timed("log", log_report, report_type, summary_text, pdf_path)
+    timings["total"] = round(time.perf_counter() - started, 3)
+    return timings
+
+def _run():
+    while True:
+        job_id, events, report_type, pdf_path, incremental = _queue.get()
+        try:
+            timings = _build(job_id, events, report_type, pdf_path, incremental)
+            _update(job_id, state="done", timings=timings,
+                    pdf_filename=os.path.basename(pdf_path))
+            print(f"[INFO] Report job {job_id} done in {timings['total']}s.")
+        except Exception as e:
+            print(f"!!! [Report Worker] Job {job_id} failed: {e} !!!")
+            _update(job_id, state="failed", error=str(e))
+        finally:
+            _queue.task_done()
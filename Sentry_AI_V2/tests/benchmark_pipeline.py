@@ -0,0 +1,278 @@
+# benchmark_pipeline.py
+# Stage-level benchmark of the per-frame pipeline over the bundled test videos:
+#   decode -> object detect -> violence detect -> severity -> annotate -> encode -> log
+#
+#   python tests/benchmark_pipeline.py                    # real YOLO models
+#   python tests/benchmark_pipeline.py --stub             # stub models (no weights needed)
+#   python tests/benchmark_pipeline.py --stub --save out.json --compare baseline.json
+#
+# Reports FPS and p50/p95/p99 per stage plus the peak RSS sampled during
+# each video (Linux) and the process-wide high-water mark, and can save
+# the result as JSON and compare it against a previous run.
+import os
+import sys
+import json
+import glob
+import time
+import random
+import argparse
+import platform
+import resource
+import tempfile
+from datetime import datetime
+from functools import partial
+
+import cv2
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+# -------------------- Config --------------------
+TEST_FOLDER = os.path.join(PROJECT_ROOT, "tests")
+VIDEO_PATTERNS = ["*.mp4", "*.avi", "*.mov", "*.mkv", "*.gif"]
+STAGES = ["decode", "object_detect", "violence_detect", "severity", "annotate", "encode", "log"]
+YOLO_CONF_THRESHOLD = 0.4
+DEFAULT_TOLERANCE = 0.20  # allowed slowdown per stage p50 / p95 before --compare fails
+
+# -------------------- Stub models --------------------
+STUB_OBJECT_NAMES = {0: "person", 1: "gun", 2: "knife", 3: "mask"}
+STUB_VIOLENCE_NAMES = {0: "non-violence", 1: "violence"}
+
+def make_stub_models(latency_ms, seed=0):
+    """ Deterministic stand-ins for the two YOLO models, with optional simulated inference time. """
+    from detector.detections import DETECTION_DTYPE, Detections, SEVERITY_CODES
+
+    rng = random.Random(seed)
+    severity_table = np.array([SEVERITY_CODES[s] for s in ("normal", "danger", "suspicious", "suspicious")], np.int8)
+
+    def boxes(frame, names, count):
+        h, w = frame.shape[:2]
+        array = np.zeros(count, dtype=DETECTION_DTYPE)
+        for i in range(count):
+            x, y = rng.uniform(0, w * 0.7), rng.uniform(0, h * 0.7)
+            array[i] = ((x, y, x + w * 0.2, y + h * 0.3), rng.uniform(0.4, 0.95), rng.randrange(len(names)), 0)
+        return array
+
+    def detect_from_frame(frame, threshold=YOLO_CONF_THRESHOLD):
+        time.sleep(latency_ms / 1000)
+        array = boxes(frame, STUB_OBJECT_NAMES, rng.choice([0, 0, 1, 2, 3]))
+        array["severity"] = severity_table[array["class_id"]]
+        return Detections(array, STUB_OBJECT_NAMES)
+
+    def run_violence_detection(frame, threshold=0.5):
+        time.sleep(latency_ms / 1000)
+        array = boxes(frame, STUB_VIOLENCE_NAMES, rng.choice([0, 0, 0, 1]))
+        return Detections(array, STUB_VIOLENCE_NAMES, extra={"type": "violence"}, with_severity=False)
+
+    return detect_from_frame, run_violence_detection
+
+# -------------------- Measurement --------------------
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+def summarize(samples):
+    """ Per-stage latency summary in milliseconds. """
+    out = {}
+    for stage in STAGES:
+        values = samples.get(stage, [])
+        out[stage] = {
+            "count": len(values),
+            "mean_ms": round(float(np.mean(values)) if values else 0.0, 3),
+            "p50_ms": round(percentile(values, 50), 3),
+            "p95_ms": round(percentile(values, 95), 3),
+            "p99_ms": round(percentile(values, 99), 3),
+        }
+    return out
+
+def cumulative_peak_rss_mb():
+    """ Process-wide RSS high-water mark since start-up (covers every video run so far). """
+    # ru_maxrss is in KiB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if platform.system() == "Darwin" else 1024), 1)
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def current_rss_bytes():
+    """ Resident set size right now, from /proc/self/statm; None where /proc is missing. """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+def benchmark_video(path, detect, detect_violence, args):
+    from detector.severity_selector import select_severity
+    from detector.detections import top_violence_class
+    from pipeline.annotate import draw_annotations
+    from pipeline.encoded_frame import EncodedFrame
+    from database.event_logger import log_event
+
+    samples = {stage: [] for stage in STAGES}
+    cap = cv2.VideoCapture(path)
+    frames = significant = 0
+    rss_peak = current_rss_bytes()
+    started = time.perf_counter()
+    while args.max_frames is None or frames < args.max_frames:
+        t = time.perf_counter()
+        ok, frame = cap.read()
+        if not ok:
+            break
+        samples["decode"].append((time.perf_counter() - t) * 1000)
+        frames += 1
+
+        t = time.perf_counter()
+        yolo_results = detect(frame, threshold=YOLO_CONF_THRESHOLD)
+        samples["object_detect"].append((time.perf_counter() - t) * 1000)
+
+        t = time.perf_counter()
+        violence_results = detect_violence(frame)
+        samples["violence_detect"].append((time.perf_counter() - t) * 1000)
+
+        t = time.perf_counter()
+        violence_prediction, _ = top_violence_class(violence_results)
+        severity = select_severity(yolo_results, violence_prediction)
+        samples["severity"].append((time.perf_counter() - t) * 1000)
+
+        is_event = severity in ("danger", "suspicious")
+        significant += is_event
+        encoded = EncodedFrame(render=partial(draw_annotations, frame, yolo_results, violence_results))
+        if is_event or args.feed:
+            t = time.perf_counter()
+            encoded.image
+            samples["annotate"].append((time.perf_counter() - t) * 1000)
+
+            t = time.perf_counter()
+            if args.feed:
+                encoded.jpeg("feed")
+            if is_event:
+                encoded.jpeg("full")
+            samples["encode"].append((time.perf_counter() - t) * 1000)
+
+        if is_event or args.log_all:
+            t = time.perf_counter()
+            log_event(None, yolo_results, violence_prediction, severity,
+                      source=f"benchmark:{os.path.basename(path)}")
+            samples["log"].append((time.perf_counter() - t) * 1000)
+        if rss_peak is not None:
+            rss_peak = max(rss_peak, current_rss_bytes() or 0)
+    cap.release()
+    elapsed = time.perf_counter() - started
+    return {
+        "frames": frames,
+        "significant_frames": significant,
+        "seconds": round(elapsed, 3),
+        "fps": round(frames / elapsed, 2) if elapsed else 0.0,
+        "stages": summarize(samples),
+        "peak_rss_mb": round(rss_peak / (1024 * 1024), 1) if rss_peak is not None else None,
+        "cumulative_peak_rss_mb": cumulative_peak_rss_mb(),
+    }, samples
+
+# -------------------- Comparison --------------------
+def compare(result, baseline, tolerance):
+    """ Prints per-stage changes against a baseline run; returns the list of regressions. """
+    regressions = []
+    print(f"\n[COMPARE] against {baseline['meta'].get('date')} ({baseline['meta'].get('mode')} mode)")
+    old_fps, new_fps = baseline["overall"]["fps"], result["overall"]["fps"]
+    print(f"    fps: {old_fps} -> {new_fps}")
+    if old_fps and new_fps < old_fps * (1 - tolerance):
+        regressions.append(f"fps {old_fps} -> {new_fps}")
+    for stage in STAGES:
+        old, new = baseline["overall"]["stages"].get(stage), result["overall"]["stages"][stage]
+        if not old:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            before, after = old[key], new[key]
+            change = (after - before) / before if before else 0.0
+            flag = ""
+            # Sub-0.05 ms stages are too noisy to judge.
+            if before >= 0.05 and change > tolerance:
+                flag = "  <-- regression"
+                regressions.append(f"{stage} {key} {before} -> {after}")
+            print(f"    {stage:<16} {key}: {before:8.3f} -> {after:8.3f} ms ({change:+.0%}){flag}")
+    return regressions
+
+def print_table(name, stats):
+    print(f"\n[RESULT] {name}: {stats['frames']} frames, {stats['fps']} fps, "
+          f"{stats.get('significant_frames', 0)} significant, peak RSS {stats['peak_rss_mb']} MB "
+          f"(process high-water mark {stats['cumulative_peak_rss_mb']} MB)")
+    print(f"    {'stage':<16}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, s in stats["stages"].items():
+        print(f"    {stage:<16}{s['count']:>7}{s['p50_ms']:>10.3f}{s['p95_ms']:>10.3f}{s['p99_ms']:>10.3f}")
+
+# -------------------- Main --------------------
+def main():
+    parser = argparse.ArgumentParser(description="Stage-level pipeline benchmark")
+    parser.add_argument("videos", nargs="*", help="video files (default: every video in tests/)")
+    parser.add_argument("--stub", action="store_true", help="use stub models instead of the YOLO weights")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="simulated inference time per stub model call")
+    parser.add_argument("--max-frames", type=int, default=None, help="frames per video")
+    parser.add_argument("--feed", action="store_true", help="also annotate + encode every frame for the live feed")
+    parser.add_argument("--log-all", action="store_true", help="log every frame (main.py behaviour), not only events")
+    parser.add_argument("--save", help="write the result JSON here")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    # Events go to a throwaway log directory, never to database/logs.
+    os.environ["SENTRY_LOG_DIR"] = tempfile.mkdtemp(prefix="sentry_bench_logs_")
+
+    if args.stub:
+        detect, detect_violence = make_stub_models(args.stub_latency_ms)
+    else:
+        from detector.yolo_detector import detect_from_frame as detect
+        from detector.violence_detector import run_violence_detection as detect_violence
+
+    videos = args.videos or sorted(p for pattern in VIDEO_PATTERNS for p in glob.glob(os.path.join(TEST_FOLDER, pattern)))
+    results, all_samples = {}, {stage: [] for stage in STAGES}
+    total_frames, total_significant, total_seconds = 0, 0, 0.0
+    for path in videos:
+        stats, samples = benchmark_video(path, detect, detect_violence, args)
+        results[os.path.basename(path)] = stats
+        print_table(os.path.basename(path), stats)
+        for stage in STAGES:
+            all_samples[stage].extend(samples[stage])
+        total_frames += stats["frames"]
+        total_significant += stats["significant_frames"]
+        total_seconds += stats["seconds"]
+
+    result = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "mode": "stub" if args.stub else "real",
+            "stub_latency_ms": args.stub_latency_ms if args.stub else None,
+            "max_frames": args.max_frames,
+            "feed": args.feed,
+            "log_all": args.log_all,
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+        },
+        "videos": results,
+        "overall": {
+            "frames": total_frames,
+            "significant_frames": total_significant,
+            "fps": round(total_frames / total_seconds, 2) if total_seconds else 0.0,
+            "stages": summarize(all_samples),
+            "peak_rss_mb": max((v["peak_rss_mb"] for v in results.values() if v["peak_rss_mb"] is not None),
+                               default=None),
+            "cumulative_peak_rss_mb": cumulative_peak_rss_mb(),
+        },
+    }
+    print_table("ALL VIDEOS", result["overall"])
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n[INFO] Saved benchmark result to {args.save}")
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print(f"\n[FAIL] {len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\n[OK] No regressions.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# benchmark_triage.py
+# Temporal triage (sparse pass + dense windows) against a full scan of every frame,
+# on the bundled test videos:
+#
+#   python tests/benchmark_triage.py                 # real YOLO models
+#   python tests/benchmark_triage.py --stub          # content-based stub detector (no weights needed)
+#   python tests/benchmark_triage.py --sparse-fps 2 --window 1.5
+#
+# Reports, per video and overall: event frames found by each scan, frame and
+# incident recall of triage w.r.t. the full scan, frames analysed and the speedup.
+import os
+import sys
+import glob
+import time
+import argparse
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from input.camera_stream import capture_frames
+from pipeline.triage import TemporalTriage, TRIAGE_SPARSE_FPS, TRIAGE_WINDOW_SECONDS
+
+# -------------------- Config --------------------
+TEST_FOLDER = os.path.join(PROJECT_ROOT, "tests")
+VIDEO_PATTERNS = ["*.mp4", "*.avi", "*.mov", "*.mkv", "*.gif"]
+EVENT_SEVERITIES = ("danger", "suspicious")
+YOLO_CONF_THRESHOLD = 0.4
+INCIDENT_GAP_SECONDS = 1.0    # event frames further apart than this are separate incidents
+
+# -------------------- Analysers --------------------
+def make_real_analyser():
+    from detector.yolo_detector import detect_from_frame
+    from detector.violence_detector import run_violence_detection, top_violence_class
+    from detector.severity_selector import select_severity
+
+    def analyse(frame):
+        yolo_results = detect_from_frame(frame, threshold=YOLO_CONF_THRESHOLD)
+        violence_prediction, _ = top_violence_class(run_violence_detection(frame))
+        return select_severity(yolo_results, violence_prediction)
+    return analyse
+
+def make_stub_analyser(latency_ms):
+    """
+    Deterministic per-frame stand-in: the severity depends only on the frame's
+    content (coarse brightness), so it is temporally coherent like real
+    detections and both scans see the same result for the same frame.
+    """
+    def analyse(frame):
+        time.sleep(latency_ms / 1000)
+        level = int(frame[::8, ::8].mean()) // 3
+        return "danger" if level % 7 == 0 else "suspicious" if level % 7 == 1 else "normal"
+    return analyse
+
+# -------------------- Scans --------------------
+def full_scan(path, analyse):
+    events, frames = [], 0
+    for frame, index in capture_frames(path):
+        frames += 1
+        if analyse(frame) in EVENT_SEVERITIES:
+            events.append(index)
+    return events, frames
+
+def triage_scan(path, analyse, sparse_fps, window_seconds):
+    scan = TemporalTriage(path, analyse, lambda severity: severity in EVENT_SEVERITIES,
+                          sparse_fps=sparse_fps, window_seconds=window_seconds)
+    events = [index for _, index, severity in scan if severity in EVENT_SEVERITIES]
+    return events, scan
+
+def incidents(indices, gap):
+    groups = []
+    for index in sorted(indices):
+        if groups and index - groups[-1][-1] <= gap:
+            groups[-1].append(index)
+        else:
+            groups.append([index])
+    return groups
+
+def compare(full_events, triage_events, gap):
+    found = set(triage_events)
+    full_incidents = incidents(full_events, gap)
+    hit = sum(any(i in found for i in group) for group in full_incidents)
+    return {
+        "event_frames_full": len(full_events),
+        "event_frames_triage": len(triage_events),
+        "frame_recall": round(len(found & set(full_events)) / len(full_events), 3) if full_events else None,
+        "incidents_full": len(full_incidents),
+        "incident_recall": round(hit / len(full_incidents), 3) if full_incidents else None,
+        # Triage only analyses frames the full scan analyses too, so it cannot add events.
+        "extra_events": len(found - set(full_events)),
+    }
+
+# -------------------- Main --------------------
+def main():
+    parser = argparse.ArgumentParser(description="Temporal triage vs. full scan")
+    parser.add_argument("videos", nargs="*", help="video files (default: every video in tests/)")
+    parser.add_argument("--stub", action="store_true", help="use the content-based stub detector")
+    parser.add_argument("--stub-latency-ms", type=float, default=20.0, help="simulated inference time per stub frame")
+    parser.add_argument("--sparse-fps", type=float, default=TRIAGE_SPARSE_FPS)
+    parser.add_argument("--window", type=float, default=TRIAGE_WINDOW_SECONDS, help="dense window radius (seconds)")
+    args = parser.parse_args()
+
+    analyse = make_stub_analyser(args.stub_latency_ms) if args.stub else make_real_analyser()
+    videos = args.videos or sorted(p for pattern in VIDEO_PATTERNS for p in glob.glob(os.path.join(TEST_FOLDER, pattern)))
+
+    totals = {"full_s": 0.0, "triage_s": 0.0, "frames": 0, "analysed": 0, "events": 0, "found": 0,
+              "incidents": 0, "incidents_found": 0}
+    print(f"{'video':<22}{'frames':>7}{'analysed':>10}{'events':>8}{'found':>7}{'frame rec':>10}"
+          f"{'inc rec':>9}{'full s':>8}{'triage s':>10}{'speedup':>9}")
+    for path in videos:
+        t = time.perf_counter()
+        full_events, frames = full_scan(path, analyse)
+        full_s = time.perf_counter() - t
+        t = time.perf_counter()
+        triage_events, scan = triage_scan(path, analyse, args.sparse_fps, args.window)
+        triage_s = time.perf_counter() - t
+
+        result = compare(full_events, triage_events, round(INCIDENT_GAP_SECONDS * scan.fps))
+        found_incidents = round((result["incident_recall"] or 0) * result["incidents_full"])
+        print(f"{os.path.basename(path):<22}{frames:>7}{scan.stats['analysed_frames']:>10}"
+              f"{result['event_frames_full']:>8}{result['event_frames_triage']:>7}"
+              f"{str(result['frame_recall']):>10}{str(result['incident_recall']):>9}"
+              f"{full_s:>8.2f}{triage_s:>10.2f}{full_s / triage_s if triage_s else 0:>8.1f}x")
+        totals["full_s"] += full_s
+        totals["triage_s"] += triage_s
+        totals["frames"] += frames
+        totals["analysed"] += scan.stats["analysed_frames"]
+        totals["events"] += result["event_frames_full"]
+        totals["found"] += result["event_frames_triage"]
+        totals["incidents"] += result["incidents_full"]
+        totals["incidents_found"] += found_incidents
+
+    print(f"\n[RESULT] {'stub' if args.stub else 'real'} models, {args.sparse_fps:g} fps sparse pass, "
+          f"+-{args.window:g}s windows")
+    print(f"    frames analysed: {totals['analysed']} / {totals['frames']} "
+          f"({1 - totals['analysed'] / max(totals['frames'], 1):.0%} fewer)")
+    print(f"    event frame recall: {totals['found']} / {totals['events']} "
+          f"({totals['found'] / max(totals['events'], 1):.1%})")
+    print(f"    incident recall: {totals['incidents_found']} / {totals['incidents']} "
+          f"({totals['incidents_found'] / max(totals['incidents'], 1):.1%})")
+    print(f"    time: {totals['full_s']:.2f}s full -> {totals['triage_s']:.2f}s triage "
+          f"({totals['full_s'] / max(totals['triage_s'], 1e-9):.1f}x)")
+
+if __name__ == "__main__":
+    main()
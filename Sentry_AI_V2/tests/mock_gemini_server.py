@@ -0,0 +1,100 @@
+# mock_gemini_server.py
+# Local stand-in for the Gemini generateContent endpoint, used to check and
+# time llm/llm_summary.py without an API key or network access.
+#
+#   python tests/mock_gemini_server.py          -> runs the latency comparison
+#   python tests/mock_gemini_server.py --serve  -> only serves on MOCK_PORT
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# -------------------- Config --------------------
+MOCK_PORT = int(os.getenv("MOCK_GEMINI_PORT", "8765"))
+BASE_LATENCY = 0.8           # seconds per call (queueing + generating the answer)
+PREFILL_PER_TOKEN = 0.00005  # seconds per prompt token
+NUM_EVENTS = 5000
+
+class MockGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        prompt = body["contents"][0]["parts"][0]["text"]
+        time.sleep(BASE_LATENCY + PREFILL_PER_TOKEN * len(prompt) / 4)
+        text = f"Mock summary of a {len(prompt)}-character prompt: {prompt.splitlines()[0][:120]}"
+        data = json.dumps({"candidates": [{"content": {"parts": [{"text": text}]}}]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def start_server(port=MOCK_PORT):
+    """ Serves on a daemon thread (server.thread) and returns the server. """
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockGeminiHandler)
+    server.thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server.thread.start()
+    return server
+
+def synthetic_events(count, seed=0):
+    rng = random.Random(seed)
+    events, frame = [], 0
+    for _ in range(count):
+        frame += rng.choice([1, 1, 2, 3, 60])
+        events.append({
+            "frame": frame,
+            "yolo_object": rng.choice(["gun (0.91)", "knife (0.66)", "mask (0.52)", "fire (0.71)", ""]),
+            "yolo_violence": rng.choice(["violence", "non-violence"]),
+            "final": rng.choice(["danger", "suspicious"]),
+        })
+    return events
+
+def timed(label, fn):
+    started = time.perf_counter()
+    text = fn()
+    elapsed = time.perf_counter() - started
+    print(f"    {label:<28} {elapsed:6.2f}s  ({len(text)} chars)")
+    return elapsed
+
+if __name__ == "__main__":
+    if "--serve" in sys.argv:
+        server = start_server()
+        print(f"[INFO] Mock Gemini listening on http://127.0.0.1:{MOCK_PORT}/")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            server.shutdown()
+        sys.exit(0)
+
+    server = start_server()
+    os.environ.setdefault("GEMINI_API_KEY", "mock")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "llm_cache.json")
+    import llm.llm_summary as llm_summary
+    llm_summary.GEMINI_URL = f"http://127.0.0.1:{MOCK_PORT}/v1beta/models/mock:generateContent"
+
+    events = synthetic_events(NUM_EVENTS)
+    raw = llm_summary.PROMPT_HEADER + "".join(llm_summary._event_line(ev) for ev in events)
+    print(f"[INFO] {NUM_EVENTS} events, raw prompt ~{llm_summary.estimate_tokens(raw)} tokens")
+
+    results = {
+        "single raw prompt": timed("single raw prompt", lambda: llm_summary._call_gemini(raw)),
+        "single digest": timed("single digest", lambda: llm_summary._call_gemini(llm_summary.build_event_digest(events))),
+        "map-reduce": timed("map-reduce", lambda: llm_summary._summarize_map_reduce(
+            events, llm_summary.estimate_tokens(raw))),
+    }
+    llm_summary.summary_cache = llm_summary.SummaryCache(path=os.environ["LLM_CACHE_PATH"] + ".2")
+    llm_summary.LLM_MAX_CONCURRENCY = 1
+    results["map-reduce (sequential)"] = timed("map-reduce (sequential)", lambda: llm_summary._summarize_map_reduce(
+        events, llm_summary.estimate_tokens(raw)))
+    print(json.dumps(llm_summary.get_llm_stats(), indent=2))
+    server.shutdown()
@@ -4,6 +4,7 @@ import cv2
 import glob
 import torch
 import numpy as np
+import sys
 import threading
 from transformers import VideoMAEForVideoClassification
 
@@ -14,6 +15,11 @@ FRAME_SIZE = (224, 224)   # must match VideoMAE input size
 CLIP_LEN = 16             # number of frames per clip
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detector.preprocess import InputSpec, FramePreprocessor, ClipBuffer
+
+INPUT_SPEC = InputSpec(size=FRAME_SIZE, color="rgb", dtype="float32", scale=1 / 255.0)
+
 # -------------------- Label Mappings --------------------
 CLASS_LABELS = {
     0: "Abuse", 1: "Arrest", 2: "Arson", 3: "Assault", 4: "Burglary",
@@ -45,20 +51,13 @@ VIDEO_PATHS.sort()
 print("[INFO] Files to test:", VIDEO_PATHS)
 
 # -------------------- Preprocess --------------------
-def preprocess_frame(frame):
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    frame_resized = cv2.resize(frame_rgb, FRAME_SIZE).astype("float32") / 255.0
-    return frame_resized
+# Frames are written straight into a reused clip array (see detector/preprocess.py).
+preprocessor = FramePreprocessor()
 
 # -------------------- Prediction helper --------------------
-def run_prediction(frame_buffer):
-    """Run model prediction, pad if not enough frames."""
-    clip = np.array(frame_buffer)  # [T, H, W, C]
-
-    while clip.shape[0] < CLIP_LEN:
-        clip = np.vstack([clip, clip[-1:]])
-
-    frames_tensor = torch.tensor(clip, dtype=torch.float32).permute(0, 3, 1, 2)  # [T, C, H, W]
+def run_prediction(clip):
+    """Run model prediction on a padded [T, H, W, C] clip (ClipBuffer.take())."""
+    frames_tensor = torch.from_numpy(clip).permute(0, 3, 1, 2)  # [T, C, H, W]
     frames_tensor = frames_tensor.unsqueeze(0).to(DEVICE)  # [1, T, C, H, W]
 
     with torch.no_grad():
@@ -91,7 +90,7 @@ def async_prediction(frame_buffer):
 def process_video(video_path):
     global last_prediction, last_color
     print(f"[INFO] Processing: {video_path}")
-    frame_buffer = []
+    frame_buffer = ClipBuffer(INPUT_SPEC, CLIP_LEN, preprocessor)
 
     vs = cv2.VideoCapture(video_path)
     writer = None
@@ -106,12 +105,11 @@ def process_video(video_path):
             (H, W) = frame.shape[:2]
 
         output_frame = frame.copy()
-        frame_buffer.append(preprocess_frame(frame))
+        frame_buffer.append(frame)
 
-        if len(frame_buffer) == CLIP_LEN:
-            frames_copy = list(frame_buffer)  # ✅ copy buffer safely
-            threading.Thread(target=async_prediction, args=(frames_copy,)).start()
-            frame_buffer = []  # reset
+        if frame_buffer.full:
+            clip = frame_buffer.take()  # ✅ copy buffer safely
+            threading.Thread(target=async_prediction, args=(clip,)).start()
 
         # Overlay text
         with lock:
@@ -141,19 +139,18 @@ def process_video(video_path):
 def process_camera():
     global last_prediction, last_color
     cap = cv2.VideoCapture(0)
-    frame_buffer = []
+    frame_buffer = ClipBuffer(INPUT_SPEC, CLIP_LEN, preprocessor)
 
     while True:
         ret, frame = cap.read()
         if not ret:
             break
 
-        frame_buffer.append(preprocess_frame(frame))
+        frame_buffer.append(frame)
 
-        if len(frame_buffer) == CLIP_LEN:
-            frames_copy = list(frame_buffer)
-            threading.Thread(target=async_prediction, args=(frames_copy,)).start()
-            frame_buffer = []  # reset
+        if frame_buffer.full:
+            clip = frame_buffer.take()
+            threading.Thread(target=async_prediction, args=(clip,)).start()
 
         # Overlay text
         with lock: